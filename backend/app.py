@@ -29,32 +29,54 @@ logger = logging.getLogger(__name__)
 
 # Import database connection
 from utils.database import db
+from utils import loader
+from services.ai_cache import AIResultCache
+from models.notification import NotificationModel
+from services.retention import ConversationArchiver, retention_worker
+from models.milestone_reminder import MilestoneReminderModel
+from services.milestone_scheduler import milestone_scheduler
+from services.job_market_aggregates import JobMarketAggregates
+from services.ingestion import PostingIngester
+from models.career import CareerModel
+from utils.salary import backfill_salary_fields
 
 # Import routes
 from routes.auth import LoginResource, RegisterResource
 from routes.user import UserResource
 from routes.career import CareerResource
-from routes.chatbot import ChatbotResource
+from routes.chatbot import ChatbotResource, ChatHistoryExportResource
 from routes.skills import SkillsResource
 from routes.job_market import JobMarketResource
-from routes.notifications import NotificationsResource
-from routes.admin import AdminStatsResource, AdminUsersResource, AdminUserResource
+from routes.notifications import NotificationsResource, NotificationStreamResource, NotificationUnreadCountResource, NotificationBulkResource
+from routes.dashboard import DashboardResource
+from routes.admin import AdminStatsResource, AdminUsersResource, AdminUserResource, AdminBroadcastResource, AdminJobPostingsImportResource, AdminMetricsResource
 from routes.career_planning import CareerPlanResource, CareerGoalsResource, CareerGoalResource, CareerMilestonesResource, CareerMilestoneResource
 
+# Request-scoped model loaders are dropped at teardown
+loader.init_app(app)
+
 # Register API routes
 api.add_resource(LoginResource, '/api/auth/login')
 api.add_resource(RegisterResource, '/api/auth/register')
 api.add_resource(UserResource, '/api/users/profile', '/api/users/profile/<string:user_id>')
 api.add_resource(CareerResource, '/api/career/recommendations', '/api/career/recommendations/<string:user_id>')
 api.add_resource(ChatbotResource, '/api/chatbot/message')
+api.add_resource(ChatHistoryExportResource, '/api/chatbot/history/export')
 api.add_resource(SkillsResource, '/api/skills/analysis', '/api/skills/analysis/<string:user_id>')
 api.add_resource(JobMarketResource, '/api/job-market/analysis')
 api.add_resource(NotificationsResource, '/api/notifications', '/api/notifications/<string:user_id>')
+api.add_resource(NotificationStreamResource, '/api/notifications/stream')
+api.add_resource(NotificationUnreadCountResource, '/api/notifications/unread-count')
+api.add_resource(NotificationBulkResource, '/api/notifications/bulk')
+api.add_resource(DashboardResource, '/api/dashboard/<string:user_id>')
 
 # Admin routes
 api.add_resource(AdminStatsResource, '/api/admin/stats')
 api.add_resource(AdminUsersResource, '/api/admin/users')
 api.add_resource(AdminUserResource, '/api/admin/users/<string:user_id>')
+api.add_resource(AdminBroadcastResource, '/api/admin/notifications/broadcast')
+api.add_resource(AdminJobPostingsImportResource, '/api/admin/job-postings/import')
+api.add_resource(AdminMetricsResource, '/api/metrics')
 
 # Career planning routes
 api.add_resource(CareerPlanResource, '/api/career/plan')
@@ -82,10 +104,25 @@ def health_check():
 if __name__ == '__main__':
     # Create database collections if they don't exist
     if db is not None:
-        collections = ['users', 'careers', 'skills', 'job_market', 'feedback', 'notifications', 'career_plans']
+        collections = ['users', 'careers', 'skills', 'job_market', 'feedback', 'notifications', 'career_plans', 'ai_cache']
         for collection_name in collections:
             if collection_name not in db.list_collection_names():
                 db.create_collection(collection_name)
                 logger.info(f"Created collection: {collection_name}")
+        
+        AIResultCache(db).ensure_indexes()
+        NotificationModel(db).ensure_indexes()
+        ConversationArchiver(db).ensure_indexes()
+        retention_worker.start(db)
+        MilestoneReminderModel(db).ensure_indexes()
+        milestone_scheduler.start(db)
+        # Picks up entries written outside the API, e.g. by seed_database.py
+        CareerModel(db).ensure_indexes()
+        backfill_salary_fields(db.careers)
+        backfill_salary_fields(db.job_market)
+        PostingIngester(db).ensure_indexes()
+        market_aggregates = JobMarketAggregates(db)
+        market_aggregates.ensure_indexes()
+        market_aggregates.rebuild()
     
     app.run(debug=True, host='0.0.0.0', port=5000)
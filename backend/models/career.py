@@ -1,10 +1,16 @@
 from datetime import datetime
 from bson import ObjectId
+from utils.loader import get_loader
+from utils.salary import DEFAULT_CURRENCY, salary_fields, salary_query
 
 class CareerModel:
     def __init__(self, db):
         self.collection = db.careers
     
+    def ensure_indexes(self):
+        # get_careers_by_salary matches one currency and sorts on salary_max
+        self.collection.create_index([('salary_currency', 1), ('salary_max', -1)])
+    
     def _serialize_career(self, career):
         """Convert career data to JSON-serializable format"""
         if career:
@@ -24,15 +30,19 @@ class CareerModel:
         """Create a new career entry"""
         career_data['created_at'] = datetime.now()
         career_data['updated_at'] = datetime.now()
+        if career_data.get('salary_range') is not None:
+            career_data.update(salary_fields(career_data['salary_range']))
         
         result = self.collection.insert_one(career_data)
         return str(result.inserted_id)
     
+    def _loader(self):
+        return get_loader(self.collection, self._serialize_career)
+    
     def get_career_by_id(self, career_id):
         """Get career by ID"""
         try:
-            career = self.collection.find_one({'_id': ObjectId(career_id)})
-            return self._serialize_career(career)
+            return self._loader().load(career_id)
         except Exception as e:
             return None
     
@@ -41,46 +51,73 @@ class CareerModel:
         careers = list(self.collection.find().skip(skip).limit(limit))
         return self._serialize_careers(careers)
     
+    def _filter_query(self, search=None, industry=None, skills=None):
+        """Query matching every filter that is given"""
+        conditions = []
+        if search:
+            conditions.append({
+                '$or': [
+                    {'name': {'$regex': search, '$options': 'i'}},
+                    {'description': {'$regex': search, '$options': 'i'}},
+                    {'required_skills': {'$regex': search, '$options': 'i'}}
+                ]
+            })
+        if industry:
+            conditions.append({'industry': industry})
+        if skills:
+            conditions.append({'required_skills': {'$in': skills}})
+        
+        if len(conditions) > 1:
+            return {'$and': conditions}
+        return conditions[0] if conditions else {}
+    
     def search_careers(self, query, limit=20):
         """Search careers by name or description"""
-        careers = list(self.collection.find({
-            '$or': [
-                {'name': {'$regex': query, '$options': 'i'}},
-                {'description': {'$regex': query, '$options': 'i'}},
-                {'required_skills': {'$regex': query, '$options': 'i'}}
-            ]
-        }).limit(limit))
+        careers = list(self.collection.find(self._filter_query(search=query)).limit(limit))
         
         return self._serialize_careers(careers)
     
     def get_careers_by_skills(self, skills, limit=20):
         """Get careers that match given skills"""
-        careers = list(self.collection.find({
-            'required_skills': {'$in': skills}
-        }).limit(limit))
+        careers = list(self.collection.find(self._filter_query(skills=skills)).limit(limit))
         
         return self._serialize_careers(careers)
     
     def get_careers_by_industry(self, industry, limit=20):
         """Get careers by industry"""
-        careers = list(self.collection.find({
-            'industry': industry
-        }).limit(limit))
+        careers = list(self.collection.find(self._filter_query(industry=industry)).limit(limit))
+        
+        return self._serialize_careers(careers)
+    
+    def get_careers_by_salary(self, min_salary=None, max_salary=None, currency=DEFAULT_CURRENCY,
+                              search=None, industry=None, skills=None, limit=20):
+        """Get careers paid in currency whose salary range overlaps the given bounds, best paid first.
+        
+        search, industry and skills narrow the results further, as in the methods above.
+        """
+        query = self._filter_query(search, industry, skills)
+        query.update(salary_query(min_salary, max_salary) or {'salary_max': {'$ne': None}})
+        query['salary_currency'] = currency
+        careers = list(self.collection.find(query).sort('salary_max', -1).limit(limit))
         
         return self._serialize_careers(careers)
     
     def update_career(self, career_id, update_data):
         """Update career information"""
         update_data['updated_at'] = datetime.now()
+        if update_data.get('salary_range') is not None:
+            update_data.update(salary_fields(update_data['salary_range']))
         result = self.collection.update_one(
             {'_id': ObjectId(career_id)},
             {'$set': update_data}
         )
+        self._loader().clear(career_id)
         return result.modified_count > 0
     
     def delete_career(self, career_id):
         """Delete career"""
         result = self.collection.delete_one({'_id': ObjectId(career_id)})
+        self._loader().clear(career_id)
         return result.deleted_count > 0
     
     def get_popular_careers(self, limit=10):
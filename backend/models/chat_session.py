@@ -0,0 +1,102 @@
+import os
+from datetime import datetime
+from bson import ObjectId
+
+# Number of most recent turns kept verbatim; older turns are folded into the summary
+RECENT_TURNS = int(os.getenv('CHAT_RECENT_TURNS', 6))
+# Upper bound on the rolling summary so it never grows with conversation length
+SUMMARY_MAX_CHARS = int(os.getenv('CHAT_SUMMARY_MAX_CHARS', 1500))
+
+class ChatSessionModel:
+    def __init__(self, db):
+        self.collection = db.chat_sessions
+
+    def _serialize_session(self, session):
+        """Convert session data to JSON-serializable format"""
+        if session:
+            session['_id'] = str(session['_id'])
+            if 'created_at' in session and session['created_at']:
+                session['created_at'] = session['created_at'].isoformat()
+            if 'updated_at' in session and session['updated_at']:
+                session['updated_at'] = session['updated_at'].isoformat()
+        return session
+
+    def create_session(self, user_id):
+        """Create a new chat session for user"""
+        session_data = {
+            'user_id': user_id,
+            'summary': '',
+            'recent_turns': [],
+            'turn_count': 0,
+            'created_at': datetime.now(),
+            'updated_at': datetime.now()
+        }
+
+        result = self.collection.insert_one(session_data)
+        return str(result.inserted_id)
+
+    def get_session(self, session_id, user_id):
+        """Get chat session by ID, scoped to its owner"""
+        try:
+            session = self.collection.find_one({'_id': ObjectId(session_id), 'user_id': user_id})
+            return self._serialize_session(session)
+        except Exception as e:
+            return None
+
+    def append_turn(self, session_id, message, response, max_retries=3):
+        """Append a turn, folding turns beyond RECENT_TURNS into the rolling summary"""
+        for attempt in range(max_retries):
+            session = self.collection.find_one({'_id': ObjectId(session_id)})
+            if not session:
+                return False
+
+            recent_turns = session.get('recent_turns', []) + [{
+                'message': message,
+                'response': response,
+                'timestamp': datetime.now()
+            }]
+            summary = session.get('summary', '')
+
+            # Only the evicted turns are summarized, so each update is O(1) in history length
+            overflow = len(recent_turns) - RECENT_TURNS
+            if overflow > 0:
+                summary = self._fold_into_summary(summary, recent_turns[:overflow])
+                recent_turns = recent_turns[overflow:]
+
+            # Guard on turn_count so concurrent messages in one session do not lose turns
+            result = self.collection.update_one(
+                {'_id': session['_id'], 'turn_count': session.get('turn_count', 0)},
+                {'$set': {
+                    'summary': summary,
+                    'recent_turns': recent_turns,
+                    'updated_at': datetime.now()
+                }, '$inc': {'turn_count': 1}}
+            )
+            if result.modified_count > 0:
+                return True
+
+        return False
+
+    def _fold_into_summary(self, summary, turns):
+        """Fold evicted turns into the summary, dropping the oldest lines past SUMMARY_MAX_CHARS"""
+        lines = [line for line in summary.split('\n') if line]
+        for turn in turns:
+            lines.append(f"- User asked: {self._condense(turn.get('message', ''), 160)} | "
+                         f"Advised: {self._condense(turn.get('response', ''), 200)}")
+
+        while lines and len('\n'.join(lines)) > SUMMARY_MAX_CHARS:
+            lines.pop(0)
+
+        return '\n'.join(lines)
+
+    def _condense(self, text, max_chars):
+        """Reduce text to its first sentence, capped at max_chars"""
+        text = ' '.join(str(text).split())
+        for terminator in ('. ', '? ', '! '):
+            index = text.find(terminator)
+            if 0 < index < max_chars:
+                text = text[:index + 1]
+                break
+        if len(text) > max_chars:
+            text = text[:max_chars - 3].rstrip() + '...'
+        return text
@@ -0,0 +1,115 @@
+import os
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, DeleteOne
+from utils.database import ensure_ttl_index
+
+# Hours before a milestone's deadline its reminder is sent
+MILESTONE_REMINDER_LEAD_HOURS = int(os.getenv('MILESTONE_REMINDER_LEAD_HOURS', 24))
+# Reminder entries are dropped by a TTL index this many days after the deadline
+MILESTONE_REMINDER_RETENTION_DAYS = int(os.getenv('MILESTONE_REMINDER_RETENTION_DAYS', 30))
+# Date-only deadlines (what the planner's date picker sends) fall due at this hour
+DATE_ONLY_DEADLINE_HOUR = 9
+
+def parse_deadline(value):
+    """Deadline as a datetime from a datetime, 'YYYY-MM-DD' or ISO string; None if missing or invalid"""
+    if isinstance(value, datetime):
+        return value
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        if len(value) == 10:
+            return datetime.strptime(value, '%Y-%m-%d').replace(hour=DATE_ONLY_DEADLINE_HOUR)
+        deadline = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    # Compared against naive local datetime.now() everywhere else
+    return deadline.astimezone().replace(tzinfo=None) if deadline.tzinfo else deadline
+
+class MilestoneReminderModel:
+    """Due-date projection of open milestones, one entry per milestone.
+
+    Milestones live inside career_plans documents; this collection mirrors only the
+    open ones with a deadline, so finding what is due is an index range scan instead
+    of a walk over every plan.
+    """
+
+    def __init__(self, db):
+        self.collection = db.milestone_reminders
+        self.career_plans = db.career_plans
+
+    def ensure_indexes(self):
+        self.collection.create_index([('sent', 1), ('remind_at', 1)])
+        self.collection.create_index('tracked_at')
+        ensure_ttl_index(self.collection, 'deadline', MILESTONE_REMINDER_RETENTION_DAYS * 86400 or None)
+
+    def _operation(self, user_id, milestone, now, overwrite=True):
+        """Upsert for a milestone that needs a reminder, delete for one that no longer does"""
+        deadline = parse_deadline(milestone.get('deadline'))
+        if milestone.get('completed') or not deadline or deadline <= now:
+            return DeleteOne({'_id': milestone['id']}), None
+
+        reminder = {
+            'user_id': user_id,
+            'title': milestone.get('title', ''),
+            'priority': milestone.get('priority', 'medium'),
+            'deadline': deadline,
+            'remind_at': deadline - timedelta(hours=MILESTONE_REMINDER_LEAD_HOURS),
+            'sent': False,
+            'tracked_at': now
+        }
+        update = {'$set' if overwrite else '$setOnInsert': reminder}
+        return UpdateOne({'_id': milestone['id']}, update, upsert=True), dict(reminder, _id=milestone['id'])
+
+    def track(self, user_id, milestone):
+        """Mirror a created or changed milestone; returns the reminder entry, or None if it needs none"""
+        operation, reminder = self._operation(user_id, milestone, datetime.now())
+        self.collection.bulk_write([operation])
+        return reminder
+
+    def untrack(self, milestone_id):
+        self.collection.delete_one({'_id': milestone_id})
+
+    def due_between(self, start, end):
+        """Unsent reminders with start <= remind_at < end"""
+        query = {'sent': False, 'remind_at': {'$lt': end}}
+        if start:
+            query['remind_at']['$gte'] = start
+        return self.collection.find(query, {'remind_at': 1})
+
+    def tracked_since(self, since, end):
+        """Unsent reminders tracked since `since` that fall due before end, however early"""
+        return self.collection.find(
+            {'tracked_at': {'$gte': since}, 'sent': False, 'remind_at': {'$lt': end}}, {'remind_at': 1}
+        )
+
+    def claim(self, reminder_ids, now, token):
+        """Mark due reminders sent and return the ones this caller claimed.
+
+        Entries that were completed, rescheduled or claimed by another worker in the
+        meantime are left out.
+        """
+        self.collection.update_many(
+            {'_id': {'$in': reminder_ids}, 'sent': False, 'remind_at': {'$lte': now}},
+            {'$set': {'sent': True, 'sent_at': now, 'claim': token}}
+        )
+        return list(self.collection.find({'_id': {'$in': reminder_ids}, 'claim': token}))
+
+    def rebuild(self, batch_size=1000):
+        """Backfill the projection from every career plan; only needed once for existing milestones"""
+        now = datetime.now()
+        operations = []
+        tracked = 0
+        for plan in self.career_plans.find({'milestones.0': {'$exists': True}}, {'user_id': 1, 'milestones': 1}):
+            for milestone in plan['milestones']:
+                if not milestone.get('id'):
+                    continue
+                # Existing entries are left alone so reminders already sent are not sent again
+                operation, reminder = self._operation(plan['user_id'], milestone, now, overwrite=False)
+                operations.append(operation)
+                tracked += reminder is not None
+                if len(operations) >= batch_size:
+                    self.collection.bulk_write(operations, ordered=False)
+                    operations = []
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return tracked
@@ -0,0 +1,280 @@
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateMany, UpdateOne, DeleteMany
+from services.notification_broker import notification_broker
+from utils.database import ensure_ttl_index
+
+# Recipients written per insert_many when broadcasting
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', 1000))
+# Read notifications are dropped by a TTL index this many days after being read (0 keeps them)
+NOTIFICATION_READ_RETENTION_DAYS = int(os.getenv('NOTIFICATION_READ_RETENTION_DAYS', 30))
+# Most notifications kept per user; the retention sweep deletes the oldest beyond it (0 disables)
+NOTIFICATION_INBOX_CAP = int(os.getenv('NOTIFICATION_INBOX_CAP', 200))
+
+class NotificationModel:
+    def __init__(self, db):
+        self.collection = db.notifications
+        # One document per user: {'_id': user_id, 'unread': n}
+        self.counters = db.notification_counters
+        # Shared broadcast content; each recipient gets a receipt in notifications
+        self.broadcasts = db.broadcast_messages
+        self.users = db.users
+
+    def ensure_indexes(self):
+        self.collection.create_index([('user_id', 1), ('timestamp', -1)])
+        self.collection.create_index([('user_id', 1), ('is_read', 1)])
+        # Unread notifications never expire on their own, so the unread counters stay exact
+        ensure_ttl_index(self.collection, 'read_at', NOTIFICATION_READ_RETENTION_DAYS * 86400 or None)
+        self.users.create_index('role')
+        self.users.create_index('preferred_industries')
+
+    def _serialize_notification(self, notification):
+        """Convert notification data to JSON-serializable format"""
+        if notification:
+            notification['_id'] = str(notification['_id'])
+            for field in ('timestamp', 'read_at'):
+                if isinstance(notification.get(field), datetime):
+                    notification[field] = notification[field].isoformat()
+        return notification
+
+    def create_notification(self, user_id, title, message, type='info', priority='medium', data=None):
+        """Store a notification and push it to the user's open streams"""
+        notification = {
+            'user_id': user_id,
+            'title': title,
+            'message': message,
+            'type': type,
+            'priority': priority,
+            'is_read': False,
+            'timestamp': datetime.now()
+        }
+        if data:
+            notification['data'] = data
+
+        self.collection.insert_one(notification)
+        self._adjust_unread(user_id, 1)
+        notification_broker.publish(notification)
+        return self._serialize_notification(notification)
+
+    def create_many(self, notifications):
+        """Store a batch of notifications, possibly for different users, in one round trip per collection"""
+        if not notifications:
+            return 0
+        now = datetime.now()
+        for notification in notifications:
+            notification.setdefault('is_read', False)
+            notification.setdefault('timestamp', now)
+
+        self.collection.insert_many(notifications, ordered=False)
+        # Same rule as _adjust_unread: only existing counters move
+        per_user = Counter(notification['user_id'] for notification in notifications)
+        self.counters.bulk_write(
+            [UpdateOne({'_id': user_id}, {'$inc': {'unread': count}}) for user_id, count in per_user.items()],
+            ordered=False
+        )
+        notification_broker.publish_many(notifications)
+        return len(notifications)
+
+    def get_user_notifications(self, user_id, limit=50):
+        """Latest notifications for a user"""
+        notifications = list(self.collection.find({'user_id': user_id}).sort('timestamp', -1).limit(limit))
+        self._hydrate_receipts(notifications)
+        return [self._serialize_notification(notification) for notification in notifications]
+
+    def _hydrate_receipts(self, notifications):
+        """Fill broadcast receipts with their shared content in one query"""
+        broadcast_ids = {n['broadcast_id'] for n in notifications if n.get('broadcast_id')}
+        if not broadcast_ids:
+            return
+        broadcasts = {b['_id']: b for b in self.broadcasts.find(
+            {'_id': {'$in': list(broadcast_ids)}}, {'title': 1, 'message': 1, 'type': 1, 'priority': 1}
+        )}
+        for notification in notifications:
+            broadcast = broadcasts.get(notification.get('broadcast_id'))
+            if broadcast:
+                for field in ('title', 'message', 'type', 'priority'):
+                    notification.setdefault(field, broadcast.get(field))
+            if notification.get('broadcast_id'):
+                notification['broadcast_id'] = str(notification['broadcast_id'])
+
+    def get_unread_count(self, user_id):
+        """Unread count from the maintained counter, counted once for users without one"""
+        counter = self.counters.find_one({'_id': user_id})
+        if counter is None:
+            return self.recount_unread(user_id)
+        return max(counter.get('unread', 0), 0)
+
+    def warm_unread_count(self, user_id):
+        """Build a missing unread counter ahead of the first read; True if one was built"""
+        if self.counters.find_one({'_id': user_id}, {'_id': 1}) is not None:
+            return False
+        self.recount_unread(user_id)
+        return True
+
+    def recount_unread(self, user_id):
+        """Rebuild a user's counter from the notifications themselves"""
+        unread = self.collection.count_documents({'user_id': user_id, 'is_read': False})
+        self.counters.update_one({'_id': user_id}, {'$set': {'unread': unread}}, upsert=True)
+        return unread
+
+    def _adjust_unread(self, user_id, delta):
+        # Only existing counters move; a missing one is recounted on first read, which also
+        # covers notifications stored before counters existed. Clamped so it never goes negative.
+        if delta:
+            self.counters.update_one(
+                {'_id': user_id},
+                [{'$set': {'unread': {'$max': [0, {'$add': [{'$ifNull': ['$unread', 0]}, delta]}]}}}]
+            )
+
+    def mark_read(self, notification_id, user_id=None):
+        """Mark one notification read; returns False if it is missing or already read"""
+        query = {'_id': ObjectId(notification_id), 'is_read': False}
+        if user_id:
+            query['user_id'] = user_id
+        notification = self.collection.find_one_and_update(
+            query, {'$set': {'is_read': True, 'read_at': datetime.now()}}
+        )
+        if not notification:
+            return False
+        self._adjust_unread(notification['user_id'], -1)
+        return True
+
+    def delete_notification(self, notification_id, user_id=None):
+        """Delete one notification; returns False if it is missing"""
+        query = {'_id': ObjectId(notification_id)}
+        if user_id:
+            query['user_id'] = user_id
+        notification = self.collection.find_one_and_delete(query)
+        if not notification:
+            return False
+        if not notification.get('is_read'):
+            self._adjust_unread(notification['user_id'], -1)
+        return True
+
+    def exists(self, notification_id, user_id=None):
+        query = {'_id': ObjectId(notification_id)}
+        if user_id:
+            query['user_id'] = user_id
+        return self.collection.count_documents(query, limit=1) > 0
+
+    def bulk_update(self, user_id, read_ids=None, delete_ids=None, read_all=False):
+        """Mark many of a user's notifications read and/or delete many in one bulk write.
+
+        Unread notifications about to be deleted are first marked read, so the bulk
+        write's modified_count is exactly how far the unread counter has to drop.
+        """
+        read_ids = [ObjectId(notification_id) for notification_id in read_ids or []]
+        delete_ids = [ObjectId(notification_id) for notification_id in delete_ids or []]
+
+        read_query = {'user_id': user_id, 'is_read': False}
+        if not read_all:
+            read_query['_id'] = {'$in': read_ids + delete_ids}
+
+        operations = [UpdateMany(read_query, {'$set': {'is_read': True, 'read_at': datetime.now()}})]
+        if delete_ids:
+            operations.append(DeleteMany({'user_id': user_id, '_id': {'$in': delete_ids}}))
+
+        result = self.collection.bulk_write(operations, ordered=True)
+        self._adjust_unread(user_id, -result.modified_count)
+        return {'unread_cleared': result.modified_count, 'deleted': result.deleted_count}
+
+    def trim_inbox(self, user_id, cap=NOTIFICATION_INBOX_CAP):
+        """Delete a user's oldest notifications beyond cap; returns how many were deleted"""
+        # By _id rather than by a timestamp boundary: broadcasts give a whole batch the same
+        # timestamp, and ties at the boundary would take notifications within the cap with them
+        doomed = [notification['_id'] for notification in
+                  self.collection.find({'user_id': user_id}, {'_id': 1})
+                  .sort([('timestamp', -1), ('_id', -1)]).skip(cap)]
+        if not doomed:
+            return 0
+
+        # Same approach as bulk_update: mark the doomed unread ones read so the counter drop is exact
+        old = {'user_id': user_id, '_id': {'$in': doomed}}
+        result = self.collection.bulk_write([
+            UpdateMany(dict(old, is_read=False), {'$set': {'is_read': True, 'read_at': datetime.now()}}),
+            DeleteMany(old)
+        ], ordered=True)
+        self._adjust_unread(user_id, -result.modified_count)
+        return result.deleted_count
+
+    def enforce_inbox_caps(self, cap=NOTIFICATION_INBOX_CAP):
+        """Trim every inbox holding more than cap notifications"""
+        if not cap:
+            return {'users': 0, 'deleted': 0}
+        over_cap = self.collection.aggregate([
+            {'$group': {'_id': '$user_id', 'count': {'$sum': 1}}},
+            {'$match': {'count': {'$gt': cap}}}
+        ], allowDiskUse=True)
+        users = 0
+        deleted = 0
+        for inbox in over_cap:
+            users += 1
+            deleted += self.trim_inbox(inbox['_id'], cap)
+        return {'users': users, 'deleted': deleted}
+
+    def broadcast(self, user_query, title, message, type='info', priority='medium', shared=False,
+                  batch_size=BROADCAST_BATCH_SIZE):
+        """Send one notification to every active user matching user_query.
+
+        Recipient ids are streamed from users in batches and written with insert_many.
+        With shared=True the content is stored once and recipients get receipts that
+        only carry their read state. Returns counts and throughput.
+        """
+        started = time.monotonic()
+        now = datetime.now()
+        content = {'title': title, 'message': message, 'type': type, 'priority': priority}
+
+        broadcast_id = None
+        if shared:
+            broadcast_id = self.broadcasts.insert_one(dict(content, timestamp=now)).inserted_id
+
+        recipients = 0
+        batches = 0
+        user_ids = []
+        cursor = self.users.find(dict(user_query, is_active={'$ne': False}), {'_id': 1}).batch_size(batch_size)
+        for user in cursor:
+            user_ids.append(str(user['_id']))
+            if len(user_ids) == batch_size:
+                self._deliver_broadcast(user_ids, content, now, broadcast_id)
+                recipients += len(user_ids)
+                batches += 1
+                user_ids = []
+        if user_ids:
+            self._deliver_broadcast(user_ids, content, now, broadcast_id)
+            recipients += len(user_ids)
+            batches += 1
+
+        if shared:
+            self.broadcasts.update_one({'_id': broadcast_id}, {'$set': {'recipients': recipients}})
+
+        elapsed = time.monotonic() - started
+        return {
+            'broadcast_id': str(broadcast_id) if broadcast_id else None,
+            'mode': 'shared' if shared else 'copies',
+            'recipients': recipients,
+            'batches': batches,
+            'elapsed_seconds': round(elapsed, 3),
+            'per_second': round(recipients / elapsed) if elapsed > 0 else recipients
+        }
+
+    def _deliver_broadcast(self, user_ids, content, timestamp, broadcast_id):
+        if broadcast_id:
+            notifications = [{'user_id': user_id, 'broadcast_id': broadcast_id, 'is_read': False,
+                              'timestamp': timestamp} for user_id in user_ids]
+        else:
+            notifications = [dict(content, user_id=user_id, is_read=False, timestamp=timestamp)
+                             for user_id in user_ids]
+
+        self.collection.insert_many(notifications, ordered=False)
+        # Same rule as _adjust_unread: only existing counters move
+        self.counters.bulk_write(
+            [UpdateOne({'_id': user_id}, {'$inc': {'unread': 1}}) for user_id in user_ids],
+            ordered=False
+        )
+        # Only users with an open stream cost anything here
+        notification_broker.publish_many(
+            dict(notification, **content) for notification in notifications
+        )
@@ -1,5 +1,7 @@
 from datetime import datetime
 from bson import ObjectId
+from utils.loader import get_loader
+from services.skill_extractor import invalidate_skill_extractor
 
 class SkillsModel:
     def __init__(self, db):
@@ -13,6 +15,8 @@ class SkillsModel:
                 skill['created_at'] = skill['created_at'].isoformat()
             if 'updated_at' in skill and skill['updated_at']:
                 skill['updated_at'] = skill['updated_at'].isoformat()
+            if skill.get('demand', {}).get('updated_at'):
+                skill['demand']['updated_at'] = skill['demand']['updated_at'].isoformat()
         return skill
     
     def _serialize_skills(self, skills):
@@ -27,13 +31,16 @@ class SkillsModel:
         skill_data['updated_at'] = datetime.now()
         
         result = self.collection.insert_one(skill_data)
+        invalidate_skill_extractor()
         return str(result.inserted_id)
     
+    def _loader(self):
+        return get_loader(self.collection, self._serialize_skill)
+    
     def get_skill_by_id(self, skill_id):
         """Get skill by ID"""
         try:
-            skill = self.collection.find_one({'_id': ObjectId(skill_id)})
-            return self._serialize_skill(skill)
+            return self._loader().load(skill_id)
         except Exception as e:
             return None
     
@@ -69,11 +76,15 @@ class SkillsModel:
             {'_id': ObjectId(skill_id)},
             {'$set': update_data}
         )
+        self._loader().clear(skill_id)
+        invalidate_skill_extractor()
         return result.modified_count > 0
     
     def delete_skill(self, skill_id):
         """Delete skill"""
         result = self.collection.delete_one({'_id': ObjectId(skill_id)})
+        self._loader().clear(skill_id)
+        invalidate_skill_extractor()
         return result.deleted_count > 0
     
     def get_popular_skills(self, limit=10):
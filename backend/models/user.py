@@ -1,5 +1,44 @@
+import os
+import json
+import hashlib
+import logging
 from datetime import datetime
 from bson import ObjectId
+from utils.loader import get_loader
+from services.skill_extractor import get_skill_extractor
+
+logger = logging.getLogger(__name__)
+
+# Profile fields that feed AI prompts; profile_hash changes only when one of these does
+AI_PROFILE_FIELDS = (
+    'skills', 'interests', 'career_goals', 'preferred_industries', 'experience_level',
+    'education_background', 'education', 'experience', 'goals'
+)
+# Free-text profile fields searched for skills the user did not list explicitly
+SKILL_TEXT_FIELDS = ('experience', 'education', 'goals')
+# Attempts before giving up on a profile update that keeps losing version races
+PROFILE_UPDATE_RETRIES = int(os.getenv('PROFILE_UPDATE_RETRIES', 5))
+
+def compute_profile_hash(user):
+    """Content hash of the AI-relevant profile fields, ignoring list order and case"""
+    relevant = {}
+    for field in AI_PROFILE_FIELDS:
+        value = user.get(field)
+        if isinstance(value, list):
+            value = sorted({' '.join(str(item).split()).lower() for item in value})
+        relevant[field] = value
+    encoded = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+
+def profile_hash(user):
+    """Stored profile hash, computed on the fly for profiles written before versioning"""
+    return user.get('profile_hash') or compute_profile_hash(user)
+
+def all_skills(user):
+    """Listed skills followed by those inferred from the profile text, without duplicates"""
+    listed = list(user.get('skills') or [])
+    known = {skill.lower() for skill in listed}
+    return listed + [skill for skill in user.get('inferred_skills') or [] if skill.lower() not in known]
 
 class UserModel:
     def __init__(self, db):
@@ -38,30 +77,90 @@ class UserModel:
         user_data.setdefault('education', '')
         user_data.setdefault('goals', '')
         
+        user_data['profile_version'] = 1
+        user_data['profile_hash'] = compute_profile_hash(user_data)
+        user_data['inferred_skills'] = self._infer_skills(user_data)
+        
         result = self.collection.insert_one(user_data)
         return str(result.inserted_id)
     
+    def _loader(self):
+        return get_loader(self.collection, self._serialize_user)
+    
+    def _infer_skills(self, user):
+        """Catalog skills mentioned in the free-text fields but missing from the skills list"""
+        try:
+            texts = [user.get(field) for field in SKILL_TEXT_FIELDS]
+            mentioned = get_skill_extractor(self.collection.database).extract_many(texts)
+        except Exception as e:
+            logger.warning(f"Failed to infer skills from profile text: {e}")
+            return user.get('inferred_skills', [])
+        listed = {str(skill).lower() for skill in user.get('skills') or []}
+        inferred = []
+        for skills in mentioned:
+            inferred.extend(skill for skill in skills if skill.lower() not in listed and skill not in inferred)
+        return inferred
+    
     def get_user_by_id(self, user_id):
         """Get user by ID"""
         try:
-            user = self.collection.find_one({'_id': ObjectId(user_id)})
-            return self._serialize_user(user)
+            return self._loader().load(user_id)
         except Exception as e:
             return None
     
+    def get_users_by_ids(self, user_ids):
+        """Get several users in one query; unknown ids map to None"""
+        try:
+            return dict(zip(user_ids, self._loader().load_many(user_ids)))
+        except Exception as e:
+            return {user_id: None for user_id in user_ids}
+    
     def get_user_by_email(self, email):
         """Get user by email"""
-        user = self.collection.find_one({'email': email})
-        return self._serialize_user(user)
+        user = self._serialize_user(self.collection.find_one({'email': email}))
+        if user:
+            self._loader().prime(user['_id'], user)
+        return user
+    
+    def _versioned_update(self, user_id, build_changes):
+        """Apply a profile change guarded by profile_version.
+        
+        build_changes(current) returns the fields to set, or None when nothing changes.
+        The version bump and the new profile_hash are written in the same update, so the
+        hash always matches the stored profile. Lost races are retried on a fresh read.
+        """
+        for _ in range(PROFILE_UPDATE_RETRIES):
+            current = self.collection.find_one({'_id': ObjectId(user_id)})
+            if not current:
+                return False
+            
+            changes = build_changes(current)
+            if changes is None:
+                return False
+            
+            version = current.get('profile_version')
+            changes['profile_hash'] = compute_profile_hash(dict(current, **changes))
+            if any(field in changes for field in SKILL_TEXT_FIELDS + ('skills',)):
+                changes['inferred_skills'] = self._infer_skills(dict(current, **changes))
+            changes['profile_version'] = (version or 0) + 1
+            changes['updated_at'] = datetime.now()
+            
+            # Matches a missing field when version is None, for profiles created before versioning
+            result = self.collection.update_one(
+                {'_id': ObjectId(user_id), 'profile_version': version},
+                {'$set': changes}
+            )
+            if result.matched_count:
+                # The guarded write means current plus changes is exactly what is stored now
+                self._loader().prime(user_id, self._serialize_user(dict(current, **changes)))
+                return result.modified_count > 0
+        
+        logger.warning(f"Gave up updating profile {user_id} after {PROFILE_UPDATE_RETRIES} version conflicts")
+        return False
     
     def update_user(self, user_id, update_data):
         """Update user profile"""
-        update_data['updated_at'] = datetime.now()
-        result = self.collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$set': update_data}
-        )
-        return result.modified_count > 0
+        return self._versioned_update(user_id, lambda current: dict(update_data))
     
     def delete_user(self, user_id):
         """Delete user (soft delete)"""
@@ -69,6 +168,7 @@ class UserModel:
             {'_id': ObjectId(user_id)},
             {'$set': {'is_active': False, 'updated_at': datetime.now()}}
         )
+        self._loader().clear(user_id)
         return result.modified_count > 0
     
     def get_all_users(self, limit=50, skip=0):
@@ -81,25 +181,19 @@ class UserModel:
     
     def add_skill(self, user_id, skill):
         """Add skill to user profile"""
-        result = self.collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$addToSet': {'skills': skill}, '$set': {'updated_at': datetime.now()}}
-        )
-        return result.modified_count > 0
+        return self._versioned_update(user_id, lambda current: self._with_item(current, 'skills', skill))
     
     def add_interest(self, user_id, interest):
         """Add interest to user profile"""
-        result = self.collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$addToSet': {'interests': interest}, '$set': {'updated_at': datetime.now()}}
-        )
-        return result.modified_count > 0
+        return self._versioned_update(user_id, lambda current: self._with_item(current, 'interests', interest))
     
     def add_career_goal(self, user_id, goal):
         """Add career goal to user profile"""
-        result = self.collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$addToSet': {'career_goals': goal}, '$set': {'updated_at': datetime.now()}}
-        )
-        return result.modified_count > 0
-
+        return self._versioned_update(user_id, lambda current: self._with_item(current, 'career_goals', goal))
+    
+    def _with_item(self, current, field, item):
+        """Changes adding item to a list field, or None if it is already present"""
+        values = current.get(field) or []
+        if item in values:
+            return None
+        return {field: values + [item]}
@@ -3,8 +3,16 @@ from flask import request, jsonify
 from models.user import UserModel
 from models.career import CareerModel
 from models.skills import SkillsModel
+from models.notification import NotificationModel
+from services.ingestion import PostingIngester, detect_format
 from utils.database import db
+from utils.metrics import get_metrics_snapshot
 from datetime import datetime
+from bson import ObjectId
+import jwt
+import os
+import io
+import gzip
 import logging
 
 logger = logging.getLogger(__name__)
@@ -200,4 +208,157 @@ class AdminUserResource(Resource):
                 'error': 'Failed to delete user'
             }), 500
 
+class AdminBroadcastResource(Resource):
+    def post(self):
+        """Send a notification to a role, an industry, a list of users or everyone (admin only)"""
+        # Verify the caller is an admin; roles are read from the profile, not the token
+        token = request.headers.get('Authorization')
+        payload = self._verify_token(token) if token else None
+        caller = UserModel(db).get_user_by_id(payload.get('user_id')) if payload else None
+        if not caller or caller.get('role') != 'admin':
+            return {'error': 'Admin access required'}, 403
+        
+        data = request.get_json(silent=True) or {}
+        if not data.get('title') or not data.get('message'):
+            return {
+                'success': False,
+                'error': 'Title and message are required'
+            }, 400
+        
+        # Translate the target into a users query
+        target = data.get('target') or {}
+        if target.get('user_ids'):
+            try:
+                user_query = {'_id': {'$in': [ObjectId(user_id) for user_id in target['user_ids']]}}
+            except Exception:
+                return {
+                    'success': False,
+                    'error': 'Invalid user id in target'
+                }, 400
+        elif target.get('role'):
+            user_query = {'role': target['role']}
+        elif target.get('industry'):
+            user_query = {'preferred_industries': target['industry']}
+        elif target.get('all'):
+            user_query = {}
+        else:
+            return {
+                'success': False,
+                'error': 'Target must include user_ids, role, industry or all'
+            }, 400
+        
+        try:
+            result = NotificationModel(db).broadcast(
+                user_query,
+                data['title'],
+                data['message'],
+                type=data.get('type', 'announcement'),
+                priority=data.get('priority', 'medium'),
+                shared=bool(data.get('shared'))
+            )
+            logger.info(f"Broadcast sent to {result['recipients']} users at {result['per_second']}/s")
+            
+            return {
+                'success': True,
+                'broadcast': result
+            }, 200
+            
+        except Exception as e:
+            logger.error(f"Error broadcasting notification: {e}")
+            return {
+                'success': False,
+                'error': 'Failed to broadcast notification'
+            }, 500
+    
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
 
+class AdminJobPostingsImportResource(Resource):
+    def post(self):
+        """Ingest a CSV or JSONL job postings file, streamed from the upload (admin only)"""
+        # Verify the caller is an admin; roles are read from the profile, not the token
+        token = request.headers.get('Authorization')
+        payload = self._verify_token(token) if token else None
+        caller = UserModel(db).get_user_by_id(payload.get('user_id')) if payload else None
+        if not caller or caller.get('role') != 'admin':
+            return {'error': 'Admin access required'}, 403
+        
+        # Multipart upload under 'file', or the raw request body
+        upload = request.files.get('file')
+        filename = upload.filename if upload else request.args.get('filename', '')
+        stream = upload.stream if upload else request.stream
+        if filename.endswith('.gz') or request.headers.get('Content-Encoding') == 'gzip':
+            stream = gzip.GzipFile(fileobj=stream)
+        fmt = detect_format(filename, request.args.get('format'))
+        
+        try:
+            text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+            result = PostingIngester(db, source=request.args.get('source')).ingest(text, fmt)
+            logger.info(f"Ingested {result['rows']} job postings at {result['rows_per_second']}/s, "
+                        f"{result['rejected']} rejected")
+            
+            return {
+                'success': True,
+                'ingestion': result
+            }, 200
+            
+        except Exception as e:
+            logger.error(f"Error ingesting job postings: {e}")
+            return {
+                'success': False,
+                'error': f'Failed to ingest job postings: {str(e)}'
+            }, 500
+    
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
+
+class AdminMetricsResource(Resource):
+    def get(self):
+        """Cache, scheduler and worker metrics (admin only)"""
+        # Verify the caller is an admin; roles are read from the profile, not the token
+        token = request.headers.get('Authorization')
+        payload = self._verify_token(token) if token else None
+        caller = UserModel(db).get_user_by_id(payload.get('user_id')) if payload else None
+        if not caller or caller.get('role') != 'admin':
+            return {'error': 'Admin access required'}, 403
+        
+        return {
+            'metrics': get_metrics_snapshot(),
+            'timestamp': str(datetime.now())
+        }, 200
+    
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
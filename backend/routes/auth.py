@@ -7,6 +7,7 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.user import UserModel
+from services.cache_warmer import cache_warmer, AI_CACHE_WARM_ON_LOGIN
 from utils.database import db
 
 class LoginResource(Resource):
@@ -41,6 +42,11 @@ class LoginResource(Resource):
         # Remove password from response
         user.pop('password', None)
         
+        # The dashboard usually loads next, so refresh missing or stale AI results in the background;
+        # a server-side switch because warm-ups spend AI quota
+        if AI_CACHE_WARM_ON_LOGIN:
+            cache_warmer.warm_user(user['_id'], user)
+        
         return {
             'message': 'Login successful',
             'token': token,
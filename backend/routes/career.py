@@ -5,13 +5,15 @@ import os
 from datetime import datetime
 import sys
 import logging
-import threading
-import queue
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.career import CareerModel
-from models.user import UserModel
-from services.gemini_service import GeminiService
+from models.user import UserModel, profile_hash
+from services.gemini_service import GeminiService, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from services.ai_timeouts import call_with_deadline
+from services.ai_cache import AIResultCache, cached_response_fields
+from services.cache_warmer import cache_warmer
 from utils.database import db
+from utils.salary import DEFAULT_CURRENCY
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +22,7 @@ class CareerResource(Resource):
         self.career_model = CareerModel(db)
         self.user_model = UserModel(db)
         self.gemini_service = GeminiService()
+        self.ai_cache = AIResultCache(db)
         self.parser = reqparse.RequestParser()
     
     def get(self, user_id=None):
@@ -45,15 +48,39 @@ class CareerResource(Resource):
         if not payload:
             return {'error': 'Invalid token'}, 401
         
+        # The caller (for their role, read from the profile as in the admin routes) and the
+        # requested user are loaded together in one query
+        users = self.user_model.get_users_by_ids([payload.get('user_id'), user_id])
+        caller, user = users[payload.get('user_id')], users[user_id]
+        
         # Check if user can access this data
-        if payload.get('user_id') != user_id and payload.get('role') != 'admin':
+        if payload.get('user_id') != user_id and (caller or {}).get('role') != 'admin':
             return {'error': 'Access denied'}, 403
         
-        # Get user profile
-        user = self.user_model.get_user_by_id(user_id)
         if not user:
             return {'error': 'User not found'}, 404
         
+        return self.recommendations_for_user(user_id, user)
+    
+    def recommendations_for_user(self, user_id, user):
+        """Recommendations response for an already authorized and loaded user; needs no request context"""
+        # Serve a cached result immediately, refreshing it in the background once stale;
+        # keying on the profile hash invalidates it as soon as AI-relevant fields change
+        cache_params = {'profile_hash': profile_hash(user)}
+        cached, is_stale = self.ai_cache.lookup('career_recommendations', user_id, cache_params)
+        if cached:
+            if is_stale and self.gemini_service.current_model:
+                self.ai_cache.refresh_in_background(
+                    'career_recommendations', user_id, cache_params,
+                    lambda: self._generate_recommendations(user, PRIORITY_BACKGROUND)
+                )
+            return dict({
+                'success': True,
+                'user_id': user_id,
+                'recommendations': cached['result'],
+                'timestamp': datetime.now().isoformat()
+            }, **cached_response_fields(cached, is_stale)), 200
+        
         # Check if Gemini is available before trying to use it
         if not self.gemini_service.current_model:
             # Use fallback immediately if Gemini is not available
@@ -61,40 +88,11 @@ class CareerResource(Resource):
         
         # Get AI recommendations with timeout (only if Gemini is available)
         try:
-            # Use threading with timeout to prevent blocking
-            result_queue = queue.Queue()
-            exception_queue = queue.Queue()
-            
-            def get_recommendations():
-                try:
-                    recommendations = self.gemini_service.get_career_recommendations(user)
-                    result_queue.put(recommendations)
-                except Exception as e:
-                    exception_queue.put(e)
-            
-            thread = threading.Thread(target=get_recommendations)
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout=8)  # 8 second timeout
-            
-            if thread.is_alive():
-                logger.warning("Gemini call timed out, using fallback")
-                return self._get_fallback_recommendations(user_id, user)
-            
-            if not exception_queue.empty():
-                raise exception_queue.get()
-            
-            if result_queue.empty():
-                raise Exception("No recommendations received")
-            
-            recommendations = result_queue.get()
-            
-            # Check if recommendations is empty (Gemini failed)
-            if not recommendations or recommendations == []:
-                raise Exception("Gemini service returned empty recommendations")
-            
-            # Transform Gemini response to match frontend expectations
-            transformed_recommendations = self._transform_recommendations(recommendations)
+            # Wait up to the adaptive deadline derived from recent Gemini latency
+            transformed_recommendations = call_with_deadline(
+                'career_recommendations', self._generate_recommendations, user
+            )
+            self.ai_cache.store('career_recommendations', user_id, cache_params, transformed_recommendations)
             
             return {
                 'success': True,
@@ -107,6 +105,31 @@ class CareerResource(Resource):
             # Fallback to basic career recommendations
             return self._get_fallback_recommendations(user_id, user)
     
+    def warm_cache(self, user_id, user):
+        """Start a background refresh if the user's cached recommendations are missing or stale"""
+        if not self.gemini_service.current_model:
+            return False
+        cache_params = {'profile_hash': profile_hash(user)}
+        cached, is_stale = self.ai_cache.lookup('career_recommendations', user_id, cache_params, record_stats=False)
+        if cached and not is_stale:
+            return False
+        return self.ai_cache.refresh_in_background(
+            'career_recommendations', user_id, cache_params,
+            lambda: self._generate_recommendations(user, PRIORITY_BACKGROUND),
+            notify=False
+        )
+    
+    def _generate_recommendations(self, user, priority=PRIORITY_INTERACTIVE):
+        """Generate transformed AI recommendations; independent of the request so it can run in the background"""
+        recommendations = self.gemini_service.get_career_recommendations(user, priority=priority)
+        
+        # Check if recommendations is empty (Gemini failed)
+        if not recommendations or recommendations == []:
+            raise Exception("Gemini service returned empty recommendations")
+        
+        # Transform Gemini response to match frontend expectations
+        return self._transform_recommendations(recommendations)
+    
     def _transform_recommendations(self, recommendations):
         """Transform Gemini recommendations to match frontend format"""
         transformed = []
@@ -223,8 +246,19 @@ class CareerResource(Resource):
         search_query = request.args.get('search')
         industry = request.args.get('industry')
         skills = request.args.get('skills')
+        min_salary = request.args.get('min_salary', type=int)
+        max_salary = request.args.get('max_salary', type=int)
+        currency = request.args.get('currency', DEFAULT_CURRENCY).upper()
         
-        if search_query:
+        if min_salary is not None or max_salary is not None:
+            # Salary bounds combine with the other filters
+            careers = self.career_model.get_careers_by_salary(
+                min_salary, max_salary, currency,
+                search=search_query,
+                industry=industry,
+                skills=skills.split(',') if skills else None
+            )
+        elif search_query:
             careers = self.career_model.search_careers(search_query)
         elif industry:
             careers = self.career_model.get_careers_by_industry(industry)
@@ -359,3 +393,5 @@ class CareerResource(Resource):
             return None
         except jwt.InvalidTokenError:
             return None
+
+cache_warmer.register('career_recommendations', lambda user_id, user: CareerResource().warm_cache(user_id, user))
@@ -4,9 +4,20 @@ from utils.database import db
 from datetime import datetime
 import logging
 from bson import ObjectId
+from models.milestone_reminder import MilestoneReminderModel
+from services.milestone_scheduler import milestone_scheduler
 
 logger = logging.getLogger(__name__)
 
+def _track_milestone(user_id, milestone):
+    """Keep the reminder projection in step with a milestone; a failure never fails the request"""
+    try:
+        reminder = MilestoneReminderModel(db).track(user_id, milestone)
+        if reminder:
+            milestone_scheduler.schedule(reminder)
+    except Exception as e:
+        logger.warning(f"Failed to update reminder for milestone {milestone.get('id')}: {e}")
+
 class CareerPlanResource(Resource):
     def get(self):
         """Get user's career plan"""
@@ -169,6 +180,7 @@ class CareerMilestonesResource(Resource):
                 {'$push': {'milestones': milestone}},
                 upsert=True
             )
+            _track_milestone(user_id, milestone)
             
             return jsonify({
                 'success': True,
@@ -205,9 +217,11 @@ class CareerMilestoneResource(Resource):
                 }), 404
             
             # Update milestone completion status
+            toggled = None
             for milestone in plan.get('milestones', []):
                 if milestone['id'] == milestone_id:
                     milestone['completed'] = not milestone.get('completed', False)
+                    toggled = milestone
                     break
             
             # Update the plan
@@ -215,6 +229,8 @@ class CareerMilestoneResource(Resource):
                 {'user_id': user_id},
                 {'$set': {'milestones': plan['milestones'], 'updated_at': datetime.now()}}
             )
+            if toggled:
+                _track_milestone(user_id, toggled)
             
             return jsonify({
                 'success': True,
@@ -1,18 +1,26 @@
 from flask_restful import Resource, reqparse
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 import jwt
 import os
+import json
 from datetime import datetime
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.user import UserModel
+from models.chat_session import ChatSessionModel
 from services.gemini_service import GeminiService
+from services.intent_router import get_intent_router
+from services.semantic_cache import chat_response_cache, is_profile_independent
+from services.retention import ConversationArchiver
+from services.skill_extractor import get_skill_extractor
 from utils.database import db
 
 class ChatbotResource(Resource):
     def __init__(self):
         self.user_model = UserModel(db)
+        self.chat_session_model = ChatSessionModel(db)
         self.gemini_service = GeminiService()
+        self.intent_router = get_intent_router(db)
         self.parser = reqparse.RequestParser()
     
     def post(self):
@@ -39,7 +47,7 @@ class ChatbotResource(Resource):
                 return {'error': 'Message is required'}, 400
             
             context = data.get('context', '')
-            conversation_history = data.get('conversation_history', [])
+            session_id = data.get('session_id')
             
         except Exception as e:
             return {'error': 'Invalid JSON data'}, 400
@@ -49,6 +57,46 @@ class ChatbotResource(Resource):
         if not user:
             return {'error': 'User not found'}, 404
         
+        # Load the server-side session, starting a new one if missing or not owned by user
+        session = self.chat_session_model.get_session(session_id, user_id) if session_id else None
+        if not session:
+            session_id = self.chat_session_model.create_session(user_id)
+            session = {'summary': '', 'recent_turns': []}
+        
+        # Answer common FAQ-style questions locally without a Gemini call
+        routed = self.intent_router.route(message, user)
+        if routed:
+            self._store_conversation(user_id, message, routed['response'], session_id, routed['intent'])
+            self.chat_session_model.append_turn(session_id, message, routed['response'])
+            
+            return {
+                'success': True,
+                'message': message,
+                'response': routed['response'],
+                'session_id': session_id,
+                'intent': routed['intent'],
+                'timestamp': datetime.now().isoformat(),
+                'user_id': user_id
+            }, 200
+        
+        # Generic questions share answers across users, so near-duplicates skip Gemini
+        cacheable = not context and is_profile_independent(message)
+        if cacheable:
+            cached_response = chat_response_cache.get(message)
+            if cached_response:
+                self._store_conversation(user_id, message, cached_response, session_id)
+                self.chat_session_model.append_turn(session_id, message, cached_response)
+                
+                return {
+                    'success': True,
+                    'message': message,
+                    'response': cached_response,
+                    'session_id': session_id,
+                    'cached': True,
+                    'timestamp': datetime.now().isoformat(),
+                    'user_id': user_id
+                }, 200
+        
         # Build context string
         user_context = f"""
         User Profile:
@@ -64,15 +112,27 @@ class ChatbotResource(Resource):
         
         # Get AI response
         try:
-            response = self.gemini_service.chat_response(message, full_context)
+            if cacheable:
+                # Answer without profile or history so the cached response is valid for anyone
+                response = self.gemini_service.chat_response(message)
+                chat_response_cache.put(message, response)
+            else:
+                response = self.gemini_service.chat_response(
+                    message,
+                    full_context,
+                    summary=session.get('summary', ''),
+                    history=session.get('recent_turns', [])
+                )
             
             # Store conversation in database (optional)
-            self._store_conversation(user_id, message, response)
+            self._store_conversation(user_id, message, response, session_id)
+            self.chat_session_model.append_turn(session_id, message, response)
             
             return {
                 'success': True,
                 'message': message,
                 'response': response,
+                'session_id': session_id,
                 'timestamp': datetime.now().isoformat(),
                 'user_id': user_id
             }, 200
@@ -98,6 +158,7 @@ class ChatbotResource(Resource):
                 'success': True,
                 'message': message,
                 'response': fallback_response,
+                'session_id': session_id,
                 'exception': str(e),
                 'timestamp': datetime.now().isoformat(),
                 'user_id': user_id
@@ -127,13 +188,17 @@ class ChatbotResource(Resource):
         except Exception as e:
             return {'error': f'Failed to get conversation history: {str(e)}'}, 500
     
-    def _store_conversation(self, user_id, message, response):
+    def _store_conversation(self, user_id, message, response, session_id=None, intent=None):
         """Store conversation in database"""
         try:
             conversation_data = {
                 'user_id': user_id,
+                'session_id': session_id,
                 'message': message,
                 'response': response,
+                'intent': intent,
+                # Catalog skills the user mentioned, for later analysis without re-parsing
+                'skills': get_skill_extractor(db).extract(message),
                 'timestamp': datetime.now()
             }
             
@@ -173,3 +238,40 @@ class ChatbotResource(Resource):
         except jwt.InvalidTokenError:
             return None
 
+
+class ChatHistoryExportResource(Resource):
+    def get(self):
+        """Export the full conversation history, including archived turns, as JSON lines"""
+        # Verify token
+        token = request.headers.get('Authorization')
+        if not token:
+            return {'error': 'Authorization token required'}, 401
+
+        payload = self._verify_token(token)
+        if not payload:
+            return {'error': 'Invalid token'}, 401
+
+        user_id = payload.get('user_id')
+        archiver = ConversationArchiver(db)
+
+        def export():
+            for turn in archiver.iter_history(user_id):
+                yield json.dumps(turn, default=str) + '\n'
+
+        return Response(stream_with_context(export()), mimetype='application/x-ndjson', headers={
+            'Content-Disposition': 'attachment; filename=conversation-history.jsonl'
+        })
+
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
@@ -0,0 +1,117 @@
+from flask_restful import Resource
+from flask import request
+import jwt
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+import sys
+import logging
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.user import UserModel
+from routes.career import CareerResource
+from routes.skills import SkillsResource
+from routes.job_market import JobMarketResource
+from routes.notifications import NotificationsResource
+from utils.database import db
+
+logger = logging.getLogger(__name__)
+
+# Seconds the whole dashboard waits for its sections; slower sections are reported as timed out
+DASHBOARD_DEADLINE = float(os.getenv('DASHBOARD_DEADLINE', 10))
+DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS', 16))
+
+DASHBOARD_SECTIONS = ('recommendations', 'skills_analysis', 'job_market', 'notifications')
+
+# Shared so sections that miss the deadline finish in the background and still fill the AI caches
+_section_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix='dashboard')
+
+class DashboardResource(Resource):
+    def __init__(self):
+        self.user_model = UserModel(db)
+        self.career_resource = CareerResource()
+        self.skills_resource = SkillsResource()
+        self.job_market_resource = JobMarketResource()
+        self.notifications_resource = NotificationsResource()
+
+    def get(self, user_id):
+        """Get everything the dashboard shows in one request"""
+        # Verify token
+        token = request.headers.get('Authorization')
+        if not token:
+            return {'error': 'Authorization token required'}, 401
+
+        payload = self._verify_token(token)
+        if not payload:
+            return {'error': 'Invalid token'}, 401
+
+        # The caller (for their role, read from the profile as in the admin routes) and the
+        # requested user are loaded together in one query
+        users = self.user_model.get_users_by_ids([payload.get('user_id'), user_id])
+        caller, user = users[payload.get('user_id')], users[user_id]
+
+        # Check if user can access this data
+        if payload.get('user_id') != user_id and (caller or {}).get('role') != 'admin':
+            return {'error': 'Access denied'}, 403
+
+        if not user:
+            return {'error': 'User not found'}, 404
+
+        requested = request.args.get('sections')
+        names = [name for name in requested.split(',') if name in DASHBOARD_SECTIONS] if requested else DASHBOARD_SECTIONS
+
+        builders = {
+            'recommendations': lambda: self.career_resource.recommendations_for_user(user_id, dict(user)),
+            'skills_analysis': lambda: self.skills_resource.analysis_for_user(user_id, dict(user)),
+            'job_market': lambda: self.job_market_resource.analysis_for_user(user_id, dict(user)),
+            'notifications': lambda: self.notifications_resource.notifications_for_user(user_id)
+        }
+
+        # Fan out all sections under one deadline
+        futures = {_section_executor.submit(self._timed, builders[name]): name for name in names}
+        done, _ = wait(futures, timeout=DASHBOARD_DEADLINE)
+
+        sections = {}
+        for future, name in futures.items():
+            if future not in done:
+                sections[name] = {'status': 'timeout', 'data': None}
+                continue
+            try:
+                (data, status_code), elapsed = future.result()
+                sections[name] = {
+                    'status': 'ok' if status_code < 400 else 'error',
+                    'data': data,
+                    'elapsed_ms': round(elapsed * 1000)
+                }
+            except Exception as e:
+                logger.warning(f"Dashboard section {name} failed for user {user_id}: {e}")
+                sections[name] = {'status': 'error', 'data': None, 'error': str(e)}
+
+        user.pop('password', None)
+
+        return {
+            'success': True,
+            'user_id': user_id,
+            'profile': user,
+            'sections': sections,
+            'complete': all(section['status'] == 'ok' for section in sections.values()),
+            'timestamp': datetime.now().isoformat()
+        }, 200
+
+    def _timed(self, builder):
+        started = time.monotonic()
+        return builder(), time.monotonic() - started
+
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
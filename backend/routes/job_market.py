@@ -5,11 +5,13 @@ import os
 from datetime import datetime
 import sys
 import logging
-import threading
-import queue
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from services.gemini_service import GeminiService
-from models.user import UserModel
+from services.gemini_service import GeminiService, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from services.ai_timeouts import call_with_deadline
+from services.ai_cache import AIResultCache, cached_response_fields
+from services.job_market_aggregates import JobMarketAggregates
+from utils.salary import parse_salary, salary_fields
+from models.user import UserModel, profile_hash
 from utils.database import db
 
 logger = logging.getLogger(__name__)
@@ -18,6 +20,8 @@ class JobMarketResource(Resource):
     def __init__(self):
         self.gemini_service = GeminiService()
         self.user_model = UserModel(db)
+        self.ai_cache = AIResultCache(db)
+        self.market_aggregates = JobMarketAggregates(db)
         self.parser = reqparse.RequestParser()
     
     def get(self):
@@ -39,13 +43,17 @@ class JobMarketResource(Resource):
         career_field = request.args.get('career_field', '')
         
         # Get user profile if user_id is provided
+        user = self.user_model.get_user_by_id(user_id) if user_id else None
+        
+        return self.analysis_for_user(user_id, user, career_field, industry, location, experience_level)
+    
+    def analysis_for_user(self, user_id, user, career_field='', industry='', location='', experience_level=''):
+        """Job market response for an optional, already loaded user; needs no request context"""
         user_profile = None
-        if user_id:
-            user = self.user_model.get_user_by_id(user_id)
-            if user:
-                # Remove system fields from user profile
-                user_profile = {k: v for k, v in user.items() 
-                              if k not in ['_id', 'password', 'created_at', 'updated_at', 'is_active', 'token']}
+        if user:
+            # Remove system fields from user profile
+            user_profile = {k: v for k, v in user.items() 
+                          if k not in ['_id', 'password', 'created_at', 'updated_at', 'is_active', 'token']}
         
         # Determine career field from user profile or use default
         if not career_field:
@@ -63,6 +71,30 @@ class JobMarketResource(Resource):
             else:
                 career_field = industry if industry else 'Technology'
         
+        # Serve a cached result immediately, refreshing it in the background once stale
+        cache_user_id = user_id if user_profile else None
+        cache_params = {
+            'career_field': career_field,
+            'industry': industry,
+            'location': location,
+            'experience_level': experience_level,
+            'profile_hash': profile_hash(user) if user_profile else None
+        }
+        cached, is_stale = self.ai_cache.lookup('job_market', cache_user_id, cache_params)
+        if cached:
+            if is_stale and self.gemini_service.current_model:
+                self.ai_cache.refresh_in_background(
+                    'job_market', cache_user_id, cache_params,
+                    lambda: self._generate_analysis(user_profile, career_field, industry, location,
+                                                    experience_level, PRIORITY_BACKGROUND)
+                )
+            return dict({
+                'success': True,
+                'career_field': career_field,
+                'analysis': self._with_market_data(cached['result'], career_field, industry, location, experience_level),
+                'timestamp': datetime.now().isoformat()
+            }, **cached_response_fields(cached, is_stale)), 200
+        
         # Check if Gemini is available before trying to use it
         if not self.gemini_service.current_model:
             # Use fallback immediately if Gemini is not available
@@ -76,57 +108,17 @@ class JobMarketResource(Resource):
         
         # Get AI job market analysis with timeout (only if Gemini is available)
         try:
-            # Use threading with timeout to prevent blocking
-            result_queue = queue.Queue()
-            exception_queue = queue.Queue()
-            
-            def get_analysis():
-                try:
-                    analysis = self.gemini_service.get_job_market_analysis(
-                        user_profile=user_profile,
-                        career_field=career_field,
-                        industry=industry if industry else None,
-                        location=location if location else None,
-                        experience_level=experience_level if experience_level else None
-                    )
-                    result_queue.put(analysis)
-                except Exception as e:
-                    exception_queue.put(e)
-            
-            thread = threading.Thread(target=get_analysis)
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout=15)  # Increased timeout to 15 seconds for more complex analysis
-            
-            if thread.is_alive():
-                logger.warning("Gemini call timed out, using fallback")
-                fallback_analysis = self._get_fallback_analysis(user_profile, career_field, industry, location, experience_level)
-                return {
-                    'success': True,
-                    'career_field': career_field,
-                    'analysis': fallback_analysis,
-                    'timestamp': datetime.now().isoformat()
-                }, 200
-            
-            if not exception_queue.empty():
-                raise exception_queue.get()
-            
-            if result_queue.empty():
-                raise Exception("No analysis received")
-            
-            analysis = result_queue.get()
-            
-            # Check if analysis is empty (Gemini failed)
-            if not analysis or analysis == {}:
-                raise Exception("Gemini service returned empty analysis")
-            
-            # Transform Gemini response to match frontend expectations
-            transformed_analysis = self._transform_job_market_analysis(analysis, career_field)
+            # Wait up to the adaptive deadline derived from recent Gemini latency
+            transformed_analysis = call_with_deadline(
+                'job_market', self._generate_analysis,
+                user_profile, career_field, industry, location, experience_level
+            )
+            self.ai_cache.store('job_market', cache_user_id, cache_params, transformed_analysis)
             
             return {
                 'success': True,
                 'career_field': career_field,
-                'analysis': transformed_analysis,
+                'analysis': self._with_market_data(transformed_analysis, career_field, industry, location, experience_level),
                 'timestamp': datetime.now().isoformat()
             }, 200
             
@@ -142,6 +134,25 @@ class JobMarketResource(Resource):
                 'timestamp': datetime.now().isoformat()
             }, 200
     
+    def _generate_analysis(self, user_profile, career_field, industry, location, experience_level,
+                           priority=PRIORITY_INTERACTIVE):
+        """Generate the transformed AI job market analysis; independent of the request so it can run in the background"""
+        analysis = self.gemini_service.get_job_market_analysis(
+            user_profile=user_profile,
+            career_field=career_field,
+            industry=industry if industry else None,
+            location=location if location else None,
+            experience_level=experience_level if experience_level else None,
+            priority=priority
+        )
+        
+        # Check if analysis is empty (Gemini failed)
+        if not analysis or analysis == {}:
+            raise Exception("Gemini service returned empty analysis")
+        
+        # Transform Gemini response to match frontend expectations
+        return self._transform_job_market_analysis(analysis, career_field)
+    
     def _transform_job_market_analysis(self, analysis, career_field):
         """Transform Gemini job market analysis to match frontend format"""
         # Ensure overall_trends structure
@@ -151,25 +162,11 @@ class JobMarketResource(Resource):
                 'description': analysis.get('market_trends', analysis.get('description', f'The {career_field} industry is experiencing growth.'))
             }
         
-        # Ensure average_salary is a number
-        if 'average_salary' not in analysis:
-            # Try to extract from salary_range if available
-            salary_range = analysis.get('salary_range', '')
-            if isinstance(salary_range, str) and '$' in salary_range:
-                # Try to extract number
-                import re
-                numbers = re.findall(r'\d+', salary_range.replace(',', ''))
-                if numbers:
-                    analysis['average_salary'] = int(sum([int(n) for n in numbers]) / len(numbers))
-                else:
-                    analysis['average_salary'] = 75000
-            else:
-                analysis['average_salary'] = 75000
-        elif isinstance(analysis['average_salary'], str):
-            # Convert string to number if needed
-            import re
-            numbers = re.findall(r'\d+', analysis['average_salary'].replace(',', ''))
-            analysis['average_salary'] = int(numbers[0]) if numbers else 75000
+        # Ensure average_salary is a number, parsed from the model's text when it gave one
+        average_salary = analysis.get('average_salary')
+        if isinstance(average_salary, bool) or not isinstance(average_salary, (int, float)):
+            salary = parse_salary(average_salary) or parse_salary(analysis.get('salary_range'))
+            analysis['average_salary'] = (salary['salary_min'] + salary['salary_max']) // 2 if salary else 75000
         
         # Ensure industry_analysis is an array
         if 'industry_analysis' not in analysis or not isinstance(analysis['industry_analysis'], list):
@@ -181,6 +178,28 @@ class JobMarketResource(Resource):
         
         return analysis
     
+    def _with_market_data(self, analysis, career_field, industry='', location='', experience_level=''):
+        """Merge figures from the materialized job_market aggregates into an AI analysis.
+
+        Done per response rather than before caching, so cached AI results always carry current data.
+        """
+        try:
+            market_data = self.market_aggregates.market_data(industry or career_field, location, experience_level)
+        except Exception as e:
+            logger.warning(f"Failed to load job market aggregates: {e}")
+            return analysis
+        if not market_data:
+            return analysis
+
+        analysis = dict(analysis, market_data=market_data)
+        # The industry's stored salary beats the model's estimate. Location and experience level
+        # aggregates span every industry, so they never replace an estimate for this one
+        salary = market_data.get('industry', {}).get('salary', {}).get('avg')
+        if salary:
+            analysis['ai_average_salary'] = analysis.get('average_salary')
+            analysis['average_salary'] = salary
+        return analysis
+    
     def _get_fallback_analysis(self, user_profile=None, career_field='Technology', industry='', location='', experience_level=''):
         """Get fallback job market analysis based on filters and user profile"""
         # Base salary adjustments by experience level
@@ -268,7 +287,7 @@ class JobMarketResource(Resource):
         description_parts.append('with increasing demand for skilled professionals.')
         description = ' '.join(description_parts)
         
-        return {
+        fallback = {
             'overall_trends': {
                 'trend': 'Up',
                 'description': description
@@ -277,6 +296,25 @@ class JobMarketResource(Resource):
             'industry_analysis': industry_analysis,
             'top_locations': top_locations
         }
+        
+        # Prefer figures from the job_market collection; the estimates above fill any gaps
+        try:
+            market_analysis = self.market_aggregates.market_analysis(selected_industry, location, experience_level)
+        except Exception as e:
+            logger.warning(f"Failed to load job market aggregates: {e}")
+            market_analysis = None
+        return self._merge_market_analysis(fallback, market_analysis) if market_analysis else fallback
+    
+    def _merge_market_analysis(self, fallback, market_analysis):
+        """Stored figures replace the fallback's estimates field by field; fields without data keep
+        the estimate, and stored locations are topped up with estimated ones"""
+        analysis = dict(fallback, **market_analysis)
+        if 'top_locations' in market_analysis:
+            names = {entry['name'] for entry in market_analysis['top_locations']}
+            analysis['top_locations'] = (market_analysis['top_locations'] + [
+                entry for entry in fallback['top_locations'] if entry['name'] not in names
+            ])[:3]
+        return analysis
     
     def post(self):
         """Create job market entry (admin only)"""
@@ -298,12 +336,16 @@ class JobMarketResource(Resource):
         self.parser.add_argument('required_skills', type=list, location='json', required=True)
         self.parser.add_argument('geographic_hotspots', type=list, location='json')
         self.parser.add_argument('industry_insights', type=str)
+        self.parser.add_argument('industry', type=str)
+        self.parser.add_argument('job_title', type=str)
+        self.parser.add_argument('experience_level', type=str)
         
         args = self.parser.parse_args()
         
         # Add timestamp
         args['created_at'] = datetime.now()
         args['updated_at'] = datetime.now()
+        args.update(salary_fields(args['salary_range']))
         
         # Create job market entry
         try:
@@ -312,8 +354,11 @@ class JobMarketResource(Resource):
             
             # Get created entry
             entry = db.job_market.find_one({'_id': result.inserted_id})
+            self.market_aggregates.refresh_for(entry)
             if entry:
                 entry['_id'] = str(entry['_id'])
+                for field in ('created_at', 'updated_at'):
+                    entry[field] = entry[field].isoformat()
             
             return {
                 'message': 'Job market entry created successfully',
@@ -346,6 +391,9 @@ class JobMarketResource(Resource):
         self.parser.add_argument('required_skills', type=list, location='json')
         self.parser.add_argument('geographic_hotspots', type=list, location='json')
         self.parser.add_argument('industry_insights', type=str)
+        self.parser.add_argument('industry', type=str)
+        self.parser.add_argument('job_title', type=str)
+        self.parser.add_argument('experience_level', type=str)
         
         args = self.parser.parse_args()
         
@@ -357,22 +405,29 @@ class JobMarketResource(Resource):
         
         # Add update timestamp
         update_data['updated_at'] = datetime.now()
+        if 'salary_range' in update_data:
+            update_data.update(salary_fields(update_data['salary_range']))
         
         # Update entry
         try:
             from bson import ObjectId
-            result = db.job_market.update_one(
+            # Previous values matter too: aggregates the entry leaves need recomputing
+            previous = db.job_market.find_one_and_update(
                 {'_id': ObjectId(entry_id)},
                 {'$set': update_data}
             )
             
-            if result.modified_count == 0:
+            if not previous:
                 return {'error': 'Entry not found'}, 404
             
             # Get updated entry
             entry = db.job_market.find_one({'_id': ObjectId(entry_id)})
+            self.market_aggregates.refresh_for(previous, entry)
             if entry:
                 entry['_id'] = str(entry['_id'])
+                for field in ('created_at', 'updated_at'):
+                    if isinstance(entry.get(field), datetime):
+                        entry[field] = entry[field].isoformat()
             
             return {
                 'message': 'Job market entry updated successfully',
@@ -399,10 +454,11 @@ class JobMarketResource(Resource):
         # Delete entry
         try:
             from bson import ObjectId
-            result = db.job_market.delete_one({'_id': ObjectId(entry_id)})
+            entry = db.job_market.find_one_and_delete({'_id': ObjectId(entry_id)})
             
-            if result.deleted_count == 0:
+            if not entry:
                 return {'error': 'Entry not found'}, 404
+            self.market_aggregates.refresh_for(entry)
             
             return {'message': 'Job market entry deleted successfully'}, 200
             
@@ -3,16 +3,21 @@ from flask import request, jsonify, Response
 import jwt
 import os
 from datetime import datetime
+from bson.errors import InvalidId
 import json
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.user import UserModel
+from models.notification import NotificationModel
+from services.notification_broker import notification_broker, TooManyStreams, NOTIFICATION_HEARTBEAT_SECONDS
 from services.gemini_service import GeminiService
+from services.cache_warmer import cache_warmer
 from utils.database import db
 
 class NotificationsResource(Resource):
     def __init__(self):
         self.user_model = UserModel(db)
+        self.notification_model = NotificationModel(db)
         self.gemini_service = GeminiService()
         self.parser = reqparse.RequestParser()
     
@@ -40,14 +45,13 @@ class NotificationsResource(Resource):
         if payload.get('user_id') != user_id and payload.get('role') != 'admin':
             return {'error': 'Access denied'}, 403
         
+        return self.notifications_for_user(user_id)
+    
+    def notifications_for_user(self, user_id, limit=50):
+        """Latest notifications for an already authorized user; needs no request context"""
         # Get notifications from database
         try:
-            notifications = list(db.notifications.find(
-                {'user_id': user_id}
-            ).sort('timestamp', -1).limit(50))
-            
-            for notification in notifications:
-                notification['_id'] = str(notification['_id'])
+            notifications = self.notification_model.get_user_notifications(user_id, limit)
             
             return {
                 'notifications': notifications,
@@ -108,25 +112,11 @@ class NotificationsResource(Resource):
         if payload.get('user_id') != args['user_id'] and payload.get('role') != 'admin':
             return {'error': 'Access denied'}, 403
         
-        # Create notification
+        # Create notification and push it to the user's open streams
         try:
-            notification_data = {
-                'user_id': args['user_id'],
-                'title': args['title'],
-                'message': args['message'],
-                'type': args['type'],
-                'priority': args['priority'],
-                'is_read': False,
-                'timestamp': datetime.now()
-            }
-            
-            result = db.notifications.insert_one(notification_data)
-            notification_id = str(result.inserted_id)
-            
-            # Get created notification
-            notification = db.notifications.find_one({'_id': result.inserted_id})
-            if notification:
-                notification['_id'] = str(notification['_id'])
+            notification = self.notification_model.create_notification(
+                args['user_id'], args['title'], args['message'], args['type'], args['priority']
+            )
             
             return {
                 'message': 'Notification created successfully',
@@ -136,8 +126,10 @@ class NotificationsResource(Resource):
         except Exception as e:
             return {'error': f'Failed to create notification: {str(e)}'}, 500
     
-    def put(self, notification_id=None):
+    def put(self, notification_id=None, user_id=None):
         """Mark notification as read"""
+        # The shared route names its path segment user_id
+        notification_id = notification_id or user_id
         if not notification_id:
             return {'error': 'Notification ID required'}, 400
         
@@ -150,24 +142,25 @@ class NotificationsResource(Resource):
         if not payload:
             return {'error': 'Invalid token'}, 401
         
-        # Mark notification as read
+        # Users may only touch their own notifications
+        owner_id = None if payload.get('role') == 'admin' else payload.get('user_id')
+        
+        # Mark notification as read, keeping the unread counter in step
         try:
-            from bson import ObjectId
-            result = db.notifications.update_one(
-                {'_id': ObjectId(notification_id)},
-                {'$set': {'is_read': True, 'read_at': datetime.now()}}
-            )
-            
-            if result.modified_count == 0:
-                return {'error': 'Notification not found'}, 404
+            if not self.notification_model.mark_read(notification_id, owner_id):
+                if not self.notification_model.exists(notification_id, owner_id):
+                    return {'error': 'Notification not found'}, 404
+                return {'message': 'Notification already read'}, 200
             
             return {'message': 'Notification marked as read'}, 200
             
         except Exception as e:
             return {'error': f'Failed to update notification: {str(e)}'}, 500
     
-    def delete(self, notification_id=None):
+    def delete(self, notification_id=None, user_id=None):
         """Delete notification"""
+        # The shared route names its path segment user_id
+        notification_id = notification_id or user_id
         if not notification_id:
             return {'error': 'Notification ID required'}, 400
         
@@ -180,12 +173,11 @@ class NotificationsResource(Resource):
         if not payload:
             return {'error': 'Invalid token'}, 401
         
+        owner_id = None if payload.get('role') == 'admin' else payload.get('user_id')
+        
         # Delete notification
         try:
-            from bson import ObjectId
-            result = db.notifications.delete_one({'_id': ObjectId(notification_id)})
-            
-            if result.deleted_count == 0:
+            if not self.notification_model.delete_notification(notification_id, owner_id):
                 return {'error': 'Notification not found'}, 404
             
             return {'message': 'Notification deleted successfully'}, 200
@@ -207,5 +199,159 @@ class NotificationsResource(Resource):
         except jwt.InvalidTokenError:
             return None
 
+class NotificationStreamResource(Resource):
+    def get(self):
+        """Server-sent event stream of the caller's new notifications"""
+        # EventSource cannot set headers, so the token may also come as a query parameter
+        token = request.headers.get('Authorization') or request.args.get('token')
+        if not token:
+            return {'error': 'Authorization token required'}, 401
+        
+        payload = self._verify_token(token)
+        if not payload or not payload.get('user_id'):
+            return {'error': 'Invalid token'}, 401
+        
+        notification_broker.start_tailer(db.notifications)
+        try:
+            subscription = notification_broker.subscribe(payload['user_id'])
+        except TooManyStreams as e:
+            return {'error': str(e)}, 429
+        
+        def stream():
+            try:
+                # Reconnect after 5 seconds if the connection drops
+                yield 'retry: 5000\n\n'
+                while True:
+                    event = subscription.next_event(NOTIFICATION_HEARTBEAT_SECONDS)
+                    if subscription.take_overflow():
+                        # Events were dropped; the client should refetch the list
+                        yield 'event: resync\ndata: {}\n\n'
+                    if event is None:
+                        # Comment line keeps proxies from closing an idle connection
+                        yield ': heartbeat\n\n'
+                        continue
+                    yield f"id: {event['_id']}\nevent: notification\ndata: {json.dumps(event)}\n\n"
+            finally:
+                notification_broker.unsubscribe(subscription)
+        
+        return Response(stream(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+    
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
+
+class NotificationUnreadCountResource(Resource):
+    def __init__(self):
+        self.notification_model = NotificationModel(db)
+    
+    def get(self):
+        """Unread notification count for the badge"""
+        # Verify token
+        token = request.headers.get('Authorization')
+        if not token:
+            return {'error': 'Authorization token required'}, 401
+        
+        payload = self._verify_token(token)
+        if not payload:
+            return {'error': 'Invalid token'}, 401
+        
+        user_id = request.args.get('user_id') or payload.get('user_id')
+        if payload.get('user_id') != user_id and payload.get('role') != 'admin':
+            return {'error': 'Access denied'}, 403
+        
+        try:
+            return {
+                'user_id': user_id,
+                'unread_count': self.notification_model.get_unread_count(user_id)
+            }, 200
+        except Exception as e:
+            return {'error': f'Failed to get unread count: {str(e)}'}, 500
+    
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
+
 
+class NotificationBulkResource(Resource):
+    def __init__(self):
+        self.notification_model = NotificationModel(db)
+    
+    def put(self):
+        """Mark many notifications as read: {"ids": [...]} or {"all": true}"""
+        return self._bulk(read=True)
+    
+    def delete(self):
+        """Delete many notifications: {"ids": [...]}"""
+        return self._bulk(read=False)
+    
+    def _bulk(self, read):
+        # Verify token
+        token = request.headers.get('Authorization')
+        if not token:
+            return {'error': 'Authorization token required'}, 401
+        
+        payload = self._verify_token(token)
+        if not payload:
+            return {'error': 'Invalid token'}, 401
+        
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('user_id') or payload.get('user_id')
+        if payload.get('user_id') != user_id and payload.get('role') != 'admin':
+            return {'error': 'Access denied'}, 403
+        
+        ids = data.get('ids') or []
+        read_all = bool(read and data.get('all'))
+        if not ids and not read_all:
+            return {'error': 'Notification ids required'}, 400
+        
+        try:
+            if read:
+                result = self.notification_model.bulk_update(user_id, read_ids=ids, read_all=read_all)
+            else:
+                result = self.notification_model.bulk_update(user_id, delete_ids=ids)
+            
+            return dict(result, user_id=user_id,
+                        unread_count=self.notification_model.get_unread_count(user_id)), 200
+        except InvalidId as e:
+            return {'error': f'Invalid notification id: {str(e)}'}, 400
+        except Exception as e:
+            return {'error': f'Failed to update notifications: {str(e)}'}, 500
+    
+    def _verify_token(self, token):
+        """Verify JWT token"""
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            
+            secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            return payload
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
 
+cache_warmer.register('notification_unread_count', lambda user_id, user: NotificationModel(db).warm_unread_count(user_id))
@@ -5,12 +5,13 @@ import os
 from datetime import datetime
 import sys
 import logging
-import threading
-import queue
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.skills import SkillsModel
-from models.user import UserModel
-from services.gemini_service import GeminiService
+from models.user import UserModel, profile_hash
+from services.gemini_service import GeminiService, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from services.ai_timeouts import call_with_deadline
+from services.ai_cache import AIResultCache, cached_response_fields
+from services.cache_warmer import cache_warmer
 from utils.database import db
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,7 @@ class SkillsResource(Resource):
         self.skills_model = SkillsModel(db)
         self.user_model = UserModel(db)
         self.gemini_service = GeminiService()
+        self.ai_cache = AIResultCache(db)
         self.parser = reqparse.RequestParser()
     
     def get(self, user_id=None):
@@ -45,32 +47,46 @@ class SkillsResource(Resource):
         if not payload:
             return {'error': 'Invalid token'}, 401
         
+        # The caller (for their role, read from the profile as in the admin routes) and the
+        # requested user are loaded together in one query
+        users = self.user_model.get_users_by_ids([payload.get('user_id'), user_id])
+        caller, user = users[payload.get('user_id')], users[user_id]
+        
         # Check if user can access this data
-        if payload.get('user_id') != user_id and payload.get('role') != 'admin':
+        if payload.get('user_id') != user_id and (caller or {}).get('role') != 'admin':
             return {'error': 'Access denied'}, 403
         
-        # Get user profile
-        user = self.user_model.get_user_by_id(user_id)
         if not user:
             return {'error': 'User not found'}, 404
         
+        # Determine target career from user profile or query params
+        return self.analysis_for_user(user_id, user, request.args.get('career'))
+    
+    def analysis_for_user(self, user_id, user, target_career=None):
+        """Skills gap response for an already authorized and loaded user; needs no request context"""
         # Remove system fields from user profile for analysis
-        user_profile = {k: v for k, v in user.items() if k not in ['_id', 'password', 'created_at', 'updated_at', 'is_active', 'token']}
-        
+        user_profile = self._analysis_profile(user)
         user_skills = user.get('skills', [])
-        career_goals = user.get('career_goals', [])
-        goals_text = user.get('goals', '')
-        
-        # Determine target career from user profile or query params
-        target_career = request.args.get('career')
-        if not target_career:
-            if career_goals and len(career_goals) > 0:
-                target_career = career_goals[0] if isinstance(career_goals, list) else str(career_goals)
-            elif goals_text:
-                # Extract first meaningful career mention (simplified)
-                target_career = goals_text.split('.')[0][:50] if goals_text else 'Career Development'
-            else:
-                target_career = 'Career Development'
+        target_career = target_career or self._default_target_career(user)
+        
+        # Serve a cached result immediately, refreshing it in the background once stale;
+        # keying on the profile hash invalidates it as soon as AI-relevant fields change
+        cache_params = {'target_career': target_career, 'profile_hash': profile_hash(user)}
+        cached, is_stale = self.ai_cache.lookup('skills_gap', user_id, cache_params)
+        if cached:
+            if is_stale and self.gemini_service.current_model:
+                self.ai_cache.refresh_in_background(
+                    'skills_gap', user_id, cache_params,
+                    lambda: self._generate_skills_analysis(user_profile, user_skills, target_career, PRIORITY_BACKGROUND)
+                )
+            return dict({
+                'success': True,
+                'user_id': user_id,
+                'target_career': target_career,
+                'user_skills': user_skills,
+                'analysis': cached['result'],
+                'timestamp': datetime.now().isoformat()
+            }, **cached_response_fields(cached, is_stale)), 200
         
         # Check if Gemini is available before trying to use it
         if not self.gemini_service.current_model:
@@ -79,40 +95,11 @@ class SkillsResource(Resource):
         
         # Get AI skills gap analysis with timeout (only if Gemini is available)
         try:
-            # Use threading with timeout to prevent blocking
-            result_queue = queue.Queue()
-            exception_queue = queue.Queue()
-            
-            def get_analysis():
-                try:
-                    gap_analysis = self.gemini_service.analyze_skills_gap(user_profile, target_career)
-                    result_queue.put(gap_analysis)
-                except Exception as e:
-                    exception_queue.put(e)
-            
-            thread = threading.Thread(target=get_analysis)
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout=15)  # Increased timeout to 15 seconds for more complex analysis
-            
-            if thread.is_alive():
-                logger.warning("Gemini call timed out, using fallback")
-                return self._get_fallback_skills_analysis(user_id, user_profile, target_career)
-            
-            if not exception_queue.empty():
-                raise exception_queue.get()
-            
-            if result_queue.empty():
-                raise Exception("No analysis received")
-            
-            gap_analysis = result_queue.get()
-            
-            # Check if analysis is empty (Gemini failed)
-            if not gap_analysis or gap_analysis == {}:
-                raise Exception("Gemini service returned empty analysis")
-            
-            # Transform Gemini response to match frontend expectations
-            transformed_analysis = self._transform_skills_analysis(gap_analysis, user_skills, target_career)
+            # Wait up to the adaptive deadline derived from recent Gemini latency
+            transformed_analysis = call_with_deadline(
+                'skills_gap', self._generate_skills_analysis, user_profile, user_skills, target_career
+            )
+            self.ai_cache.store('skills_gap', user_id, cache_params, transformed_analysis)
             
             return {
                 'success': True,
@@ -128,6 +115,48 @@ class SkillsResource(Resource):
             # Fallback analysis
             return self._get_fallback_skills_analysis(user_id, user_profile, target_career)
     
+    def warm_cache(self, user_id, user):
+        """Start a background refresh if the user's cached default analysis is missing or stale"""
+        if not self.gemini_service.current_model:
+            return False
+        target_career = self._default_target_career(user)
+        cache_params = {'target_career': target_career, 'profile_hash': profile_hash(user)}
+        cached, is_stale = self.ai_cache.lookup('skills_gap', user_id, cache_params, record_stats=False)
+        if cached and not is_stale:
+            return False
+        return self.ai_cache.refresh_in_background(
+            'skills_gap', user_id, cache_params,
+            lambda: self._generate_skills_analysis(self._analysis_profile(user), user.get('skills', []),
+                                                   target_career, PRIORITY_BACKGROUND),
+            notify=False
+        )
+    
+    def _analysis_profile(self, user):
+        """User profile without system fields"""
+        return {k: v for k, v in user.items() if k not in ['_id', 'password', 'created_at', 'updated_at', 'is_active', 'token']}
+    
+    def _default_target_career(self, user):
+        """Target career from the profile's goals when the request does not name one"""
+        career_goals = user.get('career_goals', [])
+        goals_text = user.get('goals', '')
+        if career_goals and len(career_goals) > 0:
+            return career_goals[0] if isinstance(career_goals, list) else str(career_goals)
+        elif goals_text:
+            # Extract first meaningful career mention (simplified)
+            return goals_text.split('.')[0][:50]
+        return 'Career Development'
+    
+    def _generate_skills_analysis(self, user_profile, user_skills, target_career, priority=PRIORITY_INTERACTIVE):
+        """Generate the transformed AI skills gap analysis; independent of the request so it can run in the background"""
+        gap_analysis = self.gemini_service.analyze_skills_gap(user_profile, target_career, priority=priority)
+        
+        # Check if analysis is empty (Gemini failed)
+        if not gap_analysis or gap_analysis == {}:
+            raise Exception("Gemini service returned empty analysis")
+        
+        # Transform Gemini response to match frontend expectations
+        return self._transform_skills_analysis(gap_analysis, user_skills, target_career)
+    
     def _transform_skills_analysis(self, gap_analysis, user_skills, target_career):
         """Transform Gemini skills analysis to match frontend format"""
         # Extract missing skills as array of strings
@@ -381,3 +410,4 @@ class SkillsResource(Resource):
         except jwt.InvalidTokenError:
             return None
 
+cache_warmer.register('skills_gap', lambda user_id, user: SkillsResource().warm_cache(user_id, user))
@@ -78,7 +78,7 @@ class UserResource(Resource):
             return {'error': 'Invalid JSON data'}, 400
         
         # System fields that should not be updated directly
-        system_fields = {'password', '_id', 'created_at', 'updated_at', 'is_active'}
+        system_fields = {'password', '_id', 'created_at', 'updated_at', 'is_active', 'profile_version', 'profile_hash', 'inferred_skills'}
         
         # Remove None values, password, and system fields - allow all other dynamic fields
         update_data = {k: v for k, v in update_data.items() 
@@ -0,0 +1,183 @@
+import os
+import json
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import DuplicateKeyError
+from utils.metrics import register_metrics
+from models.notification import NotificationModel
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached result is served as fresh, per kind; profile changes invalidate sooner via the key
+AI_CACHE_FRESH_SECONDS = {
+    'career_recommendations': int(os.getenv('AI_CACHE_RECOMMENDATIONS_TTL', 24 * 3600)),
+    'skills_gap': int(os.getenv('AI_CACHE_SKILLS_GAP_TTL', 24 * 3600)),
+    'job_market': int(os.getenv('AI_CACHE_JOB_MARKET_TTL', 6 * 3600)),
+}
+# After this long a stale entry is dropped by the TTL index instead of being served
+AI_CACHE_MAX_STALE_SECONDS = int(os.getenv('AI_CACHE_MAX_STALE_SECONDS', 7 * 24 * 3600))
+# Lease that stops several workers refreshing the same entry at once
+AI_CACHE_REFRESH_LEASE_SECONDS = int(os.getenv('AI_CACHE_REFRESH_LEASE_SECONDS', 120))
+AI_CACHE_REFRESH_WORKERS = int(os.getenv('AI_CACHE_REFRESH_WORKERS', 2))
+
+# User-facing names for refresh notifications
+KIND_LABELS = {
+    'career_recommendations': 'career recommendations',
+    'skills_gap': 'skills gap analysis',
+    'job_market': 'job market analysis',
+}
+
+_refresh_executor = ThreadPoolExecutor(max_workers=AI_CACHE_REFRESH_WORKERS, thread_name_prefix='ai-cache-refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_stats = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_failures': 0}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    with _refreshing_lock:
+        stats['refreshing'] = len(_refreshing)
+    return stats
+
+register_metrics('ai_cache', cache_stats)
+
+class AIResultCache:
+    """Mongo-backed cache of AI results served stale-while-revalidate"""
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.ai_cache
+
+    def ensure_indexes(self):
+        """Expire entries once they are too stale to serve"""
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+        self.collection.create_index([('user_id', 1), ('kind', 1)])
+
+    def make_key(self, kind, user_id, params=None):
+        """Stable key from the kind, user and request parameters"""
+        encoded = json.dumps(params or {}, sort_keys=True, default=str)
+        return f"{kind}:{user_id or '-'}:{hashlib.sha1(encoded.encode('utf-8')).hexdigest()}"
+
+    def lookup(self, kind, user_id, params=None, record_stats=True):
+        """Return (entry, is_stale); entry is None on a miss"""
+        try:
+            # Entries without a result are placeholders holding a refresh lease
+            entry = self.collection.find_one({'_id': self.make_key(kind, user_id, params), 'result': {'$exists': True}})
+        except Exception as e:
+            logger.warning(f"AI cache lookup failed: {e}")
+            entry = None
+
+        if not entry:
+            if record_stats:
+                _count('misses')
+            return None, False
+
+        is_stale = entry['fresh_until'] <= datetime.now()
+        if record_stats:
+            _count('stale_hits' if is_stale else 'fresh_hits')
+        return entry, is_stale
+
+    def store(self, kind, user_id, params, result):
+        """Store a freshly computed result"""
+        now = datetime.now()
+        try:
+            self.collection.update_one(
+                {'_id': self.make_key(kind, user_id, params)},
+                {'$set': {
+                    'kind': kind,
+                    'user_id': user_id,
+                    'params': params or {},
+                    'result': result,
+                    'computed_at': now,
+                    'fresh_until': now + timedelta(seconds=AI_CACHE_FRESH_SECONDS.get(kind, 3600)),
+                    'expires_at': now + timedelta(seconds=AI_CACHE_MAX_STALE_SECONDS),
+                    'refreshing_until': None
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store AI cache entry: {e}")
+
+    def refresh_in_background(self, kind, user_id, params, compute, notify=True):
+        """Recompute an entry once in the background; duplicate requests are ignored.
+
+        compute() must not depend on the request context. When notify is set, the
+        user gets a notification once the refreshed result is ready.
+        """
+        key = self.make_key(kind, user_id, params)
+        with _refreshing_lock:
+            if key in _refreshing:
+                return False
+            _refreshing.add(key)
+
+        # Cross-worker dedup: only the worker that takes the lease refreshes. A missing entry
+        # is created as a placeholder; the upsert collides if another worker holds the lease.
+        now = datetime.now()
+        lease_until = now + timedelta(seconds=AI_CACHE_REFRESH_LEASE_SECONDS)
+        try:
+            result = self.collection.update_one(
+                {'_id': key, '$or': [{'refreshing_until': None}, {'refreshing_until': {'$lt': now}}]},
+                {'$set': {'refreshing_until': lease_until},
+                 '$setOnInsert': {'kind': kind, 'user_id': user_id, 'expires_at': lease_until}},
+                upsert=True
+            )
+            leased = result.modified_count > 0 or result.upserted_id is not None
+        except DuplicateKeyError:
+            leased = False
+        except Exception as e:
+            logger.warning(f"Failed to lease AI cache refresh: {e}")
+            leased = False
+
+        if not leased:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+            return False
+
+        _refresh_executor.submit(self._refresh, key, kind, user_id, params, compute, notify)
+        return True
+
+    def _refresh(self, key, kind, user_id, params, compute, notify):
+        try:
+            result = compute()
+            self.store(kind, user_id, params, result)
+            _count('refreshes')
+            if notify and user_id:
+                self._notify_refreshed(kind, user_id)
+        except Exception as e:
+            _count('refresh_failures')
+            logger.warning(f"Background refresh of {kind} failed: {e}")
+            # Release the lease so the next request can retry
+            self.collection.update_one({'_id': key}, {'$set': {'refreshing_until': None}})
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    def _notify_refreshed(self, kind, user_id):
+        label = KIND_LABELS.get(kind, kind)
+        try:
+            NotificationModel(self.db).create_notification(
+                user_id,
+                f'Updated {label} ready',
+                f'Your {label} has been refreshed with the latest AI analysis.',
+                type='ai_refresh',
+                priority='low',
+                data={'kind': kind}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to create refresh notification: {e}")
+
+def cached_response_fields(entry, is_stale):
+    """Extra response fields describing where a cached result came from"""
+    return {
+        'cached': True,
+        'stale': is_stale,
+        'cached_at': entry['computed_at'].isoformat()
+    }
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import queue
+import threading
+import logging
+from utils.latency import LatencyTracker
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# (min, initial, max) seconds per operation; the initial value applies until enough samples exist
+DEFAULT_TIMEOUT_BOUNDS = {
+    'career_recommendations': (3.0, 8.0, 15.0),
+    'skills_gap': (5.0, 15.0, 25.0),
+    'job_market': (5.0, 15.0, 25.0),
+}
+# Deadline is the recent p99 times this headroom, clamped to the bounds
+AI_TIMEOUT_HEADROOM = float(os.getenv('AI_TIMEOUT_HEADROOM', 1.2))
+
+def _load_bounds():
+    """Defaults overridden by the AI_TIMEOUT_BOUNDS JSON environment variable.
+
+    Each override must be [min, initial, max] with 0 < min <= initial <= max; invalid ones are
+    dropped here with a warning rather than failing requests later.
+    """
+    bounds = dict(DEFAULT_TIMEOUT_BOUNDS)
+    try:
+        overrides = json.loads(os.getenv('AI_TIMEOUT_BOUNDS', '{}'))
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid AI_TIMEOUT_BOUNDS: {e}")
+        return bounds
+    if not isinstance(overrides, dict):
+        logger.warning("Ignoring AI_TIMEOUT_BOUNDS: expected an object of operation -> [min, initial, max]")
+        return bounds
+
+    for operation, values in overrides.items():
+        try:
+            minimum, initial, maximum = (float(value) for value in values)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring AI_TIMEOUT_BOUNDS for {operation}: {e}")
+            continue
+        if not 0 < minimum <= initial <= maximum:
+            logger.warning(f"Ignoring AI_TIMEOUT_BOUNDS for {operation}: need 0 < min <= initial <= max")
+            continue
+        bounds[operation] = (minimum, initial, maximum)
+    return bounds
+
+AI_TIMEOUT_BOUNDS = _load_bounds()
+
+operation_latency = LatencyTracker()
+_timeouts = {}
+_timeouts_lock = threading.Lock()
+
+class AITimeoutError(Exception):
+    """Raised when an AI call does not finish within its deadline"""
+
+def get_deadline(operation: str) -> float:
+    """Current deadline in seconds, derived from recent p95/p99 within configured bounds"""
+    minimum, initial, maximum = AI_TIMEOUT_BOUNDS.get(operation, (5.0, 15.0, 30.0))
+    sketch = operation_latency.sketch(operation)
+    p95 = sketch.quantile(0.95)
+    p99 = sketch.quantile(0.99)
+    if p95 is None or p99 is None:
+        return initial
+    # Keep p99 headroom but never cut below 1.5x p95, so a sparse tail does not cause early fallbacks
+    return min(max(p99 * AI_TIMEOUT_HEADROOM, p95 * 1.5, minimum), maximum)
+
+def call_with_deadline(operation: str, func, *args, **kwargs):
+    """Run func in a daemon thread and wait up to the operation's adaptive deadline.
+
+    Latency is recorded when the call actually finishes, even after the caller gave up,
+    so slow periods raise the deadline instead of hiding behind timeouts. Only successful,
+    non-empty results count: instant failures would otherwise pull the deadline down
+    exactly when the backend is unhealthy.
+    """
+    result_queue = queue.Queue()
+    exception_queue = queue.Queue()
+
+    def run():
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            exception_queue.put(e)
+            return
+        if result:
+            operation_latency.observe(operation, time.monotonic() - started)
+        result_queue.put(result)
+
+    deadline = get_deadline(operation)
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout=deadline)
+
+    if thread.is_alive():
+        with _timeouts_lock:
+            _timeouts[operation] = _timeouts.get(operation, 0) + 1
+        raise AITimeoutError(f"{operation} timed out after {deadline:.1f}s")
+
+    if not exception_queue.empty():
+        raise exception_queue.get()
+
+    if result_queue.empty():
+        raise Exception(f"No result received for {operation}")
+
+    return result_queue.get()
+
+def timeout_stats():
+    latency = operation_latency.stats()
+    with _timeouts_lock:
+        timeouts = dict(_timeouts)
+    return {
+        operation: {
+            'deadline_seconds': round(get_deadline(operation), 2),
+            'bounds': AI_TIMEOUT_BOUNDS[operation],
+            'timeouts': timeouts.get(operation, 0),
+            'latency': latency.get(operation)
+        }
+        for operation in AI_TIMEOUT_BOUNDS
+    }
+
+register_metrics('ai_timeouts', timeout_stats)
@@ -0,0 +1,63 @@
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Warm a user's dashboard data (AI results, unread notification count) in the background on login
+AI_CACHE_WARM_ON_LOGIN = os.getenv('AI_CACHE_WARM_ON_LOGIN', 'false').lower() == 'true'
+# Minimum seconds between warm-ups for the same user
+AI_CACHE_WARMUP_INTERVAL = int(os.getenv('AI_CACHE_WARMUP_INTERVAL', 900))
+
+class CacheWarmer:
+    """Runs registered per-user warm-up functions off the request thread, at most once per interval"""
+
+    def __init__(self, min_interval=AI_CACHE_WARMUP_INTERVAL):
+        self.min_interval = min_interval
+        self.warmers = {}
+        self.last_warmed = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai-cache-warmer')
+        self.stats_counts = {'requested': 0, 'rate_limited': 0, 'refreshes_started': 0, 'failures': 0}
+        self._lock = threading.Lock()
+
+    def register(self, kind, warm):
+        """warm(user_id, user) starts a background refresh if needed and returns True if it did"""
+        self.warmers[kind] = warm
+
+    def warm_user(self, user_id, user):
+        """Queue a warm-up for the user unless one ran within the interval"""
+        now = time.monotonic()
+        with self._lock:
+            self.stats_counts['requested'] += 1
+            last = self.last_warmed.get(user_id)
+            if last is not None and now - last < self.min_interval:
+                self.stats_counts['rate_limited'] += 1
+                return False
+            self.last_warmed[user_id] = now
+            # Forget users whose interval has passed so the map stays small
+            if len(self.last_warmed) > 10000:
+                self.last_warmed = {uid: at for uid, at in self.last_warmed.items() if now - at < self.min_interval}
+
+        self.executor.submit(self._warm, user_id, user)
+        return True
+
+    def _warm(self, user_id, user):
+        for kind, warm in self.warmers.items():
+            try:
+                if warm(user_id, user):
+                    with self._lock:
+                        self.stats_counts['refreshes_started'] += 1
+            except Exception as e:
+                with self._lock:
+                    self.stats_counts['failures'] += 1
+                logger.warning(f"Cache warm-up of {kind} for user {user_id} failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.stats_counts, kinds=list(self.warmers), tracked_users=len(self.last_warmed))
+
+cache_warmer = CacheWarmer()
+register_metrics('ai_cache_warmer', cache_warmer.stats)
@@ -1,32 +1,462 @@
 import os
+import json
 import google.generativeai as genai
 from typing import List, Dict, Any
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.response_parser import (
+    CAREER_RECOMMENDATIONS_SCHEMA, SKILLS_GAP_SCHEMA, JOB_MARKET_ANALYSIS_SCHEMA,
+    validate_career_recommendations, validate_skills_gap, validate_job_market_analysis,
+    parse_structured
+)
+from services.prompt_builder import (
+    PromptTemplate, get_budget, estimate_tokens, truncate_to_tokens, format_list, clip, token_usage
+)
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import client as genai_client
+from utils.latency import LatencyTracker
+from utils.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
+# Comma-separated pool of API keys; falls back to the single GEMINI_API_KEY
+GEMINI_API_KEYS = [key.strip() for key in os.getenv('GEMINI_API_KEYS', os.getenv('GEMINI_API_KEY', '')).split(',') if key.strip()]
+# Cooldown after a quota error doubles per consecutive error, up to the maximum
+GEMINI_KEY_COOLDOWN = float(os.getenv('GEMINI_KEY_COOLDOWN', 30))
+GEMINI_KEY_MAX_COOLDOWN = float(os.getenv('GEMINI_KEY_MAX_COOLDOWN', 600))
+
+# Fallback model order for call types without a route
+GEMINI_DEFAULT_MODELS = ['gemini-2.5-flash', 'gemini-pro-vision']
+
+# Model routes per call type: prompts above the threshold use the 'complex' tier, and routes
+# without a threshold always do. Override with the GEMINI_MODEL_ROUTES JSON environment variable.
+DEFAULT_MODEL_ROUTES = {
+    'chat': {'threshold': 600, 'simple': ['gemini-2.5-flash-lite', 'gemini-2.5-flash'],
+             'complex': ['gemini-2.5-flash', 'gemini-2.5-flash-lite']},
+    # Structured analyses need the full model whatever the profile size
+    'career_recommendations': {'complex': ['gemini-2.5-flash', 'gemini-2.5-flash-lite']},
+    'skills_gap': {'complex': ['gemini-2.5-flash', 'gemini-2.5-flash-lite']},
+    'job_market': {'complex': ['gemini-2.5-flash', 'gemini-2.5-flash-lite']},
+}
+# USD per million (input, output) tokens, used to estimate cost per route
+DEFAULT_MODEL_PRICING = {
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+}
+
+# Optional request hedging across the model list
+GEMINI_HEDGING = os.getenv('GEMINI_HEDGING', 'false').lower() == 'true'
+# Hedge delay used until the primary model has enough latency samples
+GEMINI_HEDGE_DEFAULT_DELAY = float(os.getenv('GEMINI_HEDGE_DEFAULT_DELAY', 4.0))
+# Lower bound on the hedge delay so fast periods do not hedge every call
+GEMINI_HEDGE_MIN_DELAY = float(os.getenv('GEMINI_HEDGE_MIN_DELAY', 1.0))
+GEMINI_HEDGE_WORKERS = int(os.getenv('GEMINI_HEDGE_WORKERS', 16))
+
+# Priority classes for the LLM scheduler; lower values are served first
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BACKGROUND = 'background'
+# Token-bucket rate limit matching the Gemini API quota
+GEMINI_RATE_LIMIT_RPM = float(os.getenv('GEMINI_RATE_LIMIT_RPM', 60))
+GEMINI_RATE_BURST = float(os.getenv('GEMINI_RATE_BURST', 10))
+# Per-class concurrency limits
+GEMINI_INTERACTIVE_CONCURRENCY = int(os.getenv('GEMINI_INTERACTIVE_CONCURRENCY', 8))
+GEMINI_BACKGROUND_CONCURRENCY = int(os.getenv('GEMINI_BACKGROUND_CONCURRENCY', 2))
+# Tokens background work must leave in the bucket so interactive bursts are never starved
+GEMINI_BACKGROUND_RESERVE = float(os.getenv('GEMINI_BACKGROUND_RESERVE', 3))
+# Longest an interactive call waits for a slot before failing over to the route fallback
+GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', 10))
+
+# The JSON shape is enforced by response_schema, so prompts only describe the content wanted
+CAREER_RECOMMENDATIONS_PROMPT = PromptTemplate('career_recommendations', """
+    Recommend 5 careers for this user profile, each with a match score (0-100) and a specific reason.
+    Skills: $skills
+    Interests: $interests
+    Career goals: $career_goals
+    Education: $education
+    Experience level: $experience_level
+    Preferred industries: $industries
+""")
+
+SKILLS_GAP_PROMPT = PromptTemplate('skills_gap', """
+    Analyze the skills gap for a user pursuing: $target_career
+    Current skills: $skills
+    Career goals: $career_goals
+    Goals: $goals
+    Experience level: $experience_level
+    Interests: $interests
+    Preferred industries: $industries
+    Education: $education
+    Work experience: $experience
+    List missing skills with priority (high/medium/low by career relevance), time to learn for a $experience_level learner,
+    why each matters, learning resources and project ideas. Also list matching existing skills, all required skills,
+    and an overall gap score (0-100).
+""")
+
+JOB_MARKET_PROMPT = PromptTemplate('job_market', """
+    Give a personalized job market analysis for: $career_field
+    $context
+    Cover market trends, growth rate, salary range and average salary, job availability, required skills,
+    geographic hotspots with openings and salaries, industry insights, a per-role industry breakdown and the overall trend.
+    Use specific, current data points.
+""")
+
+CHAT_PROMPT = PromptTemplate('chat', """
+    You are a career counseling AI assistant. Give helpful, accurate, personalized career advice; be concise but informative.
+    Context: $context
+    Earlier conversation summary: $summary
+    Recent conversation:
+    $history
+    User question: $message
+""")
+
+class SchedulerTimeout(Exception):
+    """Raised when an LLM call cannot be admitted before its queue timeout"""
+
+class LLMScheduler:
+    """Admission control for Gemini calls: priority classes, per-class concurrency and a token bucket.
+    
+    Interactive calls always go first. Background calls are admitted only when no
+    interactive call is waiting and the bucket holds more than a reserve, and they
+    re-queue between retries, so they yield to interactive traffic at every call
+    boundary while soaking up whatever quota is left.
+    """
+    
+    def __init__(self, rate_per_minute: float, burst: float, limits: Dict[str, int], background_reserve: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        self.limits = limits
+        self.background_reserve = background_reserve
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.in_flight = {priority: 0 for priority in limits}
+        self.waiting = {priority: 0 for priority in limits}
+        self.admitted = {priority: 0 for priority in limits}
+        self.rejected = {priority: 0 for priority in limits}
+        self.wait_seconds = {priority: 0.0 for priority in limits}
+        self._condition = threading.Condition()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate_per_second)
+        self.last_refill = now
+    
+    def _can_admit(self, priority):
+        if self.in_flight[priority] >= self.limits[priority]:
+            return False
+        if priority == PRIORITY_BACKGROUND:
+            return self.waiting[PRIORITY_INTERACTIVE] == 0 and self.tokens >= 1 + self.background_reserve
+        return self.tokens >= 1
+    
+    def _token_wait(self, priority):
+        """Seconds until the bucket holds enough tokens for priority, or None when it already does"""
+        needed = 1 + self.background_reserve if priority == PRIORITY_BACKGROUND else 1
+        if self.tokens >= needed:
+            return None
+        if not self.rate_per_second:
+            return 1.0
+        return max((needed - self.tokens) / self.rate_per_second, 0.01)
+    
+    def acquire(self, priority: str = PRIORITY_INTERACTIVE, timeout: float = None):
+        """Block until the call may run; raises SchedulerTimeout after timeout seconds"""
+        started = time.monotonic()
+        deadline = started + timeout if timeout is not None else None
+        with self._condition:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    if self._can_admit(priority):
+                        break
+                    # Short of tokens: wake when enough have refilled. Otherwise the call is blocked on
+                    # a concurrency slot or on waiting interactive calls, and release() or their
+                    # admission notifies
+                    wait_for = self._token_wait(priority)
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected[priority] += 1
+                            raise SchedulerTimeout(f"No {priority} LLM slot within {timeout}s")
+                        wait_for = min(wait_for, remaining) if wait_for is not None else remaining
+                    self._condition.wait(wait_for)
+            finally:
+                self.waiting[priority] -= 1
+                if priority == PRIORITY_INTERACTIVE and not self.waiting[priority]:
+                    # Background calls held back for interactive ones may go now
+                    self._condition.notify_all()
+            
+            self.tokens -= 1
+            self.in_flight[priority] += 1
+            self.admitted[priority] += 1
+            self.wait_seconds[priority] += time.monotonic() - started
+    
+    def try_acquire(self, priority: str = PRIORITY_INTERACTIVE) -> bool:
+        """Admit immediately if possible, without waiting"""
+        with self._condition:
+            self._refill()
+            if not self._can_admit(priority):
+                return False
+            self.tokens -= 1
+            self.in_flight[priority] += 1
+            self.admitted[priority] += 1
+            return True
+    
+    def release(self, priority: str = PRIORITY_INTERACTIVE):
+        with self._condition:
+            self.in_flight[priority] -= 1
+            self._condition.notify_all()
+    
+    def stats(self):
+        with self._condition:
+            self._refill()
+            return {
+                'tokens_available': round(self.tokens, 2),
+                'rate_per_minute': self.rate_per_second * 60,
+                'classes': {
+                    priority: {
+                        'limit': self.limits[priority],
+                        'in_flight': self.in_flight[priority],
+                        'waiting': self.waiting[priority],
+                        'admitted': self.admitted[priority],
+                        'rejected': self.rejected[priority],
+                        'avg_wait_seconds': round(self.wait_seconds[priority] / self.admitted[priority], 3)
+                        if self.admitted[priority] else 0.0
+                    }
+                    for priority in self.limits
+                }
+            }
+
+def is_quota_error(error: Exception) -> bool:
+    """True for 429 / resource-exhausted errors from the Gemini API, by exception type or status code"""
+    if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return True
+    return isinstance(error, google_exceptions.GoogleAPICallError) and error.code == 429
+
+def _key_client(api_key: str):
+    """Generative client bound to one API key.
+
+    google-generativeai has no public per-client key: genai.configure() swaps the process-wide
+    default, which would race between concurrent calls on different keys. So this uses the SDK's
+    _ClientManager and GenerativeModel._client, and requirements.txt pins the SDK version for that
+    reason. Both are checked here so an upgrade that moves them fails at startup instead of
+    silently sending every call on the default key.
+    """
+    manager_class = getattr(genai_client, '_ClientManager', None)
+    if manager_class is None or '_client' not in vars(genai.GenerativeModel(GEMINI_DEFAULT_MODELS[0])):
+        raise RuntimeError("Unsupported google-generativeai version for the API key pool; "
+                           "install the version pinned in requirements.txt")
+    manager = manager_class()
+    manager.configure(api_key=api_key)
+    return manager.get_default_client('generative')
+
+class APIKeyState:
+    """One API key with its own client and rate and error tracking"""
+    
+    def __init__(self, api_key: str):
+        self.label = f'...{api_key[-4:]}'
+        self.client = _key_client(api_key)
+        self.models = {}
+        self.in_flight = 0
+        self.recent_requests = deque()
+        self.requests = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.consecutive_quota_errors = 0
+        self.cooldown_until = 0.0
+    
+    def model(self, model_name: str):
+        """GenerativeModel bound to this key's client instead of the global default"""
+        model = self.models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            # Checked in _key_client; see there for why this is not public API
+            model._client = self.client
+            self.models[model_name] = model
+        return model
+    
+    def requests_last_minute(self, now: float) -> int:
+        while self.recent_requests and self.recent_requests[0] < now - 60:
+            self.recent_requests.popleft()
+        return len(self.recent_requests)
+
+class APIKeyPool:
+    """Least-loaded selection across healthy API keys, with automatic cooldown on quota errors"""
+    
+    def __init__(self, api_keys: List[str]):
+        self.keys = [APIKeyState(api_key) for api_key in api_keys]
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> APIKeyState:
+        """Pick the healthy key with the fewest in-flight and recent requests"""
+        with self._lock:
+            now = time.monotonic()
+            healthy = [key for key in self.keys if key.cooldown_until <= now]
+            if healthy:
+                key = min(healthy, key=lambda k: (k.in_flight, k.requests_last_minute(now)))
+            else:
+                # Every key is cooling down: use the one that recovers first rather than fail outright
+                key = min(self.keys, key=lambda k: k.cooldown_until)
+            key.in_flight += 1
+            key.requests += 1
+            key.recent_requests.append(now)
+            return key
+    
+    def release(self, key: APIKeyState, error: Exception = None):
+        with self._lock:
+            key.in_flight -= 1
+            if error is None:
+                key.consecutive_quota_errors = 0
+                return
+            key.errors += 1
+            if is_quota_error(error):
+                key.quota_errors += 1
+                key.consecutive_quota_errors += 1
+                cooldown = min(GEMINI_KEY_COOLDOWN * 2 ** (key.consecutive_quota_errors - 1), GEMINI_KEY_MAX_COOLDOWN)
+                key.cooldown_until = time.monotonic() + cooldown
+                logger.warning(f"Gemini key {key.label} hit its quota, cooling down for {cooldown:.0f}s")
+    
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key.label: {
+                    'healthy': key.cooldown_until <= now,
+                    'cooldown_remaining': round(max(key.cooldown_until - now, 0), 1),
+                    'in_flight': key.in_flight,
+                    'requests_last_minute': key.requests_last_minute(now),
+                    'requests': key.requests,
+                    'errors': key.errors,
+                    'quota_errors': key.quota_errors
+                }
+                for key in self.keys
+            }
+
+def _load_json_env(name, default):
+    try:
+        return json.loads(os.getenv(name, '')) if os.getenv(name) else default
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid {name}: {e}")
+        return default
+
+class ModelRouter:
+    """Picks the model list for a call from its type and estimated prompt size, and records route cost"""
+    
+    def __init__(self, routes: Dict[str, Dict[str, Any]], pricing: Dict[str, Any], default_models: List[str]):
+        self.routes = routes
+        self.pricing = pricing
+        self.default_models = default_models
+        self.latency = LatencyTracker()
+        self.usage = {}
+        self._lock = threading.Lock()
+    
+    def select(self, call_type: str, prompt_tokens: int):
+        """Return (route name, ordered model names) for this call"""
+        route = self.routes.get(call_type)
+        if not route:
+            return f'{call_type}:default', self.default_models
+        threshold = route.get('threshold')
+        tier = 'complex' if threshold is None or prompt_tokens > threshold else 'simple'
+        return f'{call_type}:{tier}', route.get(tier) or self.default_models
+    
+    def record(self, route_name: str, model_name: str, seconds: float, prompt_tokens: int, output_tokens: int):
+        input_price, output_price = self.pricing.get(model_name, (0.0, 0.0))
+        cost = (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+        self.latency.observe(route_name, seconds)
+        with self._lock:
+            usage = self.usage.setdefault(route_name, {'calls': 0, 'models': {}, 'estimated_cost_usd': 0.0})
+            usage['calls'] += 1
+            usage['models'][model_name] = usage['models'].get(model_name, 0) + 1
+            usage['estimated_cost_usd'] += cost
+    
+    def stats(self):
+        latency = self.latency.stats()
+        with self._lock:
+            return {
+                'routes': self.routes,
+                'usage': {
+                    route_name: dict(usage,
+                                     models=dict(usage['models']),
+                                     estimated_cost_usd=round(usage['estimated_cost_usd'], 6),
+                                     latency=latency.get(route_name))
+                    for route_name, usage in self.usage.items()
+                }
+            }
+
+class HedgeStats:
+    """Counts of hedged Gemini calls, reported through the metrics endpoint"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.hedged = 0
+        self.primary_wins = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+    
+    def record(self, hedged: bool, hedge_won: bool):
+        with self._lock:
+            self.calls += 1
+            if hedged:
+                self.hedged += 1
+            if hedge_won:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': GEMINI_HEDGING,
+                'calls': self.calls,
+                'hedged': self.hedged,
+                'primary_wins': self.primary_wins,
+                'hedge_wins': self.hedge_wins,
+                'hedge_rate': round(self.hedged / self.calls, 4) if self.calls else 0.0
+            }
+
+# Shared across GeminiService instances, which are created per request
+llm_scheduler = LLMScheduler(
+    rate_per_minute=GEMINI_RATE_LIMIT_RPM,
+    burst=GEMINI_RATE_BURST,
+    limits={
+        PRIORITY_INTERACTIVE: GEMINI_INTERACTIVE_CONCURRENCY,
+        PRIORITY_BACKGROUND: GEMINI_BACKGROUND_CONCURRENCY
+    },
+    background_reserve=GEMINI_BACKGROUND_RESERVE
+)
+api_key_pool = APIKeyPool(GEMINI_API_KEYS)
+model_router = ModelRouter(
+    routes=_load_json_env('GEMINI_MODEL_ROUTES', DEFAULT_MODEL_ROUTES),
+    pricing=_load_json_env('GEMINI_MODEL_PRICING', DEFAULT_MODEL_PRICING),
+    default_models=GEMINI_DEFAULT_MODELS
+)
+model_latency = LatencyTracker()
+hedge_stats = HedgeStats()
+_hedge_executor = ThreadPoolExecutor(max_workers=GEMINI_HEDGE_WORKERS, thread_name_prefix='gemini-hedge')
+register_metrics('llm_scheduler', llm_scheduler.stats)
+register_metrics('gemini_api_keys', api_key_pool.stats)
+register_metrics('gemini_model_latency', model_latency.stats)
+register_metrics('gemini_hedging', hedge_stats.stats)
+register_metrics('gemini_model_routes', model_router.stats)
+
 class GeminiService:
     def __init__(self):
-        self.api_key = os.getenv('GEMINI_API_KEY')
+        self.api_keys = GEMINI_API_KEYS
         
-        # Try different models in order of preference
-        self.models = [
-            'gemini-2.5-flash',
-            'gemini-pro-vision'
-        ]
+        # Try different models in order of preference; call types with a route use that instead
+        self.models = GEMINI_DEFAULT_MODELS
         self.current_model = None
         self._initialize_model()
     
     def _initialize_model(self):
         """Initialize the first available model"""
         # Check if API key is available
-        if not self.api_key:
+        if not self.api_keys:
             logger.warning("GEMINI_API_KEY not found, using fallback mode")
             self.current_model = None
             return
             
-        genai.configure(api_key=self.api_key)
-            
         for model_name in self.models:
             try:
                 self.current_model = genai.GenerativeModel(model_name)
@@ -39,84 +469,164 @@ class GeminiService:
         if not self.current_model:
             logger.warning("No Gemini models available, using fallback mode")
     
-    def _switch_model(self):
-        """Switch to the next available model"""
-        current_index = self.models.index(self.current_model.model_name) if self.current_model else 0
-        next_index = (current_index + 1) % len(self.models)
+    def generate_text(self, prompt: str, max_retries: int = 3, response_schema: Dict[str, Any] = None,
+                      endpoint: str = 'default', prompt_tokens: int = None,
+                      priority: str = PRIORITY_INTERACTIVE) -> str:
+        """Generate text using Gemini API with fallback models.
         
-        try:
-            self.current_model = genai.GenerativeModel(self.models[next_index])
-            logger.info(f"Switched to Gemini model: {self.models[next_index]}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to switch to model {self.models[next_index]}: {e}")
-            return False
-    
-    def generate_text(self, prompt: str, max_retries: int = 3) -> str:
-        """Generate text using Gemini API with fallback models"""
+        The model list comes from the endpoint's route and the prompt's estimated size.
+        When response_schema is given, the model is asked for schema-constrained JSON.
+        Output is capped at the endpoint's output budget and token usage is recorded.
+        Every attempt is admitted through the shared LLM scheduler at the given priority.
+        """
         if not self.current_model:
             raise Exception("No Gemini model available")
+        
+        generation_config = {'max_output_tokens': get_budget(endpoint)['output']}
+        if response_schema:
+            generation_config['response_mime_type'] = 'application/json'
+            generation_config['response_schema'] = response_schema
+        
+        route_name, models = model_router.select(endpoint, prompt_tokens or estimate_tokens(prompt))
+        model_index = 0
             
         for attempt in range(max_retries):
+            model_name = models[model_index % len(models)]
+            # Background work waits indefinitely; interactive work gives up so the route can fall back
+            llm_scheduler.acquire(priority, timeout=GEMINI_QUEUE_TIMEOUT if priority == PRIORITY_INTERACTIVE else None)
+            started = time.monotonic()
+            hedged = GEMINI_HEDGING and len(models) > 1
             try:
-                response = self.current_model.generate_content(prompt)
+                if hedged:
+                    hedge_name = models[(model_index + 1) % len(models)]
+                    response, model_name = self._generate_hedged(prompt, generation_config, endpoint,
+                                                                 model_name, hedge_name, priority)
+                else:
+                    response = self._generate_timed(model_name, prompt, generation_config, endpoint)
+                used_prompt_tokens, used_output_tokens = self._record_usage(endpoint, prompt, prompt_tokens, response)
+                model_router.record(route_name, model_name, time.monotonic() - started,
+                                    used_prompt_tokens, used_output_tokens)
                 return response.text
             except Exception as e:
-                logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                logger.warning(f"Attempt {attempt + 1} with {model_name} failed: {e}")
                 if attempt < max_retries - 1:
-                    if not self._switch_model():
-                        break
+                    # A quota error is retried on another key; anything else moves to the next model
+                    if not is_quota_error(e):
+                        model_index += 1
                 else:
                     logger.error("All attempts failed")
                     raise e
+            finally:
+                # A hedged primary releases its own slot when the call ends, which can be after a hedge won
+                if not hedged:
+                    llm_scheduler.release(priority)
         
         raise Exception("Failed to generate text after all retries")
     
-    def get_career_recommendations(self, user_profile: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Get career recommendations based on user profile"""
-        prompt = f"""
-        Based on the following user profile, provide 5 career recommendations with detailed explanations:
-        
-        User Profile:
-        - Skills: {', '.join(user_profile.get('skills', []))}
-        - Interests: {', '.join(user_profile.get('interests', []))}
-        - Career Goals: {', '.join(user_profile.get('career_goals', []))}
-        - Education Background: {user_profile.get('education_background', {})}
-        - Experience Level: {user_profile.get('experience_level', 'beginner')}
-        - Preferred Industries: {', '.join(user_profile.get('preferred_industries', []))}
+    def _generate_timed(self, model_name, prompt, generation_config, endpoint):
+        """Call the model on the least-loaded API key and record its latency for this endpoint"""
+        key = api_key_pool.acquire()
+        started = time.monotonic()
+        try:
+            response = key.model(model_name).generate_content(prompt, generation_config=generation_config)
+            # Accessing text raises for blocked or empty candidates, so a bad response never wins a hedge
+            response.text
+        except Exception as e:
+            api_key_pool.release(key, e)
+            raise
+        api_key_pool.release(key)
+        model_latency.observe(f'{model_name}:{endpoint}', time.monotonic() - started)
+        return response
+    
+    def _hedge_delay(self, model_name, endpoint):
+        """Seconds to wait on the primary before hedging: its recent p95, within bounds"""
+        p95 = model_latency.quantile(f'{model_name}:{endpoint}', 0.95)
+        if p95 is None:
+            return GEMINI_HEDGE_DEFAULT_DELAY
+        return max(p95, GEMINI_HEDGE_MIN_DELAY)
+    
+    def _generate_hedged(self, prompt, generation_config, endpoint, primary_name, hedge_name,
+                         priority=PRIORITY_INTERACTIVE):
+        """Race the primary model against the hedge model if it is slower than its p95.
         
-        Please provide recommendations in the following JSON format:
-        [
-            {{
-                "career_name": "Career Name",
-                "match_score": 85,
-                "reason": "Why this career matches",
-                "required_skills": ["skill1", "skill2"],
-                "growth_potential": "high/medium/low",
-                "salary_range": "range",
-                "education_requirements": "requirements"
-            }}
-        ]
+        Returns (response, name of the model that produced it). The primary runs on the
+        caller's scheduler slot, which is released when the primary call actually finishes.
         """
+        primary = _hedge_executor.submit(self._generate_timed, primary_name, prompt, generation_config, endpoint)
+        primary.add_done_callback(lambda future: llm_scheduler.release(priority))
+        done, _ = wait([primary], timeout=self._hedge_delay(primary_name, endpoint))
+        if done and not primary.exception():
+            hedge_stats.record(hedged=False, hedge_won=False)
+            return primary.result(), primary_name
+        
+        # The duplicate needs its own quota; skip hedging rather than queue behind other calls
+        if not llm_scheduler.try_acquire(priority):
+            hedge_stats.record(hedged=False, hedge_won=False)
+            return primary.result(), primary_name
+        
+        # Primary is slow (or already failed): send the duplicate to the next model
+        logger.info(f"Hedging {endpoint} request from {primary_name} to {hedge_name}")
+        hedge = _hedge_executor.submit(self._generate_timed, hedge_name, prompt, generation_config, endpoint)
+        hedge.add_done_callback(lambda future: llm_scheduler.release(priority))
+        pending = {primary, hedge}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception():
+                    last_error = future.exception()
+                    continue
+                # First good response wins; the loser is cancelled if not yet started, otherwise ignored
+                for loser in pending:
+                    loser.cancel()
+                hedge_stats.record(hedged=True, hedge_won=future is hedge)
+                return future.result(), hedge_name if future is hedge else primary_name
+        
+        hedge_stats.record(hedged=True, hedge_won=False)
+        raise last_error
+    
+    def _record_usage(self, endpoint, prompt, prompt_tokens, response):
+        """Record token usage, preferring the counts reported by the API"""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_count = getattr(usage, 'prompt_token_count', 0) or prompt_tokens or estimate_tokens(prompt)
+        output_count = getattr(usage, 'candidates_token_count', 0)
+        if not output_count:
+            try:
+                output_count = estimate_tokens(response.text)
+            except Exception:
+                output_count = 0
+        token_usage.record(endpoint, prompt_count, output_count)
+        return prompt_count, output_count
+    
+    def get_career_recommendations(self, user_profile: Dict[str, Any],
+                                   priority: str = PRIORITY_INTERACTIVE) -> List[Dict[str, Any]]:
+        """Get career recommendations based on user profile"""
+        budget = get_budget('career_recommendations')
+        prompt, prompt_tokens = CAREER_RECOMMENDATIONS_PROMPT.render(
+            budget_tokens=budget['input'],
+            skills=format_list(user_profile.get('skills', []), max_items=15),
+            interests=format_list(user_profile.get('interests', [])),
+            career_goals=format_list(user_profile.get('career_goals', []), max_items=5, max_item_chars=80),
+            education=clip(user_profile.get('education_background') or user_profile.get('education'), 200),
+            experience_level=user_profile.get('experience_level', 'beginner'),
+            industries=format_list(user_profile.get('preferred_industries', []), max_items=5)
+        )
         
         try:
-            response = self.generate_text(prompt)
-            # Parse JSON response (in a real implementation, you'd want better JSON parsing)
+            response = self.generate_text(prompt, response_schema=CAREER_RECOMMENDATIONS_SCHEMA,
+                                          endpoint='career_recommendations', prompt_tokens=prompt_tokens,
+                                          priority=priority)
             return self._parse_career_recommendations(response)
         except Exception as e:
             logger.error(f"Failed to get career recommendations: {e}")
             return []
     
-    def analyze_skills_gap(self, user_profile: Dict[str, Any], target_career: str = None) -> Dict[str, Any]:
+    def analyze_skills_gap(self, user_profile: Dict[str, Any], target_career: str = None,
+                           priority: str = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
         """Analyze skills gap based on user profile and target career"""
-        user_skills = user_profile.get('skills', [])
         career_goals = user_profile.get('career_goals', [])
         goals_text = user_profile.get('goals', '')
         experience_level = user_profile.get('experience_level', 'beginner')
-        interests = user_profile.get('interests', [])
-        preferred_industries = user_profile.get('preferred_industries', [])
-        education = user_profile.get('education', '')
-        experience = user_profile.get('experience', '')
         
         # Determine target career from user profile if not provided
         if not target_career:
@@ -128,55 +638,31 @@ class GeminiService:
             else:
                 target_career = "general career development"
         
-        prompt = f"""
-        Analyze the skills gap for a user with the following profile who wants to pursue: {target_career}
-        
-        User Profile:
-        - Current Skills: {', '.join(user_skills) if user_skills else 'None listed'}
-        - Career Goals: {', '.join(career_goals) if career_goals else 'Not specified'}
-        - Goals Description: {goals_text[:500] if goals_text else 'Not provided'}
-        - Experience Level: {experience_level}
-        - Interests: {', '.join(interests) if interests else 'Not specified'}
-        - Preferred Industries: {', '.join(preferred_industries) if preferred_industries else 'Not specified'}
-        - Education Background: {education[:300] if education else 'Not provided'}
-        - Work Experience: {experience[:300] if experience else 'Not provided'}
-        
-        Based on this profile and target career "{target_career}", provide a comprehensive skills gap analysis:
-        1. Identify missing skills needed for this career path
-        2. Analyze which existing skills are relevant and match the target career
-        3. Provide learning resources for each missing skill
-        4. Assign priority levels (high/medium/low) based on career relevance
-        5. Estimate time to learn each skill based on user's experience level
-        
-        Format as JSON:
-        {{
-            "missing_skills": [
-                {{
-                    "skill_name": "skill name",
-                    "priority": "high/medium/low",
-                    "time_to_learn": "estimated time (e.g., 2-3 months)",
-                    "description": "brief description of why this skill is important",
-                    "learning_resources": ["resource1", "resource2", "resource3"],
-                    "projects": ["project idea 1", "project idea 2"]
-                }}
-            ],
-            "existing_skills_match": ["skill1", "skill2"],
-            "required_skills": ["all required skills for the career"],
-            "overall_gap_score": 75
-        }}
-        
-        Make sure the analysis is personalized to the user's experience level ({experience_level}), interests, and career goals.
-        """
+        budget = get_budget('skills_gap')
+        prompt, prompt_tokens = SKILLS_GAP_PROMPT.render(
+            budget_tokens=budget['input'],
+            target_career=clip(target_career, 100),
+            skills=format_list(user_profile.get('skills', []), max_items=20, empty='None listed'),
+            career_goals=format_list(career_goals, max_items=5, max_item_chars=80),
+            goals=clip(goals_text, 300),
+            experience_level=experience_level,
+            interests=format_list(user_profile.get('interests', [])),
+            industries=format_list(user_profile.get('preferred_industries', []), max_items=5),
+            education=clip(user_profile.get('education', ''), 200),
+            experience=clip(user_profile.get('experience', ''), 200)
+        )
         
         try:
-            response = self.generate_text(prompt)
+            response = self.generate_text(prompt, response_schema=SKILLS_GAP_SCHEMA,
+                                          endpoint='skills_gap', prompt_tokens=prompt_tokens, priority=priority)
             return self._parse_skills_gap(response)
         except Exception as e:
             logger.error(f"Failed to analyze skills gap: {e}")
             return {}
     
     def get_job_market_analysis(self, user_profile: Dict[str, Any] = None, career_field: str = None, 
-                                 industry: str = None, location: str = None, experience_level: str = None) -> Dict[str, Any]:
+                                 industry: str = None, location: str = None, experience_level: str = None,
+                                 priority: str = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
         """Get job market analysis based on user profile and filters"""
         # Determine career field from user profile if not provided
         if not career_field:
@@ -192,101 +678,67 @@ class GeminiService:
             else:
                 career_field = 'Technology'
         
-        # Build context from user profile
-        user_context = ""
+        # Only non-empty filters and profile fields are sent
+        context_lines = []
         if user_profile:
-            user_skills = user_profile.get('skills', [])
-            interests = user_profile.get('interests', [])
-            preferred_industries = user_profile.get('preferred_industries', [])
-            user_exp_level = user_profile.get('experience_level', experience_level or 'beginner')
-            
-            user_context = f"""
-            User Profile Context:
-            - Skills: {', '.join(user_skills) if user_skills else 'Not specified'}
-            - Interests: {', '.join(interests) if interests else 'Not specified'}
-            - Preferred Industries: {', '.join(preferred_industries) if preferred_industries else 'Not specified'}
-            - Experience Level: {user_exp_level}
-            """
-        
-        # Build filter context
-        filter_context = ""
+            context_lines.append(f"User skills: {format_list(user_profile.get('skills', []), max_items=15)}")
+            context_lines.append(f"User interests: {format_list(user_profile.get('interests', []))}")
+            context_lines.append(f"Preferred industries: {format_list(user_profile.get('preferred_industries', []), max_items=5)}")
+            context_lines.append(f"User experience level: {user_profile.get('experience_level', experience_level or 'beginner')}")
         if industry:
-            filter_context += f"- Filtered Industry: {industry}\n"
+            context_lines.append(f"Focus industry: {industry}")
         if location:
-            filter_context += f"- Filtered Location: {location}\n"
+            context_lines.append(f"Focus location: {location} (list it first among hotspots)")
         if experience_level:
-            filter_context += f"- Filtered Experience Level: {experience_level}\n"
-        
-        prompt = f"""
-        Provide a comprehensive, personalized job market analysis based on the following:
-        
-        Career Field/Industry: {career_field}
-        {user_context}
-        {filter_context}
+            context_lines.append(f"Adjust salaries for experience level: {experience_level}")
         
-        Provide analysis that includes:
-        1. Current market trends specific to this career/industry
-        2. Growth projections and future outlook
-        3. Salary ranges (adjusted for experience level if specified)
-        4. Job availability and demand
-        5. Required skills for this field
-        6. Top geographic locations for opportunities{" (focus on " + location + " if provided)" if location else ""}
-        7. Industry-specific insights
-        
-        {"Focus the analysis on: " + industry if industry else ""}
-        {"Focus on location: " + location if location else ""}
-        {"Adjust for experience level: " + experience_level if experience_level else ""}
-        
-        Format as JSON:
-        {{
-            "market_trends": "detailed trend description",
-            "growth_rate": "percentage or growth indicator",
-            "salary_range": "salary range (e.g., $60,000 - $120,000)",
-            "average_salary": 85000,
-            "job_availability": "high/medium/low",
-            "required_skills": ["skill1", "skill2", "skill3"],
-            "geographic_hotspots": [
-                {{"name": "location1", "job_openings": 5000, "average_salary": 95000}},
-                {{"name": "location2", "job_openings": 3000, "average_salary": 90000}}
-            ],
-            "industry_insights": "detailed insights about the industry",
-            "industry_analysis": [
-                {{
-                    "name": "industry/role name",
-                    "trend": "Up/Down/Stable",
-                    "growth": "percentage",
-                    "key_roles": ["role1", "role2"]
-                }}
-            ],
-            "overall_trends": {{
-                "trend": "Up/Down/Stable",
-                "description": "comprehensive market overview"
-            }}
-        }}
-        
-        Make the analysis personalized and relevant to the user's profile and filters. Include specific data points and actionable insights.
-        """
+        budget = get_budget('job_market')
+        prompt, prompt_tokens = JOB_MARKET_PROMPT.render(
+            budget_tokens=budget['input'],
+            career_field=clip(career_field, 100),
+            context='\n'.join(context_lines) if context_lines else 'None'
+        )
         
         try:
-            response = self.generate_text(prompt)
+            response = self.generate_text(prompt, response_schema=JOB_MARKET_ANALYSIS_SCHEMA,
+                                          endpoint='job_market', prompt_tokens=prompt_tokens, priority=priority)
             return self._parse_job_market_analysis(response)
         except Exception as e:
             logger.error(f"Failed to get job market analysis: {e}")
             return {}
     
-    def chat_response(self, message: str, context: str = "") -> str:
-        """Generate chatbot response"""
-        prompt = f"""
-        You are a career counseling AI assistant. Respond to the user's question about career guidance.
+    def chat_response(self, message: str, context: str = "", summary: str = "",
+                      history: List[Dict[str, Any]] = None) -> str:
+        """Generate chatbot response within the chat input budget"""
+        budget = get_budget('chat')['input'] - CHAT_PROMPT.static_tokens
+        message = truncate_to_tokens(message, budget // 4)
+        budget -= estimate_tokens(message)
         
-        Context: {context}
-        User Question: {message}
+        context = truncate_to_tokens(context, budget // 3)
+        budget -= estimate_tokens(context)
         
-        Provide helpful, accurate, and personalized career advice. Keep responses concise but informative.
-        """
+        summary = truncate_to_tokens(summary, budget // 2)
+        budget -= estimate_tokens(summary)
+        
+        # Add the most recent turns first so older ones are dropped when over budget
+        history_lines = []
+        for turn in reversed(history or []):
+            line = f"User: {turn.get('message', '')}\nAssistant: {turn.get('response', '')}"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            history_lines.insert(0, line)
+            budget -= cost
+        
+        prompt, prompt_tokens = CHAT_PROMPT.render(
+            context=context if context else 'None',
+            summary=summary if summary else 'None',
+            history='\n'.join(history_lines) if history_lines else 'None',
+            message=message
+        )
         
         try:
-            response = self.generate_text(prompt)
+            response = self.generate_text(prompt, endpoint='chat', prompt_tokens=prompt_tokens)
             if not response or response.strip() == "":
                 raise Exception("Empty response from Gemini")
             return response
@@ -296,46 +748,15 @@ class GeminiService:
     
     def _parse_career_recommendations(self, response: str) -> List[Dict[str, Any]]:
         """Parse career recommendations from AI response"""
-        # This is a simplified parser - in production, you'd want more robust JSON parsing
-        try:
-            import json
-            # Try to extract JSON from the response
-            start = response.find('[')
-            end = response.rfind(']') + 1
-            if start != -1 and end != 0:
-                json_str = response[start:end]
-                return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Failed to parse career recommendations: {e}")
-        
-        # Fallback: return empty list
-        return []
+        recommendations, ok = parse_structured(response, validate_career_recommendations, 'career recommendations')
+        return recommendations if ok else []
     
     def _parse_skills_gap(self, response: str) -> Dict[str, Any]:
         """Parse skills gap analysis from AI response"""
-        try:
-            import json
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            if start != -1 and end != 0:
-                json_str = response[start:end]
-                return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Failed to parse skills gap: {e}")
-        
-        return {}
+        analysis, ok = parse_structured(response, validate_skills_gap, 'skills gap')
+        return analysis if ok else {}
     
     def _parse_job_market_analysis(self, response: str) -> Dict[str, Any]:
         """Parse job market analysis from AI response"""
-        try:
-            import json
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            if start != -1 and end != 0:
-                json_str = response[start:end]
-                return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Failed to parse job market analysis: {e}")
-        
-        return {}
-
+        analysis, ok = parse_structured(response, validate_job_market_analysis, 'job market analysis')
+        return analysis if ok else {}
@@ -0,0 +1,282 @@
+import io
+import os
+import re
+import csv
+import sys
+import gzip
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+from pymongo import UpdateOne
+from utils.salary import SALARY_FIELDS, parse_salary
+from services.job_market_aggregates import JobMarketAggregates
+from services.skill_extractor import get_skill_extractor
+from services.skill_demand import SkillDemand
+
+logger = logging.getLogger(__name__)
+
+# Postings per bulk_write; also bounds how many parsed rows are held in memory
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 1000))
+# Rejected rows reported back individually; the rest are only counted
+INGEST_MAX_REPORTED_REJECTS = int(os.getenv('INGEST_MAX_REPORTED_REJECTS', 50))
+
+TITLE_ABBREVIATIONS = {'sr': 'Senior', 'jr': 'Junior', 'eng': 'Engineer', 'engr': 'Engineer',
+                       'dev': 'Developer', 'mgr': 'Manager', 'assoc': 'Associate'}
+# Kept as written instead of being title-cased
+UPPERCASE_WORDS = {'ai', 'ml', 'qa', 'ui', 'ux', 'it', 'hr', 'vp', 'cto', 'ceo', 'sre', 'api', 'ios'}
+REMOTE_LOCATIONS = {'remote', 'anywhere', 'work from home', 'wfh'}
+SKILL_SEPARATORS = re.compile(r'\s*[,;|]\s*')
+# Fields normalize_posting leaves out when a row has no value for them
+OPTIONAL_FIELDS = ('company', 'industry', 'experience_level', 'description', 'url', 'location', 'source') + SALARY_FIELDS
+
+class RejectedRow(Exception):
+    """A row that cannot be ingested"""
+
+def normalize_title(title):
+    words = []
+    for word in str(title).replace('/', ' / ').split():
+        bare = word.rstrip('.').lower()
+        if bare in TITLE_ABBREVIATIONS:
+            words.append(TITLE_ABBREVIATIONS[bare])
+        elif bare in UPPERCASE_WORDS:
+            words.append(bare.upper())
+        else:
+            words.append(word if any(c.isupper() for c in word[1:]) else word.capitalize())
+    return ' '.join(words)
+
+def normalize_location(location):
+    location = ' '.join(str(location).split()).strip(' ,')
+    if location.lower() in REMOTE_LOCATIONS:
+        return 'Remote'
+    # 'seattle, wa' -> 'Seattle, WA'
+    parts = [part.strip() for part in location.split(',')]
+    return ', '.join(part.upper() if len(part) == 2 else part.title() if part.islower() else part
+                     for part in parts if part)
+
+def normalize_skills(skills, catalog=None):
+    """Skills from a list or a delimited string, deduplicated and spelled as in the catalog"""
+    if isinstance(skills, str):
+        skills = SKILL_SEPARATORS.split(skills)
+    normalized = {}
+    for skill in skills or []:
+        skill = ' '.join(str(skill).split())
+        if skill and skill.lower() not in normalized:
+            normalized[skill.lower()] = (catalog or {}).get(skill.lower(), skill)
+    return list(normalized.values())
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        posted_at = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise RejectedRow(f"Invalid posted_at: {value!r}")
+    return posted_at.astimezone().replace(tzinfo=None) if posted_at.tzinfo else posted_at
+
+def posting_key(posting, source=None, external_id=None):
+    """Idempotent key: the source's own id when there is one, otherwise a content hash"""
+    if source and external_id:
+        return f"{source}:{external_id}"
+    posted = posting['posted_at'].date().isoformat() if posting.get('posted_at') else ''
+    content = '|'.join([posting.get('company', '').lower(), posting['title'].lower(),
+                        posting.get('location', '').lower(), posted])
+    return 'sha1:' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def normalize_posting(raw, catalog=None, default_source=None):
+    """Clean one raw CSV/JSON row into a posting document; raises RejectedRow when unusable"""
+    if not isinstance(raw, dict):
+        raise RejectedRow('Row is not an object')
+    raw = {str(key).strip().lower(): value for key, value in raw.items() if key is not None}
+    title = raw.get('title') or raw.get('job_title')
+    if not title or not str(title).strip():
+        raise RejectedRow('Missing title')
+
+    posting = {'title': normalize_title(title)}
+    for field in ('company', 'industry', 'experience_level', 'description', 'url'):
+        if raw.get(field) not in (None, ''):
+            posting[field] = ' '.join(str(raw[field]).split()) if field != 'description' else str(raw[field])
+    if raw.get('location'):
+        posting['location'] = normalize_location(raw['location'])
+    posting['skills'] = normalize_skills(raw.get('skills') or raw.get('required_skills'), catalog)
+
+    salary = parse_salary(raw.get('salary') or raw.get('salary_range'))
+    if not salary and (raw.get('salary_min') or raw.get('salary_max')):
+        low = parse_salary(raw.get('salary_min') or raw.get('salary_max'))
+        high = parse_salary(raw.get('salary_max') or raw.get('salary_min'))
+        if low and high:
+            salary = {'salary_min': low['salary_min'], 'salary_max': high['salary_max'],
+                      'salary_currency': raw.get('salary_currency') or low['salary_currency']}
+    if salary:
+        if salary['salary_min'] <= 0 or salary['salary_min'] > salary['salary_max']:
+            raise RejectedRow(f"Implausible salary: {raw.get('salary') or raw.get('salary_min')!r}")
+        posting.update(salary)
+
+    posting['posted_at'] = _parse_date(raw.get('posted_at') or raw.get('date_posted'))
+    source = raw.get('source') or default_source
+    if source:
+        posting['source'] = source
+    external_id = raw.get('external_id') or raw.get('id')
+    return posting_key(posting, source, external_id), posting
+
+def iter_rows(stream, fmt):
+    """(line number, raw row) pairs from a text stream, one row in memory at a time"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, RejectedRow(f"Invalid JSON: {e}")
+
+class PostingIngester:
+    """Streams CSV or JSONL job postings into db.job_postings with batched, idempotent upserts"""
+
+    def __init__(self, db, batch_size=INGEST_BATCH_SIZE, source=None):
+        self.db = db
+        self.collection = db.job_postings
+        self.batch_size = batch_size
+        self.source = source
+        self.aggregates = JobMarketAggregates(db)
+        self.demand = SkillDemand(db)
+
+    def ensure_indexes(self):
+        for field in ('posted_at', 'title', 'industry', 'location', 'skills', 'experience_level'):
+            self.collection.create_index(field)
+        self.demand.ensure_indexes()
+
+    def _skill_catalog(self):
+        """Lowercased name -> canonical spelling for every catalogued skill"""
+        return {skill['name'].lower(): skill['name']
+                for skill in self.db.skills.find({}, {'name': 1}) if skill.get('name')}
+
+    def ingest(self, stream, fmt='jsonl', progress=None):
+        """Ingest every row of a text stream; returns counts, throughput and sample rejects"""
+        catalog = self._skill_catalog()
+        stats = {'rows': 0, 'upserted': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0, 'rejects': []}
+        started = time.monotonic()
+        now = datetime.now()
+        batch = {}
+        # Distinct industries, locations and levels touched, for one aggregate refresh at the end
+        affected = {}
+
+        for line_number, raw in iter_rows(stream, fmt):
+            stats['rows'] += 1
+            try:
+                if isinstance(raw, RejectedRow):
+                    raise raw
+                key, posting = normalize_posting(raw, catalog, self.source)
+            except RejectedRow as e:
+                stats['rejected'] += 1
+                if len(stats['rejects']) < INGEST_MAX_REPORTED_REJECTS:
+                    stats['rejects'].append({'line': line_number, 'reason': str(e)})
+                continue
+
+            # A key repeated within a batch keeps its last version
+            batch[key] = posting
+            if len(batch) >= self.batch_size:
+                self._flush(batch, stats, now, affected)
+                batch = {}
+                if progress:
+                    progress(stats, time.monotonic() - started)
+
+        if batch:
+            self._flush(batch, stats, now, affected)
+        if stats['upserted'] or stats['updated']:
+            self.aggregates.refresh(affected)
+        if stats['upserted']:
+            stats['demand_scores_updated'] = self.demand.recompute()
+
+        elapsed = time.monotonic() - started
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['rows_per_second'] = round(stats['rows'] / elapsed) if elapsed > 0 else stats['rows']
+        return stats
+
+    def _add_mentioned_skills(self, postings):
+        """Add skills named in titles and descriptions to each posting's listed ones"""
+        texts = [f"{posting['title']}\n{posting.get('description', '')}" for posting in postings]
+        for posting, mentioned in zip(postings, get_skill_extractor(self.db).extract_many(texts)):
+            listed = {skill.lower() for skill in posting['skills']}
+            posting['skills'] += [skill for skill in mentioned if skill.lower() not in listed]
+
+    def _upsert(self, key, posting, now):
+        """Idempotent upsert that leaves a re-ingested, unchanged posting untouched.
+
+        updated_at only moves when the content hash changes, and a posting without a date keeps
+        the posted_at of its first ingestion, so unchanged rows are not modified at all. Changed
+        rows lose the optional fields the new content no longer has.
+        """
+        content = {field: value for field, value in posting.items() if value is not None}
+        content_hash = hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        unchanged = {'$eq': ['$content_hash', content_hash]}
+        stale = {field: {'$cond': [unchanged, f'${field}', '$$REMOVE']}
+                 for field in OPTIONAL_FIELDS if field not in content}
+        # Pipeline updates read '$...' strings as field paths, so values are passed as literals
+        fields = {field: {'$literal': value} for field, value in content.items()}
+        fields.setdefault('posted_at', {'$ifNull': ['$posted_at', now]})
+        return UpdateOne({'_id': key}, [
+            {'$set': dict(stale, updated_at={'$cond': [unchanged, '$updated_at', now]},
+                          ingested_at={'$ifNull': ['$ingested_at', now]})},
+            {'$set': dict(fields, content_hash=content_hash)}
+        ], upsert=True)
+
+    def _flush(self, batch, stats, now, affected):
+        self._add_mentioned_skills(list(batch.values()))
+        for dimension, values in self.aggregates.affected_keys(*batch.values()).items():
+            affected.setdefault(dimension, set()).update(values)
+        postings = list(batch.values())
+        result = self.collection.bulk_write([
+            self._upsert(key, posting, now) for key, posting in batch.items()
+        ], ordered=False)
+        # Only postings seen for the first time count towards skill demand; upserted_ids is keyed by operation index
+        self.demand.record(postings[index] for index in result.upserted_ids)
+        stats['upserted'] += result.upserted_count
+        stats['updated'] += result.modified_count
+        stats['unchanged'] += result.matched_count - result.modified_count
+
+def detect_format(filename, declared=None):
+    """'csv' or 'jsonl' from an explicit format or the file name"""
+    if declared:
+        return 'csv' if declared.lower() == 'csv' else 'jsonl'
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'csv' if name.endswith('.csv') else 'jsonl'
+
+def open_text(path):
+    """Text stream over a plain or gzipped file, or stdin for '-'"""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+if __name__ == '__main__':
+    # python -m services.ingestion postings.csv.gz [--format csv|jsonl] [--source indeed]
+    import argparse
+    from utils.database import db
+
+    parser = argparse.ArgumentParser(description='Ingest job postings from CSV or JSONL')
+    parser.add_argument('path', help="file to ingest (.csv, .jsonl, optionally .gz) or '-' for stdin")
+    parser.add_argument('--format', choices=['csv', 'jsonl'])
+    parser.add_argument('--source', help='source name used in idempotent keys for rows with an id')
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    def report(stats, elapsed):
+        print(f"{stats['rows']} rows, {stats['rejected']} rejected, "
+              f"{stats['rows'] / elapsed if elapsed else 0:.0f} rows/s", file=sys.stderr)
+
+    ingester = PostingIngester(db, batch_size=args.batch_size, source=args.source)
+    ingester.ensure_indexes()
+    with open_text(args.path) as stream:
+        result = ingester.ingest(stream, detect_format(args.path, args.format), progress=report)
+    print(json.dumps(result, indent=2))
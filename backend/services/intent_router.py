@@ -0,0 +1,280 @@
+import os
+import re
+import math
+import time
+import threading
+import logging
+from collections import Counter
+from typing import List, Dict, Any, Optional
+from models.career import CareerModel
+from models.skills import SkillsModel
+from models.user import all_skills
+
+logger = logging.getLogger(__name__)
+
+# Minimum cosine similarity to the best intent centroid before answering locally
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv('INTENT_CONFIDENCE_THRESHOLD', 0.45))
+# Best intent must beat the runner-up by this margin to avoid ambiguous routing
+INTENT_MARGIN = float(os.getenv('INTENT_MARGIN', 0.1))
+# How often the model is retrained on logged conversations
+INTENT_RETRAIN_SECONDS = int(os.getenv('INTENT_RETRAIN_SECONDS', 3600))
+# Number of logged conversations used for training
+INTENT_TRAINING_LIMIT = int(os.getenv('INTENT_TRAINING_LIMIT', 5000))
+# Stricter bar for adding a logged message to the training set than for answering it, so
+# training does not feed the seed model's borderline guesses back to itself
+INTENT_SELF_LABEL_THRESHOLD = float(os.getenv('INTENT_SELF_LABEL_THRESHOLD', 0.6))
+INTENT_SELF_LABEL_MARGIN = float(os.getenv('INTENT_SELF_LABEL_MARGIN', 0.25))
+
+# Seed examples per intent; logged messages that match these with high confidence are added on training
+INTENT_SEEDS = {
+    'skills_for_career': [
+        'what skills do i need for data science',
+        'which skills are required to become a software engineer',
+        'skills needed for a career in product management',
+        'what should i learn to be a web developer',
+        'required skills for devops engineer',
+    ],
+    'switch_careers': [
+        'how do i switch careers',
+        'how can i change my career',
+        'i want to transition to a new career',
+        'how to move into a different field',
+        'career change advice',
+    ],
+    'salary_for_career': [
+        'what is the salary of a data scientist',
+        'how much does a software engineer make',
+        'average pay for a product manager',
+        'salary range for ux designer',
+        'how much do devops engineers earn',
+    ],
+}
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'i', 'to', 'do', 'of', 'for', 'in', 'is', 'be', 'my', 'me', 'and',
+    'what', 'how', 'can', 'should', 'are', 'does', 'into', 'as', 'on', 'at', 'it', 'with'
+}
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9+#]+')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words, with a light plural strip"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+class IntentClassifier:
+    """TF-IDF nearest-centroid classifier over intent examples"""
+
+    def __init__(self, examples: Dict[str, List[str]]):
+        self.idf = {}
+        self.centroids = {}
+        self.fit(examples)
+
+    def fit(self, examples: Dict[str, List[str]]):
+        """Compute IDF weights and one normalized centroid per intent"""
+        documents = [(intent, tokenize(text)) for intent, texts in examples.items() for text in texts]
+        document_frequency = Counter()
+        for _, tokens in documents:
+            document_frequency.update(set(tokens))
+
+        total = len(documents)
+        self.idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        sums = {intent: Counter() for intent in examples}
+        for intent, tokens in documents:
+            for term, weight in self._vectorize(tokens).items():
+                sums[intent][term] += weight
+        self.centroids = {intent: self._normalize(vector) for intent, vector in sums.items() if vector}
+
+    def predict(self, text: str) -> List[tuple]:
+        """Return (intent, score) pairs sorted by descending cosine similarity"""
+        vector = self._vectorize(tokenize(text))
+        scores = []
+        for intent, centroid in self.centroids.items():
+            score = sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+            scores.append((intent, score))
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+    def _vectorize(self, tokens: List[str]) -> Dict[str, float]:
+        counts = Counter(token for token in tokens if token in self.idf)
+        return self._normalize({term: count * self.idf[term] for term, count in counts.items()})
+
+    def _normalize(self, vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+class IntentRouter:
+    """Answers high-confidence FAQ intents from the catalogs instead of calling Gemini"""
+
+    def __init__(self, db):
+        self.db = db
+        self.career_model = CareerModel(db)
+        self.skills_model = SkillsModel(db)
+        self.classifier = IntentClassifier(INTENT_SEEDS)
+        self.trained_at = 0
+        self._lock = threading.Lock()
+
+    def train(self):
+        """Self-train on logged conversations labelled confidently by the seed model"""
+        seed_classifier = IntentClassifier(INTENT_SEEDS)
+        examples = {intent: list(texts) for intent, texts in INTENT_SEEDS.items()}
+        try:
+            conversations = self.db.conversations.find(
+                {}, {'message': 1}
+            ).sort('timestamp', -1).limit(INTENT_TRAINING_LIMIT)
+            for conversation in conversations:
+                message = conversation.get('message', '')
+                intent = self._confident_intent(seed_classifier, message,
+                                                INTENT_SELF_LABEL_THRESHOLD, INTENT_SELF_LABEL_MARGIN)
+                if intent:
+                    examples[intent].append(message)
+        except Exception as e:
+            logger.warning(f"Failed to load conversations for intent training: {e}")
+
+        self.classifier = IntentClassifier(examples)
+        self.trained_at = time.time()
+        logger.info(f"Trained intent classifier on {sum(len(t) for t in examples.values())} examples")
+
+    def classify(self, message: str) -> Optional[str]:
+        """Return the confident intent for a message, or None"""
+        if time.time() - self.trained_at > INTENT_RETRAIN_SECONDS:
+            self._train_in_background()
+        return self._confident_intent(self.classifier, message)
+
+    def _train_in_background(self):
+        """Retrain off the request path; the current classifier keeps answering until train() swaps it"""
+        if not self._lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.train()
+            except Exception as e:
+                logger.warning(f"Intent training failed: {e}")
+                # Keep serving the current classifier until the next retrain interval
+                self.trained_at = time.time()
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=run, name='intent-training', daemon=True).start()
+
+    def route(self, message: str, user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a templated answer for the message, or None to defer to Gemini"""
+        intent = self.classify(message)
+        if not intent:
+            return None
+
+        try:
+            handler = getattr(self, f'_answer_{intent}')
+            response = handler(message, user)
+        except Exception as e:
+            logger.warning(f"Intent handler {intent} failed, deferring to Gemini: {e}")
+            return None
+
+        if not response:
+            return None
+        return {'intent': intent, 'response': response}
+
+    def _confident_intent(self, classifier: IntentClassifier, message: str,
+                          threshold: float = INTENT_CONFIDENCE_THRESHOLD, margin: float = INTENT_MARGIN) -> Optional[str]:
+        scores = classifier.predict(message)
+        if not scores:
+            return None
+        best_intent, best_score = scores[0]
+        runner_up = scores[1][1] if len(scores) > 1 else 0.0
+        if best_score >= threshold and best_score - runner_up >= margin:
+            return best_intent
+        return None
+
+    def _find_career(self, message: str) -> Optional[Dict[str, Any]]:
+        """Find the catalog career whose title best overlaps the message"""
+        message_tokens = set(tokenize(message))
+        best_career, best_overlap = None, 0.0
+        for career in self.career_model.get_all_careers(limit=200):
+            title = career.get('title', career.get('name', ''))
+            title_tokens = set(tokenize(title))
+            if not title_tokens:
+                continue
+            overlap = len(title_tokens & message_tokens) / len(title_tokens)
+            if overlap > best_overlap:
+                best_career, best_overlap = career, overlap
+        # Require most of the title to be mentioned so "engineer" alone does not match
+        return best_career if best_overlap >= 0.5 else None
+
+    def _answer_skills_for_career(self, message, user):
+        career = self._find_career(message)
+        if not career:
+            return None
+
+        title = career.get('title', career.get('name'))
+        required_skills = career.get('required_skills', [])
+        if not required_skills:
+            return None
+
+        user_skills = {skill.lower() for skill in all_skills(user)}
+        have = [skill for skill in required_skills if skill.lower() in user_skills]
+        missing = [skill for skill in required_skills if skill.lower() not in user_skills]
+
+        lines = [f"**Key skills for a {title}:** {', '.join(required_skills)}."]
+        preferred = career.get('preferred_skills', [])
+        if preferred:
+            lines.append(f"**Nice to have:** {', '.join(preferred)}.")
+        if have:
+            lines.append(f"You already have {', '.join(have)}, which is a good foundation.")
+        if missing:
+            lines.append(f"To close the gap, focus on: {', '.join(missing)}.")
+            for skill_name in missing[:3]:
+                skill = self.db.skills.find_one({'name': skill_name}, {'learning_resources': 1})
+                resources = (skill or {}).get('learning_resources', [])
+                if resources:
+                    lines.append(f"- {skill_name}: {', '.join(resources[:2])}")
+        return '\n\n'.join(lines)
+
+    def _answer_switch_careers(self, message, user):
+        user_skills = all_skills(user)
+        lines = [
+            "Switching careers works best as a planned, step-by-step move:",
+            "1. **Map transferable skills** you already use and how they apply to the new field.",
+            "2. **Pick a target role** and compare its required skills with yours to find the gap.",
+            "3. **Build the missing skills** through courses and small portfolio projects.",
+            "4. **Get hands-on exposure** with side projects, volunteering or an internal move.",
+            "5. **Network and tailor your resume** around the transferable experience."
+        ]
+        if user_skills:
+            careers = self.career_model.get_careers_by_skills(user_skills, limit=3)
+            titles = [career.get('title', career.get('name')) for career in careers]
+            lines.append(f"Your transferable skills include {', '.join(user_skills[:5])}.")
+            if titles:
+                lines.append(f"Roles in our catalog that use them: {', '.join(titles)}.")
+        return '\n\n'.join(lines)
+
+    def _answer_salary_for_career(self, message, user):
+        career = self._find_career(message)
+        if not career or not career.get('salary_range'):
+            return None
+
+        title = career.get('title', career.get('name'))
+        lines = [f"The typical salary range for a {title} is **{career['salary_range']}**."]
+        if career.get('experience_level'):
+            lines.append(f"This reflects {career['experience_level']} positions; pay varies with location, company size and experience.")
+        if career.get('growth_prospects'):
+            lines.append(f"Outlook: {career['growth_prospects']}.")
+        return '\n\n'.join(lines)
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_intent_router(db) -> IntentRouter:
+    """Process-wide intent router, so training happens once rather than per request"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter(db)
+    return _router
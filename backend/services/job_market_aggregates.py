@@ -0,0 +1,270 @@
+import os
+import logging
+from datetime import datetime
+from pymongo import ReplaceOne, DeleteOne
+from utils.salary import DEFAULT_CURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Skills and job titles kept per aggregate
+JOB_MARKET_TOP_N = int(os.getenv('JOB_MARKET_TOP_N', 10))
+
+DIMENSIONS = ('industry', 'location', 'experience_level')
+# Entries without an experience level count towards this one
+ALL_LEVELS = 'All'
+
+_NUMERIC_TYPES = ['int', 'long', 'double', 'decimal']
+_DEMAND_LEVEL = {'$toLower': {'$ifNull': ['$demand_trend', {'$ifNull': ['$job_availability', '']}]}}
+DEMAND_LABELS = {3: 'High', 2: 'Medium', 1: 'Low'}
+
+def _salary_in_default_currency(field):
+    """Amounts in other currencies can't be averaged with these, so they are left out of the salary band"""
+    return {'$cond': [{'$eq': [{'$ifNull': ['$salary_currency', DEFAULT_CURRENCY]}, DEFAULT_CURRENCY]}, f'${field}', None]}
+
+# One shape for seeded entries (industry, top_locations, numeric growth_rate), admin entries
+# (career_field, geographic_hotspots, growth_rate like '15%') and ingested postings (title, location, skills)
+NORMALIZE_STAGE = {'$project': {
+    'industry': {'$ifNull': ['$industry', '$career_field']},
+    'experience_level': {'$ifNull': ['$experience_level', ALL_LEVELS]},
+    'locations': {'$setUnion': [
+        {'$ifNull': ['$top_locations', []]},
+        {'$ifNull': ['$geographic_hotspots', []]},
+        {'$cond': [{'$eq': [{'$type': '$location'}, 'string']}, ['$location'], []]}
+    ]},
+    'growth': {'$switch': {'branches': [
+        {'case': {'$in': [{'$type': '$growth_rate'}, _NUMERIC_TYPES]}, 'then': '$growth_rate'},
+        {'case': {'$eq': [{'$type': '$growth_rate'}, 'string']},
+         'then': {'$convert': {'input': {'$trim': {'input': '$growth_rate', 'chars': '%+ '}},
+                               'to': 'double', 'onError': None, 'onNull': None}}}
+    ], 'default': None}},
+    'demand': {'$switch': {'branches': [
+        {'case': {'$in': [_DEMAND_LEVEL, ['very high', 'high']]}, 'then': 3},
+        {'case': {'$in': [_DEMAND_LEVEL, ['medium', 'moderate']]}, 'then': 2},
+        {'case': {'$eq': [_DEMAND_LEVEL, 'low']}, 'then': 1}
+    ], 'default': None}},
+    'salary_min': _salary_in_default_currency('salary_min'),
+    'salary_max': _salary_in_default_currency('salary_max'),
+    'job_title': {'$ifNull': ['$job_title', '$title']},
+    'skills': {'$ifNull': ['$required_skills', {'$ifNull': ['$skills', []]}]}
+}}
+
+def _raw_filter(dimension, values):
+    """Match on the raw fields before normalizing, so incremental refreshes can use indexes"""
+    values = list(values)
+    if dimension == 'industry':
+        return {'$or': [{'industry': {'$in': values}}, {'career_field': {'$in': values}}]}
+    if dimension == 'location':
+        return {'$or': [{'top_locations': {'$in': values}}, {'geographic_hotspots': {'$in': values}},
+                        {'location': {'$in': values}}]}
+    query = {'experience_level': {'$in': values}}
+    if ALL_LEVELS in values:
+        # Matches entries without the field as well as explicit nulls
+        query = {'$or': [query, {'experience_level': None}]}
+    return query
+
+def _trend(growth):
+    if growth is None:
+        return 'Stable'
+    return 'Up' if growth >= 5 else 'Down' if growth < 0 else 'Stable'
+
+class JobMarketAggregates:
+    """Per-industry, per-location and per-experience-level market figures materialized from
+    db.job_market and the ingested db.job_postings.
+
+    Each aggregate is one document keyed '<dimension>:<value>' holding entry count,
+    average growth, salary band (DEFAULT_CURRENCY entries only), demand and top skills
+    and titles. Writes refresh only the keys the written entries touch.
+    """
+
+    def __init__(self, db):
+        self.source = db.job_market
+        self.postings = db.job_postings
+        self.collection = db.job_market_aggregates
+
+    def ensure_indexes(self):
+        self.collection.create_index([('dimension', 1), ('entries', -1)])
+        for field in ('industry', 'career_field', 'top_locations', 'geographic_hotspots', 'location', 'experience_level'):
+            self.source.create_index(field)
+
+    def affected_keys(self, *entries):
+        """Dimension values touched by the given raw entries, e.g. before and after an update"""
+        affected = {dimension: set() for dimension in DIMENSIONS}
+        for entry in entries:
+            if not entry:
+                continue
+            industry = entry.get('industry') or entry.get('career_field')
+            if industry:
+                affected['industry'].add(industry)
+            for field in ('top_locations', 'geographic_hotspots'):
+                affected['location'].update(value for value in entry.get(field) or [] if isinstance(value, str))
+            if isinstance(entry.get('location'), str):
+                affected['location'].add(entry['location'])
+            affected['experience_level'].add(entry.get('experience_level') or ALL_LEVELS)
+        return affected
+
+    def rebuild(self):
+        """Recompute every aggregate"""
+        return self.refresh(None)
+
+    def refresh(self, affected):
+        """Recompute the aggregates for affected ({dimension: values}); None recomputes all"""
+        operations = []
+        for dimension in DIMENSIONS:
+            values = None if affected is None else affected.get(dimension)
+            if values is not None and not values:
+                continue
+            computed = self._compute(dimension, values)
+            stale = set(values or ()) if values is not None else {
+                doc['value'] for doc in self.collection.find({'dimension': dimension}, {'value': 1})
+            }
+            for value, aggregate in computed.items():
+                stale.discard(value)
+                operations.append(ReplaceOne({'_id': f'{dimension}:{value}'}, aggregate, upsert=True))
+            # Values no entry mentions any more
+            operations.extend(DeleteOne({'_id': f'{dimension}:{value}'}) for value in stale)
+
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def refresh_for(self, *entries):
+        """Incremental refresh after entries were written; failures are logged, never raised"""
+        try:
+            self.refresh(self.affected_keys(*entries))
+        except Exception as e:
+            logger.warning(f"Failed to refresh job market aggregates: {e}")
+
+    def _compute(self, dimension, values=None):
+        key = '$locations' if dimension == 'location' else f'${dimension}'
+        raw_match = [{'$match': _raw_filter(dimension, values)}] if values is not None else []
+        pipeline = raw_match + [{'$unionWith': {'coll': self.postings.name, 'pipeline': raw_match}}, NORMALIZE_STAGE]
+        if dimension == 'location':
+            pipeline.append({'$unwind': '$locations'})
+        match = {key[1:]: {'$nin': [None, '']}}
+        if values is not None:
+            match[key[1:]]['$in'] = list(values)
+        pipeline.append({'$match': match})
+
+        stats_pipeline = pipeline + [{'$group': {
+            '_id': key,
+            'entries': {'$sum': 1},
+            'avg_growth': {'$avg': '$growth'},
+            'demand_score': {'$avg': '$demand'},
+            'salary_min': {'$min': '$salary_min'},
+            'salary_max': {'$max': '$salary_max'},
+            'salary_avg': {'$avg': {'$avg': ['$salary_min', '$salary_max']}},
+            'job_titles': {'$addToSet': '$job_title'}
+        }}]
+        skills_pipeline = pipeline + [
+            {'$unwind': '$skills'},
+            {'$group': {'_id': {'key': key, 'skill': {'$toLower': '$skills'}},
+                        'name': {'$first': '$skills'}, 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id.skill': 1}},
+            {'$group': {'_id': '$_id.key', 'skills': {'$push': {'skill': '$name', 'count': '$count'}}}},
+            {'$project': {'skills': {'$slice': ['$skills', JOB_MARKET_TOP_N]}}}
+        ]
+
+        top_skills = {doc['_id']: doc['skills'] for doc in self.source.aggregate(skills_pipeline, allowDiskUse=True)}
+        now = datetime.now()
+        computed = {}
+        for stats in self.source.aggregate(stats_pipeline, allowDiskUse=True):
+            value = stats['_id']
+            demand_score = stats['demand_score']
+            computed[value] = {
+                'dimension': dimension,
+                'value': value,
+                'entries': stats['entries'],
+                'avg_growth': round(stats['avg_growth'], 1) if stats['avg_growth'] is not None else None,
+                'demand_score': round(demand_score, 2) if demand_score is not None else None,
+                'demand': DEMAND_LABELS.get(round(demand_score)) if demand_score is not None else None,
+                'salary': {
+                    'min': stats['salary_min'],
+                    'max': stats['salary_max'],
+                    'avg': round(stats['salary_avg']) if stats['salary_avg'] is not None else None,
+                    'currency': DEFAULT_CURRENCY
+                },
+                'top_skills': top_skills.get(value, []),
+                'job_titles': sorted(title for title in stats['job_titles'] if title)[:JOB_MARKET_TOP_N],
+                'updated_at': now
+            }
+        return computed
+
+    def lookup(self, industry=None, location=None, experience_level=None):
+        """Aggregates for the requested filters plus the leading industries and locations"""
+        keys = {'industry': industry, 'location': location, 'experience_level': experience_level}
+        ids = [f'{dimension}:{value}' for dimension, value in keys.items() if value]
+        found = {doc['_id']: doc for doc in self.collection.find({'_id': {'$in': ids}})} if ids else {}
+        return {
+            'selected': {dimension: found.get(f'{dimension}:{value}') for dimension, value in keys.items() if value},
+            'industries': list(self.collection.find({'dimension': 'industry'}).sort('entries', -1).limit(5)),
+            'locations': list(self.collection.find({'dimension': 'location'}).sort('entries', -1).limit(5))
+        }
+
+    def market_analysis(self, industry, location='', experience_level=''):
+        """Job market analysis fields in the frontend's format built only from stored data.
+
+        Only fields backed by the requested filters are returned: without an aggregate for the
+        industry there are no trends, industry breakdown, skills or salary (another industry's,
+        or every industry's, would be misleading), only location figures. None when nothing matches.
+        """
+        data = self.lookup(industry, location, experience_level)
+        selected = data['selected']
+        focus = selected.get('industry')
+        analysis = {}
+
+        if focus:
+            description = (f"{focus['value']}: {focus['entries']} tracked roles"
+                           + (f" with average growth of {focus['avg_growth']:g}%" if focus['avg_growth'] is not None else '')
+                           + (f" and {focus['demand'].lower()} demand" if focus['demand'] else '') + '.')
+            industry_analysis = [focus] + [doc for doc in data['industries'] if doc['_id'] != focus['_id']]
+            analysis['overall_trends'] = {'trend': _trend(focus['avg_growth']), 'description': description}
+            analysis['industry_analysis'] = [{
+                'name': doc['value'],
+                'trend': _trend(doc['avg_growth']),
+                'growth': f"{doc['avg_growth']:g}%" if doc['avg_growth'] is not None else 'N/A',
+                'key_roles': doc['job_titles'][:3]
+            } for doc in industry_analysis[:3]]
+            analysis['top_skills'] = focus['top_skills']
+
+        locations = data['locations'] if focus else []
+        if selected.get('location'):
+            locations = [selected['location']] + [doc for doc in locations if doc['_id'] != selected['location']['_id']]
+        if locations:
+            analysis['top_locations'] = [dict({'name': doc['value'], 'job_openings': doc['entries']},
+                                              **({'average_salary': doc['salary']['avg']} if doc['salary']['avg'] else {}))
+                                         for doc in locations[:3]]
+
+        salary = self._salary(selected)
+        if salary:
+            analysis['average_salary'] = salary
+        if not analysis:
+            return None
+        analysis['data_source'] = 'job_market'
+        return analysis
+
+    def market_data(self, industry, location='', experience_level=''):
+        """Compact data-derived figures to merge into an AI analysis; None without data"""
+        selected = self.lookup(industry, location, experience_level)['selected']
+        if not any(selected.values()):
+            return None
+        return {dimension: {
+            'value': doc['value'],
+            'entries': doc['entries'],
+            'avg_growth': doc['avg_growth'],
+            'demand': doc['demand'],
+            'salary': doc['salary'],
+            'top_skills': doc['top_skills']
+        } for dimension, doc in selected.items() if doc}
+
+    def _salary(self, selected):
+        """Average salary for the requested filters.
+
+        Aggregates are per dimension, so the location and experience level ones average every
+        industry; they only stand in when no industry was requested.
+        """
+        dimensions = ('industry',) if 'industry' in selected else ('location', 'experience_level')
+        for dimension in dimensions:
+            doc = selected.get(dimension)
+            if doc and doc['salary']['avg']:
+                return doc['salary']['avg']
+        return None
@@ -0,0 +1,155 @@
+import os
+import heapq
+import threading
+import logging
+from datetime import datetime, timedelta
+from bson import ObjectId
+from utils.metrics import register_metrics
+from models.milestone_reminder import MilestoneReminderModel
+from models.notification import NotificationModel
+
+logger = logging.getLogger(__name__)
+
+# Reminders due within this many hours are held in memory; the rest wait in the indexed projection
+MILESTONE_REMINDER_HORIZON_HOURS = int(os.getenv('MILESTONE_REMINDER_HORIZON_HOURS', 6))
+# Minutes between loads of newly due or newly tracked reminders
+MILESTONE_REMINDER_REFILL_MINUTES = int(os.getenv('MILESTONE_REMINDER_REFILL_MINUTES', 15))
+# Reminders claimed and written per notification batch
+MILESTONE_REMINDER_BATCH_SIZE = int(os.getenv('MILESTONE_REMINDER_BATCH_SIZE', 500))
+MILESTONE_REMINDERS_ENABLED = os.getenv('MILESTONE_REMINDERS_ENABLED', 'true').lower() == 'true'
+
+class MilestoneReminderScheduler:
+    """Sends milestone reminders when they fall due.
+
+    A min-heap holds the reminders due within the horizon. Each refill reads only the
+    slice of the horizon not loaded yet plus entries tracked since the last refill, so
+    the work done is proportional to the reminders that are due, not to the number of
+    career plans.
+    """
+
+    def __init__(self, horizon_hours=MILESTONE_REMINDER_HORIZON_HOURS, batch_size=MILESTONE_REMINDER_BATCH_SIZE):
+        self.horizon = timedelta(hours=horizon_hours)
+        self.refill_interval = timedelta(minutes=MILESTONE_REMINDER_REFILL_MINUTES)
+        self.batch_size = batch_size
+        self.db = None
+        self.thread = None
+        self.heap = []
+        # (remind_at, id) pairs already in the heap
+        self.queued = set()
+        self.loaded_until = None
+        self.last_refill = None
+        self.next_refill = None
+        self.counts = {'loaded': 0, 'sent': 0, 'skipped': 0, 'batches': 0, 'failures': 0}
+        self._condition = threading.Condition()
+
+    def start(self, db):
+        if not MILESTONE_REMINDERS_ENABLED:
+            return
+        with self._condition:
+            if self.thread and self.thread.is_alive():
+                return
+            self.db = db
+            self.thread = threading.Thread(target=self._loop, name='milestone-reminders', daemon=True)
+            self.thread.start()
+
+    def schedule(self, reminder):
+        """Queue a reminder tracked by this process if it falls inside the loaded horizon"""
+        with self._condition:
+            if self.loaded_until is None or reminder['remind_at'] >= self.loaded_until:
+                return
+            self._push(reminder['remind_at'], reminder['_id'])
+            self._condition.notify()
+
+    def _push(self, remind_at, reminder_id):
+        if (remind_at, reminder_id) not in self.queued:
+            self.queued.add((remind_at, reminder_id))
+            heapq.heappush(self.heap, (remind_at, reminder_id))
+            self.counts['loaded'] += 1
+
+    def _loop(self):
+        while True:
+            try:
+                now = datetime.now()
+                if self.next_refill is None or now >= self.next_refill:
+                    self._refill(now)
+                while self._send_due(datetime.now()):
+                    pass
+                self._wait()
+            except Exception as e:
+                logger.warning(f"Milestone reminder scheduler failed: {e}")
+                with self._condition:
+                    self.counts['failures'] += 1
+                    self._condition.wait(60)
+
+    def _refill(self, now):
+        model = MilestoneReminderModel(self.db)
+        until = now + self.horizon
+        reminders = list(model.due_between(self.loaded_until, until))
+        if self.last_refill:
+            # Entries tracked by other workers may fall due inside the slice already loaded
+            reminders += list(model.tracked_since(self.last_refill - timedelta(minutes=1), until))
+        with self._condition:
+            for reminder in reminders:
+                self._push(reminder['remind_at'], reminder['_id'])
+            self.loaded_until = until
+            self.last_refill = now
+            self.next_refill = now + self.refill_interval
+
+    def _pop_due(self, now):
+        due = []
+        with self._condition:
+            while self.heap and self.heap[0][0] <= now and len(due) < self.batch_size:
+                entry = heapq.heappop(self.heap)
+                self.queued.discard(entry)
+                due.append(entry[1])
+        return due
+
+    def _send_due(self, now):
+        """Send one batch of due reminders; returns False when nothing was due"""
+        due = self._pop_due(now)
+        if not due:
+            return False
+
+        # Completed or rescheduled milestones and reminders another worker sent drop out here
+        reminders = MilestoneReminderModel(self.db).claim(due, now, ObjectId())
+        NotificationModel(self.db).create_many([self._notification(reminder) for reminder in reminders])
+        with self._condition:
+            self.counts['batches'] += 1
+            self.counts['sent'] += len(reminders)
+            self.counts['skipped'] += len(due) - len(reminders)
+        return True
+
+    def _notification(self, reminder):
+        deadline = reminder['deadline']
+        return {
+            'user_id': reminder['user_id'],
+            'title': 'Milestone deadline approaching',
+            'message': f"\"{reminder.get('title') or 'Your milestone'}\" is due {deadline:%b %d, %Y at %H:%M}.",
+            'type': 'milestone_reminder',
+            'priority': 'high' if reminder.get('priority') == 'high' else 'medium',
+            'data': {'milestone_id': reminder['_id'], 'deadline': deadline.isoformat()}
+        }
+
+    def _wait(self):
+        with self._condition:
+            wake_at = self.next_refill
+            if self.heap:
+                wake_at = min(wake_at, self.heap[0][0])
+            timeout = (wake_at - datetime.now()).total_seconds()
+            if timeout > 0:
+                self._condition.wait(timeout)
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counts, queued=len(self.heap),
+                        loaded_until=self.loaded_until.isoformat() if self.loaded_until else None)
+
+milestone_scheduler = MilestoneReminderScheduler()
+register_metrics('milestone_reminders', milestone_scheduler.stats)
+
+if __name__ == '__main__':
+    # Backfill the projection for milestones created before it existed: python -m services.milestone_scheduler
+    from utils.database import db
+    model = MilestoneReminderModel(db)
+    model.ensure_indexes()
+    print(f"Tracking {model.rebuild()} open milestones")
@@ -0,0 +1,186 @@
+import os
+import time
+import queue
+import threading
+import logging
+from datetime import datetime
+from bson import ObjectId
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per open stream before the oldest are dropped and the client is told to resync
+NOTIFICATION_QUEUE_SIZE = int(os.getenv('NOTIFICATION_QUEUE_SIZE', 100))
+NOTIFICATION_HEARTBEAT_SECONDS = float(os.getenv('NOTIFICATION_HEARTBEAT_SECONDS', 15))
+NOTIFICATION_MAX_STREAMS_PER_USER = int(os.getenv('NOTIFICATION_MAX_STREAMS_PER_USER', 5))
+# 'local' delivers in-process; 'change_stream' tails db.notifications so every worker sees every insert
+NOTIFICATION_FANOUT = os.getenv('NOTIFICATION_FANOUT', 'local').lower()
+
+class TooManyStreams(Exception):
+    """Raised when a user already has the maximum number of open streams"""
+
+def serialize_event(notification):
+    """JSON-ready copy of a notification document"""
+    event = dict(notification)
+    for field, value in event.items():
+        if isinstance(value, ObjectId):
+            event[field] = str(value)
+        elif isinstance(value, datetime):
+            event[field] = value.isoformat()
+    return event
+
+class Subscription:
+    """One open stream: a bounded queue that drops its oldest event when the client falls behind"""
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.overflowed = False
+        self._lock = threading.Lock()
+
+    def offer(self, event):
+        with self._lock:
+            while True:
+                try:
+                    self.queue.put_nowait(event)
+                    return
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                        self.overflowed = True
+                    except queue.Empty:
+                        pass
+
+    def next_event(self, timeout):
+        """Next event, or None after timeout so the caller can send a heartbeat"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def take_overflow(self):
+        """True once after events were dropped"""
+        with self._lock:
+            overflowed, self.overflowed = self.overflowed, False
+            return overflowed
+
+class NotificationBroker:
+    """In-process pub/sub of notifications to open streams, keyed by user"""
+
+    def __init__(self, fanout=NOTIFICATION_FANOUT, queue_size=NOTIFICATION_QUEUE_SIZE,
+                 max_streams_per_user=NOTIFICATION_MAX_STREAMS_PER_USER):
+        self.fanout = fanout
+        self.queue_size = queue_size
+        self.max_streams_per_user = max_streams_per_user
+        self.subscriptions = {}
+        self.collection = None
+        self.tailer = None
+        self.broadcast_content = {}
+        self.counts = {'published': 0, 'delivered': 0, 'tailer_restarts': 0}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        with self._lock:
+            user_subscriptions = self.subscriptions.setdefault(user_id, set())
+            if len(user_subscriptions) >= self.max_streams_per_user:
+                raise TooManyStreams(f"User {user_id} already has {len(user_subscriptions)} open streams")
+            subscription = Subscription(user_id, self.queue_size)
+            user_subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            user_subscriptions = self.subscriptions.get(subscription.user_id)
+            if user_subscriptions:
+                user_subscriptions.discard(subscription)
+                if not user_subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    def publish(self, notification):
+        """Announce a stored notification; with change-stream fan-out the tailer delivers it instead"""
+        with self._lock:
+            self.counts['published'] += 1
+        if self.fanout != 'change_stream':
+            self._deliver(serialize_event(notification))
+
+    def publish_many(self, notifications):
+        """Announce a batch of stored notifications, serializing only those with a listener"""
+        if self.fanout == 'change_stream':
+            return
+        with self._lock:
+            listening = set(self.subscriptions)
+        published = 0
+        for notification in notifications:
+            published += 1
+            if notification.get('user_id') in listening:
+                self._deliver(serialize_event(notification))
+        with self._lock:
+            self.counts['published'] += published
+
+    def _deliver(self, event):
+        with self._lock:
+            targets = list(self.subscriptions.get(event.get('user_id'), ()))
+            self.counts['delivered'] += len(targets)
+        for subscription in targets:
+            subscription.offer(event)
+
+    def start_tailer(self, collection):
+        """Tail inserts into the notifications collection (needs a replica set) when configured"""
+        if self.fanout != 'change_stream':
+            return
+        with self._lock:
+            if self.tailer and self.tailer.is_alive():
+                return
+            self.collection = collection
+            self.tailer = threading.Thread(target=self._tail, name='notification-tailer', daemon=True)
+            self.tailer.start()
+
+    def _tail(self):
+        resume_token = None
+        failures = 0
+        while True:
+            try:
+                with self.collection.watch([{'$match': {'operationType': 'insert'}}],
+                                           resume_after=resume_token) as stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        failures = 0
+                        notification = change['fullDocument']
+                        if notification.get('user_id') not in self.subscriptions:
+                            continue
+                        if notification.get('broadcast_id'):
+                            notification = dict(self._broadcast_content(notification['broadcast_id']), **notification)
+                        self._deliver(serialize_event(notification))
+            except Exception as e:
+                logger.warning(f"Notification change stream failed, restarting: {e}")
+                failures += 1
+                with self._lock:
+                    self.counts['tailer_restarts'] += 1
+                # A token that keeps failing has likely aged out of the oplog; start from now
+                if failures >= 3:
+                    resume_token = None
+                time.sleep(5)
+
+    def _broadcast_content(self, broadcast_id):
+        """Shared content of a broadcast receipt, remembered for the next receipts of the same broadcast"""
+        content = self.broadcast_content.get(broadcast_id)
+        if content is None:
+            content = self.collection.database.broadcast_messages.find_one(
+                {'_id': broadcast_id}, {'_id': 0, 'title': 1, 'message': 1, 'type': 1, 'priority': 1}
+            ) or {}
+            if len(self.broadcast_content) >= 100:
+                self.broadcast_content.clear()
+            self.broadcast_content[broadcast_id] = content
+        return content
+
+    def stats(self):
+        with self._lock:
+            streams = sum(len(subscriptions) for subscriptions in self.subscriptions.values())
+            dropped = sum(s.dropped for subscriptions in self.subscriptions.values() for s in subscriptions)
+            return dict(self.counts, fanout=self.fanout, users=len(self.subscriptions),
+                        streams=streams, dropped_on_open_streams=dropped)
+
+notification_broker = NotificationBroker()
+register_metrics('notification_broker', notification_broker.stats)
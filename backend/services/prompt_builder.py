@@ -0,0 +1,128 @@
+import os
+import json
+import textwrap
+import threading
+import logging
+from string import Template
+from typing import Any, Dict, Iterable, Tuple
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint token budgets: 'input' caps the prompt, 'output' becomes max_output_tokens
+DEFAULT_BUDGETS = {
+    'career_recommendations': {'input': 500, 'output': 1500},
+    'skills_gap': {'input': 600, 'output': 2000},
+    'job_market': {'input': 500, 'output': 2000},
+    'chat': {'input': 1500, 'output': 800},
+}
+
+def _load_budgets():
+    """Defaults overridden by the PROMPT_BUDGETS JSON environment variable"""
+    budgets = {endpoint: dict(budget) for endpoint, budget in DEFAULT_BUDGETS.items()}
+    try:
+        overrides = json.loads(os.getenv('PROMPT_BUDGETS', '{}'))
+        for endpoint, budget in overrides.items():
+            budgets.setdefault(endpoint, {}).update(budget)
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid PROMPT_BUDGETS: {e}")
+    return budgets
+
+PROMPT_BUDGETS = _load_budgets()
+
+def get_budget(endpoint: str) -> Dict[str, int]:
+    return PROMPT_BUDGETS.get(endpoint, {'input': 1000, 'output': 1000})
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4 if text else 0
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to roughly max_tokens"""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text or ''
+    return text[:max(max_tokens, 0) * 4].rstrip() + '...'
+
+def format_list(values: Any, max_items: int = 10, max_item_chars: int = 40, empty: str = 'Not specified') -> str:
+    """Join a profile list with case-insensitive de-duplication and caps on count and item length"""
+    if not values:
+        return empty
+    if isinstance(values, str):
+        values = [values]
+
+    seen = set()
+    items = []
+    for value in values:
+        item = ' '.join(str(value).split())[:max_item_chars]
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            items.append(item)
+        if len(items) == max_items:
+            break
+    return ', '.join(items) if items else empty
+
+def clip(text: Any, max_chars: int, empty: str = 'Not provided') -> str:
+    """Collapse whitespace and cap free text"""
+    text = ' '.join(str(text).split()) if text else ''
+    if not text:
+        return empty
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + '...'
+
+class PromptTemplate:
+    """Static prompt text compacted and compiled once, filled per call"""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        # Dedent and drop blank lines so indentation is not sent as tokens
+        lines = [line.strip() for line in textwrap.dedent(text).splitlines()]
+        self.template = Template('\n'.join(line for line in lines if line))
+        self.static_tokens = estimate_tokens(self.template.safe_substitute())
+
+    def render(self, budget_tokens: int = None, **fields: str) -> Tuple[str, int]:
+        """Fill the template, shrinking the longest fields until it fits budget_tokens"""
+        fields = {name: str(value) for name, value in fields.items()}
+        prompt = self.template.substitute(fields)
+        tokens = estimate_tokens(prompt)
+
+        while budget_tokens and tokens > budget_tokens:
+            longest = max(fields, key=lambda name: len(fields[name]), default=None)
+            if longest is None or len(fields[longest]) <= 20:
+                break
+            value = fields[longest]
+            overflow_chars = (tokens - budget_tokens) * 4
+            keep = max(len(value) - overflow_chars, len(value) // 2)
+            fields[longest] = value[:keep].rstrip() + '...'
+            prompt = self.template.substitute(fields)
+            tokens = estimate_tokens(prompt)
+
+        if budget_tokens and tokens > budget_tokens:
+            logger.warning(f"Prompt {self.name} is {tokens} tokens, over its {budget_tokens} token budget")
+        return prompt, tokens
+
+class TokenUsage:
+    """Per-endpoint token counters reported through the metrics endpoint"""
+
+    def __init__(self):
+        self.usage = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, prompt_tokens: int, output_tokens: int):
+        logger.info(f"Gemini call endpoint={endpoint} prompt_tokens={prompt_tokens} output_tokens={output_tokens}")
+        with self._lock:
+            usage = self.usage.setdefault(endpoint, {'calls': 0, 'prompt_tokens': 0, 'output_tokens': 0})
+            usage['calls'] += 1
+            usage['prompt_tokens'] += prompt_tokens
+            usage['output_tokens'] += output_tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                endpoint: dict(usage,
+                               avg_prompt_tokens=round(usage['prompt_tokens'] / usage['calls'], 1),
+                               avg_output_tokens=round(usage['output_tokens'] / usage['calls'], 1))
+                for endpoint, usage in self.usage.items()
+            }
+
+token_usage = TokenUsage()
+register_metrics('token_usage', token_usage.stats)
+register_metrics('prompt_budgets', lambda: PROMPT_BUDGETS)
@@ -0,0 +1,280 @@
+import re
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Response schemas in the OpenAPI subset accepted by Gemini's response_schema
+CAREER_RECOMMENDATIONS_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'career_name': {'type': 'string'},
+            'match_score': {'type': 'integer'},
+            'reason': {'type': 'string'},
+            'required_skills': {'type': 'array', 'items': {'type': 'string'}},
+            'growth_potential': {'type': 'string', 'enum': ['high', 'medium', 'low']},
+            'salary_range': {'type': 'string'},
+            'education_requirements': {'type': 'string'}
+        },
+        'required': ['career_name', 'reason']
+    }
+}
+
+SKILLS_GAP_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'missing_skills': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'skill_name': {'type': 'string'},
+                    'priority': {'type': 'string', 'enum': ['high', 'medium', 'low']},
+                    'time_to_learn': {'type': 'string'},
+                    'description': {'type': 'string'},
+                    'learning_resources': {'type': 'array', 'items': {'type': 'string'}},
+                    'projects': {'type': 'array', 'items': {'type': 'string'}}
+                },
+                'required': ['skill_name']
+            }
+        },
+        'existing_skills_match': {'type': 'array', 'items': {'type': 'string'}},
+        'required_skills': {'type': 'array', 'items': {'type': 'string'}},
+        'overall_gap_score': {'type': 'integer'}
+    },
+    'required': ['missing_skills']
+}
+
+JOB_MARKET_ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'market_trends': {'type': 'string'},
+        'growth_rate': {'type': 'string'},
+        'salary_range': {'type': 'string'},
+        'average_salary': {'type': 'integer'},
+        'job_availability': {'type': 'string', 'enum': ['high', 'medium', 'low']},
+        'required_skills': {'type': 'array', 'items': {'type': 'string'}},
+        'geographic_hotspots': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string'},
+                    'job_openings': {'type': 'integer'},
+                    'average_salary': {'type': 'integer'}
+                },
+                'required': ['name']
+            }
+        },
+        'industry_insights': {'type': 'string'},
+        'industry_analysis': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string'},
+                    'trend': {'type': 'string', 'enum': ['Up', 'Down', 'Stable']},
+                    'growth': {'type': 'string'},
+                    'key_roles': {'type': 'array', 'items': {'type': 'string'}}
+                },
+                'required': ['name']
+            }
+        },
+        'overall_trends': {
+            'type': 'object',
+            'properties': {
+                'trend': {'type': 'string', 'enum': ['Up', 'Down', 'Stable']},
+                'description': {'type': 'string'}
+            }
+        }
+    },
+    'required': ['market_trends']
+}
+
+class SchemaError(ValueError):
+    """Raised when a value cannot be coerced to its schema"""
+
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+def compile_schema(schema: Dict[str, Any]) -> Callable[[Any], Any]:
+    """Compile a schema once into a validator that coerces a value or raises SchemaError"""
+    schema_type = schema.get('type', '').lower()
+
+    if schema_type == 'object':
+        fields = {name: compile_schema(field) for name, field in schema.get('properties', {}).items()}
+        required = schema.get('required', [])
+
+        def validate_object(value):
+            if not isinstance(value, dict):
+                raise SchemaError(f'expected object, got {type(value).__name__}')
+            missing = [name for name in required if value.get(name) in (None, '')]
+            if missing:
+                raise SchemaError(f"missing required fields: {', '.join(missing)}")
+            result = dict(value)
+            for name, validate_field in fields.items():
+                if value.get(name) is None:
+                    continue
+                try:
+                    result[name] = validate_field(value[name])
+                except SchemaError:
+                    if name in required:
+                        raise
+                    # Drop invalid optional fields so route defaults apply
+                    result.pop(name)
+            return result
+        return validate_object
+
+    if schema_type == 'array':
+        validate_item = compile_schema(schema.get('items', {}))
+
+        def validate_array(value):
+            if not isinstance(value, list):
+                value = [value]
+            items = []
+            for item in value:
+                try:
+                    items.append(validate_item(item))
+                except SchemaError as e:
+                    # Skip malformed items instead of discarding the whole response
+                    logger.debug(f'Dropped invalid array item: {e}')
+            return items
+        return validate_array
+
+    if schema_type in ('integer', 'number'):
+        cast = int if schema_type == 'integer' else float
+
+        def validate_number(value):
+            if isinstance(value, bool):
+                raise SchemaError('expected number, got boolean')
+            if isinstance(value, (int, float)):
+                return cast(value)
+            match = NUMBER_PATTERN.search(str(value).replace(',', ''))
+            if not match:
+                raise SchemaError(f'expected number, got {value!r}')
+            return cast(float(match.group()))
+        return validate_number
+
+    if schema_type == 'string':
+        allowed = {option.lower(): option for option in schema.get('enum', [])}
+
+        def validate_string(value):
+            if isinstance(value, (dict, list)):
+                raise SchemaError(f'expected string, got {type(value).__name__}')
+            value = str(value).strip()
+            if allowed:
+                # Normalize case ("High" -> "high"), leave unknown values as-is
+                return allowed.get(value.lower(), value)
+            return value
+        return validate_string
+
+    if schema_type == 'boolean':
+        def validate_boolean(value):
+            if isinstance(value, str):
+                return value.strip().lower() in ('true', 'yes', '1')
+            return bool(value)
+        return validate_boolean
+
+    return lambda value: value
+
+def repair_json(text: str) -> Optional[str]:
+    """Extract the first JSON value from text in a single pass, fixing common model malformations.
+
+    Handles markdown fences and surrounding prose, trailing commas, raw newlines
+    inside strings, and output truncated before its closing brackets.
+    """
+    start = -1
+    for index, char in enumerate(text):
+        if char in '{[':
+            start = index
+            break
+    if start == -1:
+        return None
+
+    output: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    pending_comma = False
+
+    for char in text[start:]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == '\n':
+                char = '\\n'
+            output.append(char)
+            continue
+
+        if char in ' \t\r\n':
+            continue
+        if char == ',':
+            # Hold commas until the next token shows they are not trailing
+            pending_comma = True
+            continue
+        if char in '}]':
+            pending_comma = False
+            if not stack:
+                break
+            output.append(stack.pop())
+            if not stack:
+                return ''.join(output)
+            continue
+
+        if pending_comma:
+            output.append(',')
+            pending_comma = False
+        if char == '"':
+            in_string = True
+        elif char == '{':
+            stack.append('}')
+        elif char == '[':
+            stack.append(']')
+        elif char == '`':
+            # Closing markdown fence after truncated output
+            break
+        output.append(char)
+
+    # Truncated output: close the open string and brackets
+    if in_string:
+        if escaped:
+            output.pop()
+        output.append('"')
+    while stack:
+        output.append(stack.pop())
+    return ''.join(output)
+
+def parse_structured(response: str, validator: Callable[[Any], Any], name: str = 'response') -> Tuple[Any, bool]:
+    """Parse and validate a model response; returns (value, ok)"""
+    if not response:
+        return None, False
+
+    try:
+        value = json.loads(response)
+    except ValueError:
+        repaired = repair_json(response)
+        if repaired is None:
+            logger.error(f'No JSON found in {name}')
+            return None, False
+        try:
+            value = json.loads(repaired)
+        except ValueError as e:
+            logger.error(f'Failed to parse {name} after repair: {e}')
+            return None, False
+
+    try:
+        return validator(value), True
+    except SchemaError as e:
+        logger.error(f'{name} does not match schema: {e}')
+        return None, False
+
+# Validators are compiled once at import time and reused for every response
+validate_career_recommendations = compile_schema(CAREER_RECOMMENDATIONS_SCHEMA)
+validate_skills_gap = compile_schema(SKILLS_GAP_SCHEMA)
+validate_job_market_analysis = compile_schema(JOB_MARKET_ANALYSIS_SCHEMA)
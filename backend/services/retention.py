@@ -0,0 +1,228 @@
+import os
+import io
+import json
+import gzip
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from utils.database import ensure_ttl_index
+from utils.metrics import register_metrics
+from models.notification import NotificationModel
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Conversation turns older than this are moved from MongoDB into archive segments (0 disables archiving)
+CONVERSATION_ARCHIVE_AFTER_DAYS = int(os.getenv('CONVERSATION_ARCHIVE_AFTER_DAYS', 30))
+# TTL backstop: turns still in MongoDB after this many days are deleted without archiving (0 keeps them)
+CONVERSATION_RETENTION_DAYS = int(os.getenv('CONVERSATION_RETENTION_DAYS', 180))
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(BACKEND_DIR, 'archive'))
+# zstd needs the optional zstandard package; gzip is always available
+ARCHIVE_COMPRESSION = os.getenv('ARCHIVE_COMPRESSION', 'zstd' if zstandard else 'gzip').lower()
+ARCHIVE_SEGMENT_SIZE = int(os.getenv('ARCHIVE_SEGMENT_SIZE', 5000))
+# Bounds one sweep; whatever is left is picked up by the next one
+ARCHIVE_MAX_SEGMENTS_PER_RUN = int(os.getenv('ARCHIVE_MAX_SEGMENTS_PER_RUN', 20))
+# Seconds between retention sweeps in the API process (0 disables the background sweep)
+RETENTION_INTERVAL_SECONDS = int(os.getenv('RETENTION_INTERVAL_SECONDS', 3600))
+# Lease that stops several workers sweeping at once
+RETENTION_LEASE_SECONDS = int(os.getenv('RETENTION_LEASE_SECONDS', 900))
+
+SEGMENT_EXTENSIONS = {'zstd': '.jsonl.zst', 'gzip': '.jsonl.gz'}
+MANIFEST_NAME = 'manifest.jsonl'
+
+def _serialize_record(document):
+    record = dict(document)
+    for field, value in record.items():
+        if isinstance(value, ObjectId):
+            record[field] = str(value)
+        elif isinstance(value, datetime):
+            record[field] = value.isoformat()
+    return record
+
+def _open_segment(path, mode):
+    """Binary writer ('wb') or text reader ('rt') for a segment, picked by its extension"""
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {os.path.basename(path)} requires the zstandard package")
+        raw = open(path, mode[0] + 'b')
+        if mode == 'wb':
+            return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return gzip.open(path, mode, encoding='utf-8' if 't' in mode else None)
+
+class ConversationArchiver:
+    """Moves old conversation turns into compressed JSONL segments on local disk.
+
+    Each segment is written under a temporary name, renamed into place and recorded in
+    manifest.jsonl together with its time range and users before the turns are deleted
+    from MongoDB. A crash in between only means the turns are archived twice, and the
+    reader skips duplicates.
+    """
+
+    def __init__(self, db, directory=ARCHIVE_DIR, compression=ARCHIVE_COMPRESSION):
+        self.collection = db.conversations
+        self.directory = directory
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard is not installed; archiving conversations with gzip")
+            compression = 'gzip'
+        self.compression = compression
+
+    def ensure_indexes(self):
+        self.collection.create_index([('user_id', 1), ('timestamp', -1)])
+        # Also serves the archiver's oldest-first scan
+        ensure_ttl_index(self.collection, 'timestamp', CONVERSATION_RETENTION_DAYS * 86400 or None)
+        if CONVERSATION_RETENTION_DAYS and CONVERSATION_RETENTION_DAYS <= CONVERSATION_ARCHIVE_AFTER_DAYS:
+            logger.warning("CONVERSATION_RETENTION_DAYS is not above CONVERSATION_ARCHIVE_AFTER_DAYS; "
+                           "conversations will expire before they are archived")
+
+    def archive(self, older_than_days=CONVERSATION_ARCHIVE_AFTER_DAYS, max_segments=ARCHIVE_MAX_SEGMENTS_PER_RUN):
+        """Archive turns older than older_than_days, one segment per batch"""
+        if not older_than_days:
+            return {'archived': 0, 'segments': []}
+        os.makedirs(self.directory, exist_ok=True)
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+
+        archived = 0
+        segments = []
+        while len(segments) < max_segments:
+            batch = list(self.collection.find({'timestamp': {'$lt': cutoff}})
+                         .sort([('timestamp', 1), ('_id', 1)]).limit(ARCHIVE_SEGMENT_SIZE))
+            if not batch:
+                break
+            segments.append(self._write_segment(batch))
+            self.collection.delete_many({'_id': {'$in': [turn['_id'] for turn in batch]}})
+            archived += len(batch)
+        return {'archived': archived, 'segments': segments}
+
+    def _write_segment(self, turns):
+        name = (f"conversations-{turns[0]['timestamp']:%Y%m%dT%H%M%S}-{turns[0]['_id']}"
+                f"{SEGMENT_EXTENSIONS[self.compression]}")
+        temporary_path = os.path.join(self.directory, '.tmp-' + name)
+        with _open_segment(temporary_path, 'wb') as out:
+            for turn in turns:
+                out.write((json.dumps(_serialize_record(turn), default=str) + '\n').encode('utf-8'))
+        os.replace(temporary_path, os.path.join(self.directory, name))
+
+        entry = {
+            'segment': name,
+            'count': len(turns),
+            'first_timestamp': turns[0]['timestamp'].isoformat(),
+            'last_timestamp': turns[-1]['timestamp'].isoformat(),
+            # Lets a per-user export skip segments without opening them
+            'user_ids': sorted({str(turn.get('user_id')) for turn in turns})
+        }
+        with open(os.path.join(self.directory, MANIFEST_NAME), 'a', encoding='utf-8') as manifest:
+            manifest.write(json.dumps(entry) + '\n')
+        return name
+
+    def _manifest(self):
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as manifest:
+            return [json.loads(line) for line in manifest if line.strip()]
+
+    def iter_archived(self, user_id, seen=None):
+        """A user's archived turns, oldest first; ids already in seen are skipped and added to it"""
+        seen = set() if seen is None else seen
+        for entry in sorted(self._manifest(), key=lambda entry: entry['first_timestamp']):
+            if user_id not in entry['user_ids']:
+                continue
+            with _open_segment(os.path.join(self.directory, entry['segment']), 'rt') as segment:
+                for line in segment:
+                    turn = json.loads(line)
+                    if turn.get('user_id') == user_id and turn['_id'] not in seen:
+                        seen.add(turn['_id'])
+                        yield turn
+
+    def iter_history(self, user_id):
+        """A user's complete history, archived turns first, then those still in MongoDB"""
+        seen = set()
+        yield from self.iter_archived(user_id, seen)
+        for turn in self.collection.find({'user_id': user_id}).sort('timestamp', 1):
+            if str(turn['_id']) not in seen:
+                yield _serialize_record(turn)
+
+class RetentionWorker:
+    """Periodically archives conversations and trims notification inboxes"""
+
+    def __init__(self, interval=RETENTION_INTERVAL_SECONDS):
+        self.interval = interval
+        self.thread = None
+        self.counts = {'runs': 0, 'skipped': 0, 'failures': 0, 'archived': 0, 'notifications_trimmed': 0}
+        self.last_run = None
+        self._lock = threading.Lock()
+
+    def start(self, db):
+        if not self.interval:
+            return
+        with self._lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._loop, args=(db,), name='retention', daemon=True)
+            self.thread.start()
+
+    def _loop(self, db):
+        while True:
+            try:
+                self.run_once(db)
+            except Exception as e:
+                logger.warning(f"Retention sweep failed: {e}")
+                with self._lock:
+                    self.counts['failures'] += 1
+            time.sleep(self.interval)
+
+    def run_once(self, db):
+        """One sweep, unless another worker holds the lease; returns what was done or None"""
+        if not self._acquire_lease(db):
+            with self._lock:
+                self.counts['skipped'] += 1
+            return None
+
+        try:
+            conversations = ConversationArchiver(db).archive()
+            notifications = NotificationModel(db).enforce_inbox_caps()
+        finally:
+            db.retention_leases.update_one({'_id': 'retention'}, {'$set': {'lease_until': datetime.now()}})
+        with self._lock:
+            self.counts['runs'] += 1
+            self.counts['archived'] += conversations['archived']
+            self.counts['notifications_trimmed'] += notifications['deleted']
+            self.last_run = datetime.now()
+        logger.info(f"Retention sweep archived {conversations['archived']} conversation turns "
+                    f"and trimmed {notifications['deleted']} notifications")
+        return {'conversations': conversations, 'notifications': notifications}
+
+    def _acquire_lease(self, db):
+        now = datetime.now()
+        try:
+            result = db.retention_leases.update_one(
+                {'_id': 'retention', 'lease_until': {'$lt': now}},
+                {'$set': {'lease_until': now + timedelta(seconds=RETENTION_LEASE_SECONDS)}},
+                upsert=True
+            )
+            return result.modified_count > 0 or result.upserted_id is not None
+        except DuplicateKeyError:
+            return False
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, interval_seconds=self.interval,
+                        last_run=self.last_run.isoformat() if self.last_run else None)
+
+retention_worker = RetentionWorker()
+register_metrics('retention', retention_worker.stats)
+
+if __name__ == '__main__':
+    # One sweep from cron or by hand, run from the backend directory: python -m services.retention
+    from utils.database import db
+    print(json.dumps(retention_worker.run_once(db), indent=2))
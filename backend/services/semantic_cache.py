@@ -0,0 +1,143 @@
+import os
+import re
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from utils.metrics import register_metrics
+
+# Dimensionality of the hashed character n-gram embedding
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv('SEMANTIC_CACHE_DIMENSIONS', 1024))
+# Maximum number of cached answers before least-recently-used eviction
+SEMANTIC_CACHE_CAPACITY = int(os.getenv('SEMANTIC_CACHE_CAPACITY', 2000))
+# Minimum cosine similarity for two questions to share an answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.8))
+
+NGRAM_SIZES = (3, 4, 5)
+
+# Words that tie a question to the asker's profile or to earlier turns
+PERSONAL_REFERENCE_PATTERN = re.compile(
+    r"\b(i|i'm|im|i've|ive|me|my|mine|myself|we|our|us|it|its|that|this|they|them|those|these|he|she)\b"
+)
+
+# Phrasing that does not change the answer; all other words (roles, technologies, places) are
+# key terms and must be the same for two questions to share an answer
+GENERIC_WORDS = frozenset('''
+    a an the and or of for to in on at as by with from about into is are be been being am
+    do does did can could should would will may might must what which who how why when where
+    there any some much many more most than good best top typical average usual usually
+    need needed require required requirement learn become get skill make earn pay paid
+    salary salaries wage job career role work please tell explain know list important main
+'''.split())
+
+def key_terms(text: str) -> frozenset:
+    """Words of a question that decide its answer, with a plural 's' stripped"""
+    terms = set()
+    for token in normalize_question(text).replace("'", ' ').split():
+        if token in GENERIC_WORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        if token not in GENERIC_WORDS:
+            terms.add(token)
+    return frozenset(terms)
+
+def normalize_question(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return ' '.join(re.sub(r"[^a-z0-9+#' ]", ' ', text.lower()).split())
+
+def is_profile_independent(text: str) -> bool:
+    """True when the answer cannot depend on who is asking or on earlier turns"""
+    return not PERSONAL_REFERENCE_PATTERN.search(normalize_question(text))
+
+def embed(text: str, dimensions: int = SEMANTIC_CACHE_DIMENSIONS) -> np.ndarray:
+    """Hashed character n-gram embedding with log term frequency, L2-normalized"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    padded = f' {normalize_question(text)} '
+    for size in NGRAM_SIZES:
+        for start in range(len(padded) - size + 1):
+            vector[zlib.crc32(padded[start:start + size].encode('utf-8')) % dimensions] += 1.0
+
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+class SemanticCache:
+    """Nearest-neighbour answer cache over a fixed-size embedding matrix with LRU eviction"""
+
+    def __init__(self, capacity: int = SEMANTIC_CACHE_CAPACITY, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 dimensions: int = SEMANTIC_CACHE_DIMENSIONS):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self.matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.occupied = np.zeros(capacity, dtype=bool)
+        # slot -> (question, answer, key terms), ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, question: str) -> Optional[str]:
+        """Return the cached answer for the nearest similar question with the same key terms, if any.
+
+        Character n-grams score 'frontend developer' and 'backend developer' as near-identical,
+        so similarity alone only shortlists candidates.
+        """
+        vector = embed(question, self.dimensions)
+        terms = key_terms(question)
+        with self._lock:
+            if self.entries:
+                similarities = self.matrix @ vector
+                similarities[~self.occupied] = -1.0
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                for slot in candidates[np.argsort(-similarities[candidates])]:
+                    slot = int(slot)
+                    if self.entries[slot][2] == terms:
+                        self.entries.move_to_end(slot)
+                        self.hits += 1
+                        return self.entries[slot][1]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, answer: str):
+        """Cache an answer, evicting the least recently used entry when full"""
+        vector = embed(question, self.dimensions)
+        with self._lock:
+            if len(self.entries) < self.capacity:
+                slot = int(np.argmin(self.occupied))
+            else:
+                slot, _ = self.entries.popitem(last=False)
+                self.evictions += 1
+
+            self.matrix[slot] = vector
+            self.occupied[slot] = True
+            self.entries[slot] = (question, answer, key_terms(question))
+            self.entries.move_to_end(slot)
+
+    def clear(self):
+        with self._lock:
+            self.matrix[:] = 0
+            self.occupied[:] = False
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'capacity': self.capacity,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# Process-wide cache shared by all chatbot requests
+chat_response_cache = SemanticCache()
+register_metrics('chat_semantic_cache', chat_response_cache.stats)
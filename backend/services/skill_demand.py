@@ -0,0 +1,133 @@
+import os
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, UpdateMany
+from pymongo.collation import Collation
+from utils.database import ensure_ttl_index
+
+logger = logging.getLogger(__name__)
+
+# Sliding windows, in days, that mentions are counted over; the longest one bounds the score
+SKILL_DEMAND_WINDOWS = sorted(int(days) for days in os.getenv('SKILL_DEMAND_WINDOWS', '7,30,90').split(','))
+# A mention loses half its weight every this many days
+SKILL_DEMAND_HALF_LIFE_DAYS = float(os.getenv('SKILL_DEMAND_HALF_LIFE_DAYS', 14))
+# Demand scores run from 0 to this, relative to the most demanded skill
+SKILL_DEMAND_SCALE = 100
+
+# Skill names in the catalog match postings regardless of case
+CASE_INSENSITIVE = Collation(locale='en', strength=2)
+
+def _day(moment):
+    return datetime(moment.year, moment.month, moment.day)
+
+class SkillDemand:
+    """Skill demand scores from ingested job postings.
+
+    Postings are counted once, as they are ingested, into per-skill daily buckets in
+    skill_demand_counts. Scores are recomputed from those buckets with exponential decay
+    over the longest window, so neither step ever rescans job_postings.
+    """
+
+    def __init__(self, db):
+        self.counts = db.skill_demand_counts
+        self.skills = db.skills
+        self.postings = db.job_postings
+
+    def ensure_indexes(self):
+        self.counts.create_index([('day', 1), ('skill_key', 1)])
+        # Buckets expire at expires_at, once past the longest window they no longer contribute to
+        ensure_ttl_index(self.counts, 'expires_at', 0)
+        # get_popular_skills sorts on it
+        self.skills.create_index([('demand_score', -1)])
+
+    def record(self, postings):
+        """Merge one batch of newly ingested postings into the daily buckets"""
+        mentions = Counter()
+        names = {}
+        for posting in postings:
+            day = _day(posting.get('posted_at') or datetime.now())
+            for skill in posting.get('skills') or []:
+                key = skill.lower()
+                mentions[(key, day)] += 1
+                names.setdefault(key, skill)
+        if not mentions:
+            return 0
+
+        expire_after = timedelta(days=SKILL_DEMAND_WINDOWS[-1] + 1)
+        self.counts.bulk_write([
+            UpdateOne(
+                {'_id': f"{key}:{day:%Y-%m-%d}"},
+                {'$inc': {'count': count},
+                 '$setOnInsert': {'skill_key': key, 'skill': names[key], 'day': day, 'expires_at': day + expire_after}},
+                upsert=True
+            )
+            for (key, day), count in mentions.items()
+        ], ordered=False)
+        return len(mentions)
+
+    def recompute(self, now=None):
+        """Recompute every demand score from the buckets and write them back in one bulk write"""
+        now = now or datetime.now()
+        longest = SKILL_DEMAND_WINDOWS[-1]
+        age_days = {'$divide': [{'$subtract': [now, '$day']}, 86400000]}
+        group = {
+            '_id': '$skill_key',
+            'skill': {'$first': '$skill'},
+            'weighted': {'$sum': {'$multiply': ['$count', {'$pow': [0.5, {'$divide': ['$age', SKILL_DEMAND_HALF_LIFE_DAYS]}]}]}}
+        }
+        for days in SKILL_DEMAND_WINDOWS:
+            group[f'mentions_{days}d'] = {'$sum': {'$cond': [{'$lte': ['$age', days]}, '$count', 0]}}
+
+        demand = list(self.counts.aggregate([
+            {'$match': {'day': {'$gte': _day(now) - timedelta(days=longest)}}},
+            {'$addFields': {'age': {'$max': [0, age_days]}}},
+            {'$group': group}
+        ]))
+        if not demand:
+            return 0
+
+        top = max(skill['weighted'] for skill in demand) or 1
+        operations = []
+        for skill in demand:
+            stats = {field: value for field, value in skill.items() if field.startswith('mentions_')}
+            stats.update(weighted=round(skill['weighted'], 3), updated_at=now)
+            operations.append(UpdateOne(
+                {'name': skill['skill']},
+                {'$set': {'demand_score': round(SKILL_DEMAND_SCALE * skill['weighted'] / top), 'demand': stats}},
+                collation=CASE_INSENSITIVE
+            ))
+        # Scored before but no longer mentioned in any window; admin-set scores are left alone
+        zero = {f'mentions_{days}d': 0 for days in SKILL_DEMAND_WINDOWS}
+        operations.append(UpdateMany(
+            {'demand.updated_at': {'$lt': now}},
+            {'$set': {'demand_score': 0, 'demand': dict(zero, weighted=0, updated_at=now)}}
+        ))
+
+        result = self.skills.bulk_write(operations, ordered=True)
+        return result.modified_count
+
+    def rebuild(self):
+        """Recount the buckets from every stored posting; only needed once for postings ingested earlier"""
+        longest = SKILL_DEMAND_WINDOWS[-1]
+        self.counts.delete_many({})
+        batch = []
+        since = _day(datetime.now()) - timedelta(days=longest)
+        for posting in self.postings.find({'posted_at': {'$gte': since}}, {'skills': 1, 'posted_at': 1}):
+            batch.append(posting)
+            if len(batch) >= 1000:
+                self.record(batch)
+                batch = []
+        self.record(batch)
+        return self.recompute()
+
+if __name__ == '__main__':
+    # Recompute scores, e.g. daily from cron so decay keeps up without new postings:
+    # python -m services.skill_demand [--rebuild]
+    import sys
+    from utils.database import db
+
+    demand = SkillDemand(db)
+    demand.ensure_indexes()
+    updated = demand.rebuild() if '--rebuild' in sys.argv else demand.recompute()
+    print(f"Updated demand scores of {updated} skills")
@@ -0,0 +1,274 @@
+import os
+import re
+import time
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the skills catalog for changes; SkillsModel writes force the next check
+SKILL_EXTRACTOR_CHECK_SECONDS = float(os.getenv('SKILL_EXTRACTOR_CHECK_SECONDS', 60))
+# Patterns this short only match with their exact capitalization ('Go', 'R', 'AI')
+CASE_SENSITIVE_MAX_LENGTH = 2
+# Skills spelled like everyday words only count when written as a proper noun: capitalized as in
+# the catalog and, when opening a sentence, followed by a skill context ('we use Go' and
+# 'Go developer', not 'Go to the page' or 'rust on the car')
+COMMON_WORD_SKILLS = {'go', 'r', 'c', 'rust', 'swift', 'react', 'express', 'flask', 'spark', 'dart',
+                      'ruby', 'julia', 'chef', 'puppet', 'excel', 'access', 'word', 'node'}
+# Characters that end a sentence, so the next word is capitalized anyway
+SENTENCE_END = '.!?'
+# A sentence-opening proper-noun skill still counts when followed by one of these ('React developer')
+SKILL_CONTEXT_WORDS = {'developer', 'developers', 'development', 'engineer', 'engineers', 'engineering',
+                       'programmer', 'programming', 'code', 'services', 'service', 'apps', 'app',
+                       'applications', 'projects', 'project', 'framework', 'experience', 'skills',
+                       'stack', 'backend', 'frontend', 'scripts', 'library'}
+# ...or by one of these and then another skill ('Go and Rust services', 'React, Node.js')
+SKILL_LIST_JOINERS = {'and', 'or', '&', ',', '/'}
+_NEXT_TOKEN = re.compile(r'\s*([^\W\d_]+|[,/&])\s*')
+
+# Common spellings for catalog skills, keyed by lowercased canonical name; skill documents
+# can add their own under 'aliases'
+BUILTIN_ALIASES = {
+    'javascript': ['JS', 'ECMAScript'],
+    'typescript': ['TS'],
+    'machine learning': ['ML'],
+    'artificial intelligence': ['AI'],
+    'natural language processing': ['NLP'],
+    'kubernetes': ['k8s'],
+    'node.js': ['NodeJS'],
+    'react': ['React.js', 'ReactJS'],
+    'postgresql': ['Postgres'],
+    'amazon web services': ['AWS'],
+    'aws': ['Amazon Web Services'],
+    'google cloud platform': ['GCP'],
+    'c#': ['CSharp'],
+    'c++': ['CPP'],
+    'go': ['Golang'],
+    'continuous integration': ['CI/CD'],
+}
+
+class SkillMatcher:
+    """Aho-Corasick automaton over skill names and aliases.
+
+    Compiled once and never modified, so it can be shared by threads while a
+    replacement is being built. Matching is one pass over the text plus the matches.
+    """
+
+    def __init__(self, patterns):
+        # Lowercased pattern -> (canonical skill, exact spelling required or None, proper noun only)
+        self.patterns = patterns
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for pattern in patterns:
+            self._insert(pattern)
+        self._link()
+
+    def _insert(self, pattern):
+        node = 0
+        for char in pattern:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+                self.goto[node][char] = next_node
+            node = next_node
+        self.output[node] = (pattern,)
+
+    def _link(self):
+        """Failure links breadth first; each node also reports what its failure chain ends"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def matches(self, text):
+        """(start, end, pattern) for every pattern occurrence in already lowercased text"""
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for pattern in self.output[node]:
+                yield index + 1 - len(pattern), index + 1, pattern
+
+    def extract(self, text):
+        """Canonical skills mentioned in text, in order of first mention.
+
+        Matches must sit on word boundaries ('Java' is not found in 'JavaScript'), and
+        overlapping matches resolve to the earliest, then longest ('Machine Learning'
+        rather than 'Learning'). Skills named like everyday words must read as proper nouns.
+        """
+        if not text:
+            return []
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters change length when lowercased; keep offsets aligned
+            lowered = ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+        found = []
+        # Sentence-opening proper nouns, kept only when what follows reads like a skill mention
+        opening = []
+        for start, end, pattern in self.matches(lowered):
+            if (start > 0 and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum()):
+                continue
+            canonical, exact, proper_noun = self.patterns[pattern]
+            if exact and text[start:end] != exact:
+                continue
+            match = (start, start - end, end, canonical)
+            (opening if proper_noun and _sentence_initial(text, start) else found).append(match)
+        starts = {match[0] for match in found + opening}
+        found.extend(match for match in opening if _skill_context(text, match[2], starts))
+
+        skills = []
+        covered_until = 0
+        for start, _, end, canonical in sorted(found):
+            if start < covered_until:
+                continue
+            covered_until = end
+            if canonical not in skills:
+                skills.append(canonical)
+        return skills
+
+def _sentence_initial(text, start):
+    """True when the match at start opens the text or a sentence"""
+    before = text[:start].rstrip()
+    return not before or before[-1] in SENTENCE_END
+
+def _skill_context(text, end, starts):
+    """True when the word after end names a skill context, or joins on to another skill match"""
+    token = _NEXT_TOKEN.match(text, end)
+    if not token:
+        return False
+    word = token.group(1).lower()
+    return word in SKILL_CONTEXT_WORDS or (word in SKILL_LIST_JOINERS and token.end() in starts)
+
+def skill_patterns(skill):
+    """Lowercased pattern -> (canonical, exact spelling or None, proper noun only) for one catalog document"""
+    name = ' '.join(str(skill.get('name') or '').split())
+    if not name:
+        return {}
+    spellings = [name] + list(skill.get('aliases') or []) + BUILTIN_ALIASES.get(name.lower(), [])
+    patterns = {}
+    for spelling in spellings:
+        spelling = ' '.join(str(spelling).split())
+        if spelling:
+            proper_noun = spelling.lower() in COMMON_WORD_SKILLS
+            exact = spelling if proper_noun or len(spelling) <= CASE_SENSITIVE_MAX_LENGTH else None
+            patterns[spelling.lower()] = (name, exact, proper_noun)
+    return patterns
+
+class SkillExtractor:
+    """Extracts catalog skills from free text with a matcher kept in step with db.skills.
+
+    Syncing fetches only skills updated since the last sync and recompiles the matcher
+    from the patterns already in memory; the catalog is only re-read in full when its
+    size shows that skills were deleted.
+    """
+
+    def __init__(self, db):
+        self.collection = db.skills
+        self.matcher = None
+        # Skill _id -> its patterns, so a changed skill replaces exactly what it contributed
+        self.skill_patterns = {}
+        # Skill _id -> the updated_at its patterns were built from; the sync query is inclusive,
+        # so skills written at synced_at come back on every check and are skipped by this
+        self.skill_versions = {}
+        # Newest updated_at seen; skills without one are only picked up by full loads
+        self.synced_at = datetime.min
+        self.checked_at = 0
+        self.counts = {'full_loads': 0, 'incremental_updates': 0, 'texts': 0}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Check the catalog again before the next extraction"""
+        self.checked_at = 0
+
+    def extract(self, text):
+        return self.extract_many([text])[0]
+
+    def extract_many(self, texts):
+        """Skills for each text, with a single catalog check for the whole batch"""
+        matcher = self._current_matcher()
+        with self._lock:
+            self.counts['texts'] += len(texts)
+        return [matcher.extract(text) if isinstance(text, str) else [] for text in texts]
+
+    def _current_matcher(self):
+        if self.matcher is None or time.monotonic() - self.checked_at >= SKILL_EXTRACTOR_CHECK_SECONDS:
+            with self._lock:
+                if self.matcher is None or time.monotonic() - self.checked_at >= SKILL_EXTRACTOR_CHECK_SECONDS:
+                    try:
+                        self._sync()
+                    except Exception as e:
+                        logger.warning(f"Failed to sync skill extractor with the catalog: {e}")
+                        if self.matcher is None:
+                            self.matcher = SkillMatcher({})
+                    self.checked_at = time.monotonic()
+        return self.matcher
+
+    def _sync(self):
+        projection = {'name': 1, 'aliases': 1, 'updated_at': 1}
+        if self.matcher is None:
+            changed = list(self.collection.find({}, projection))
+            self.skill_patterns = {}
+            self.skill_versions = {}
+            self.counts['full_loads'] += 1
+        else:
+            returned = list(self.collection.find({'updated_at': {'$gte': self.synced_at}}, projection))
+            known = set(self.skill_patterns) | {skill['_id'] for skill in returned}
+            if self.collection.estimated_document_count() != len(known):
+                # Deletions, or skills written without updated_at; start over
+                self.matcher = None
+                return self._sync()
+            changed = [skill for skill in returned
+                       if skill['_id'] not in self.skill_versions
+                       or self.skill_versions[skill['_id']] != skill.get('updated_at')]
+            if not changed:
+                return
+            self.counts['incremental_updates'] += 1
+
+        for skill in changed:
+            self.skill_patterns[skill['_id']] = skill_patterns(skill)
+            self.skill_versions[skill['_id']] = skill.get('updated_at')
+            if skill.get('updated_at') and skill['updated_at'] > self.synced_at:
+                self.synced_at = skill['updated_at']
+
+        patterns = {}
+        for contributed in self.skill_patterns.values():
+            patterns.update(contributed)
+        self.matcher = SkillMatcher(patterns)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, patterns=len(self.matcher.patterns) if self.matcher else 0,
+                        skills=len(self.skill_patterns))
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def get_skill_extractor(db) -> SkillExtractor:
+    """Process-wide extractor, so the catalog is compiled once rather than per request"""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = SkillExtractor(db)
+                register_metrics('skill_extractor', _extractor.stats)
+    return _extractor
+
+def invalidate_skill_extractor():
+    """Called after catalog writes; a no-op before the extractor is first used"""
+    if _extractor is not None:
+        _extractor.invalidate()
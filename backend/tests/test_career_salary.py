@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock
+import pytest
+from pymongo import UpdateOne
+from models.career import CareerModel
+from utils.salary import backfill_salary_fields, salary_fields, salary_query
+
+def salary(low, high, currency='USD'):
+    return {'salary_min': low, 'salary_max': high, 'salary_currency': currency}
+
+def test_salary_fields_clear_stale_numbers_when_unparseable():
+    assert salary_fields('$60k-$90k') == salary(60000, 90000)
+    assert salary_fields('Depends on experience') == salary(None, None, None)
+
+def test_salary_query_matches_overlapping_ranges():
+    assert salary_query() == {}
+    assert salary_query(min_salary=80000) == {'salary_max': {'$gte': 80000}}
+    assert salary_query(80000, 120000) == {'salary_max': {'$gte': 80000}, 'salary_min': {'$lte': 120000}}
+
+def test_backfill_parses_only_documents_without_numbers():
+    collection = MagicMock()
+    collection.find.return_value = [{'_id': 1, 'salary_range': '€50k-€60k'}, {'_id': 2, 'salary_range': 'TBD'}]
+    assert backfill_salary_fields(collection) == 2
+    assert collection.find.call_args[0][0] == {'salary_range': {'$type': 'string'}, 'salary_min': {'$exists': False}}
+    assert collection.bulk_write.call_args[0][0] == [
+        UpdateOne({'_id': 1}, {'$set': salary(50000, 60000, 'EUR')}),
+        UpdateOne({'_id': 2}, {'$set': salary(None, None, None)})
+    ]
+
+def test_backfill_without_work_writes_nothing():
+    collection = MagicMock()
+    collection.find.return_value = []
+    assert backfill_salary_fields(collection) == 0
+    collection.bulk_write.assert_not_called()
+
+@pytest.fixture
+def careers():
+    model = CareerModel(MagicMock())
+    model.collection.find.return_value.sort.return_value.limit.return_value = []
+    return model
+
+def last_query(model):
+    return model.collection.find.call_args[0][0]
+
+def test_filter_query_combines_every_given_filter(careers):
+    assert careers._filter_query() == {}
+    assert careers._filter_query(industry='Healthcare') == {'industry': 'Healthcare'}
+    query = careers._filter_query('nurse', 'Healthcare', ['Triage'])
+    assert query['$and'][1:] == [{'industry': 'Healthcare'}, {'required_skills': {'$in': ['Triage']}}]
+    assert {'name': {'$regex': 'nurse', '$options': 'i'}} in query['$and'][0]['$or']
+
+def test_salary_filter_combines_with_the_other_filters(careers):
+    careers.get_careers_by_salary(80000, 120000, 'EUR', industry='Healthcare', skills=['Triage'])
+    assert last_query(careers) == {
+        '$and': [{'industry': 'Healthcare'}, {'required_skills': {'$in': ['Triage']}}],
+        'salary_max': {'$gte': 80000},
+        'salary_min': {'$lte': 120000},
+        'salary_currency': 'EUR'
+    }
+    careers.collection.find.return_value.sort.assert_called_with('salary_max', -1)
+
+def test_salary_filter_stays_within_one_currency(careers):
+    careers.get_careers_by_salary()
+    assert last_query(careers) == {'salary_max': {'$ne': None}, 'salary_currency': 'USD'}
+
+def test_writes_store_numeric_salary_fields(careers):
+    careers.create_career({'name': 'Nurse', 'salary_range': '$60k-$90k'})
+    stored = careers.collection.insert_one.call_args[0][0]
+    assert {field: stored[field] for field in salary(0, 0)} == salary(60000, 90000)
@@ -0,0 +1,77 @@
+from datetime import datetime
+import pytest
+from unittest.mock import MagicMock
+from services.ingestion import PostingIngester, RejectedRow, normalize_posting, posting_key
+
+CATALOG = {'python': 'Python', 'sql': 'SQL'}
+
+def test_normalizes_a_raw_row():
+    key, posting = normalize_posting({
+        ' Title ': 'sr. data eng',
+        'Company': '  Acme   Corp ',
+        'location': 'seattle, wa',
+        'skills': 'python; sql | Spark, PYTHON',
+        'salary': '$120k-$150k + 10% bonus',
+        'posted_at': '2026-03-01T12:00:00',
+    }, CATALOG, default_source='upload')
+
+    assert posting['title'] == 'Senior Data Engineer'
+    assert posting['company'] == 'Acme Corp'
+    assert posting['location'] == 'Seattle, WA'
+    assert posting['skills'] == ['Python', 'SQL', 'Spark']
+    assert (posting['salary_min'], posting['salary_max'], posting['salary_currency']) == (120000, 150000, 'USD')
+    assert posting['posted_at'] == datetime(2026, 3, 1, 12)
+    assert posting['source'] == 'upload'
+    assert key.startswith('sha1:')
+
+def test_remote_locations_and_uppercase_words():
+    _, posting = normalize_posting({'job_title': 'ml eng / qa', 'location': 'work from home'})
+    assert posting['title'] == 'ML Engineer / QA'
+    assert posting['location'] == 'Remote'
+    assert posting['posted_at'] is None
+
+def test_salary_from_separate_min_and_max_columns():
+    _, posting = normalize_posting({'title': 'Analyst', 'salary_min': '60000', 'salary_max': '80,000',
+                                    'salary_currency': 'EUR'})
+    assert (posting['salary_min'], posting['salary_max'], posting['salary_currency']) == (60000, 80000, 'EUR')
+
+@pytest.mark.parametrize('raw, reason', [
+    ({'company': 'Acme'}, 'Missing title'),
+    ({'title': '   '}, 'Missing title'),
+    ({'title': 'Dev', 'posted_at': 'last tuesday'}, 'Invalid posted_at'),
+    ({'title': 'Dev', 'salary_min': '90000', 'salary_max': '50000'}, 'Implausible salary'),
+    (['not', 'an', 'object'], 'Row is not an object'),
+])
+def test_rejects_unusable_rows(raw, reason):
+    with pytest.raises(RejectedRow, match=reason):
+        normalize_posting(raw)
+
+def test_key_uses_source_id_when_present():
+    key, _ = normalize_posting({'title': 'Dev', 'source': 'indeed', 'external_id': '123'})
+    assert key == 'indeed:123'
+
+def test_content_key_is_stable_across_formatting():
+    first = posting_key({'title': 'Data Engineer', 'company': 'Acme', 'location': 'Seattle, WA',
+                         'posted_at': datetime(2026, 3, 1, 9)})
+    second = posting_key({'title': 'data engineer', 'company': 'ACME', 'location': 'seattle, wa',
+                          'posted_at': datetime(2026, 3, 1, 17)})
+    assert first == second
+
+def test_content_key_changes_with_content():
+    base = {'title': 'Data Engineer', 'company': 'Acme', 'location': 'Seattle, WA'}
+    assert posting_key(base) != posting_key(dict(base, company='Initech'))
+    assert posting_key(base) != posting_key(dict(base, posted_at=datetime(2026, 3, 1)))
+
+def test_explicit_key_wins_over_content():
+    assert posting_key({'title': 'Dev'}, 'indeed', 'abc') == 'indeed:abc'
+    assert posting_key({'title': 'Dev'}, None, 'abc').startswith('sha1:')
+
+def test_changed_posting_drops_fields_it_no_longer_has():
+    ingester = PostingIngester(MagicMock())
+    _, posting = normalize_posting({'title': 'Nurse', 'company': 'Clinic'})
+    update = ingester._upsert('key', posting, datetime(2026, 1, 1))._doc
+    removed = update[0]['$set']
+    for field in ('industry', 'location', 'salary_min', 'salary_max', 'salary_currency'):
+        assert removed[field]['$cond'][1:] == [f'${field}', '$$REMOVE']
+    assert 'company' not in removed and 'title' not in removed
+    assert update[1]['$set']['company'] == {'$literal': 'Clinic'}
@@ -0,0 +1,46 @@
+import pytest
+from utils.salary import parse_salary
+
+def salary(low, high, currency='USD'):
+    return {'salary_min': low, 'salary_max': high, 'salary_currency': currency}
+
+@pytest.mark.parametrize('value, expected', [
+    ('$75k-$100k', salary(75000, 100000)),
+    ('$70,000 - $120,000', salary(70000, 120000)),
+    ('$75-100k', salary(75000, 100000)),
+    ('CA$90k to CA$110k', salary(90000, 110000, 'CAD')),
+    ('USD 90k - USD 110k', salary(90000, 110000)),
+    ('£45.000', salary(45000, 45000, 'GBP')),
+    ('1.2M', salary(1200000, 1200000)),
+    ('80000', salary(80000, 80000)),
+])
+def test_parses_amounts_and_ranges(value, expected):
+    assert parse_salary(value) == expected
+
+@pytest.mark.parametrize('value, expected', [
+    ('€40/hour', salary(83200, 83200, 'EUR')),
+    ('40 per hour', salary(83200, 83200)),
+    ('$5,000/month', salary(60000, 60000)),
+])
+def test_annualizes_hourly_and_monthly_pay(value, expected):
+    assert parse_salary(value) == expected
+
+@pytest.mark.parametrize('value, expected', [
+    ('$100,000 - $150,000 + 10% bonus', salary(100000, 150000)),
+    ('$90k-$110k, 401k match', salary(90000, 110000)),
+    ('401(k) plus $60k', salary(60000, 60000)),
+    ('$120k (3+ years experience)', salary(120000, 120000)),
+    ('$80k-$95k, 2 positions', salary(80000, 95000)),
+    ('$85k - 2 positions', salary(85000, 85000)),
+    ('Level 2, $80k', salary(80000, 80000)),
+])
+def test_only_the_salary_expression_counts(value, expected):
+    assert parse_salary(value) == expected
+
+@pytest.mark.parametrize('value', ['Competitive', '', None, True, ['$80k']])
+def test_no_amount_gives_none(value):
+    assert parse_salary(value) is None
+
+def test_numbers_are_taken_as_annual_amounts():
+    assert parse_salary(95000) == salary(95000, 95000)
+    assert parse_salary(95000, default_currency='EUR') == salary(95000, 95000, 'EUR')
@@ -0,0 +1,89 @@
+import pytest
+from datetime import datetime
+from services import skill_extractor
+from services.skill_extractor import SkillExtractor, SkillMatcher, skill_patterns
+
+CATALOG = ['Python', 'Java', 'JavaScript', 'Machine Learning', 'Learning', 'Go', 'R', 'C++', 'C#',
+           'Node.js', 'React', 'Rust', 'Kubernetes', 'SQL']
+
+@pytest.fixture(scope='module')
+def matcher():
+    patterns = {}
+    for name in CATALOG:
+        patterns.update(skill_patterns({'name': name}))
+    return SkillMatcher(patterns)
+
+def test_finds_skills_in_order_of_first_mention(matcher):
+    assert matcher.extract('SQL and Python, then more python') == ['SQL', 'Python']
+
+def test_matches_sit_on_word_boundaries(matcher):
+    assert matcher.extract('We write JavaScript') == ['JavaScript']
+    assert matcher.extract('Pythonic code and sqlalchemy') == []
+    assert matcher.extract('C++ and C# developers') == ['C++', 'C#']
+
+def test_overlaps_resolve_to_the_longest_match(matcher):
+    assert matcher.extract('Experience with machine learning required') == ['Machine Learning']
+    assert matcher.extract('Continuous learning culture') == ['Learning']
+
+def test_aliases_map_to_the_canonical_name(matcher):
+    assert matcher.extract('Deploy on k8s with NodeJS and JS') == ['Kubernetes', 'Node.js', 'JavaScript']
+
+def test_short_names_need_their_exact_case(matcher):
+    assert matcher.extract('We use Go and R daily') == ['Go', 'R']
+    assert matcher.extract('we go to r/programming') == []
+    assert matcher.extract('add 5 ml of water') == []
+    assert matcher.extract('Strong ML background') == ['Machine Learning']
+
+def test_common_word_skills_must_read_as_proper_nouns(matcher):
+    assert matcher.extract('Go to the settings page.') == []
+    assert matcher.extract('Done. Rust prevention is covered.') == []
+    assert matcher.extract('rust on the car, react quickly') == []
+    assert matcher.extract('Our services are written in Rust and React') == ['Rust', 'React']
+
+def test_sentence_opening_skills_count_in_a_skill_context(matcher):
+    assert matcher.extract('React developer for 3 years') == ['React']
+    assert matcher.extract('Go and Rust services') == ['Go', 'Rust']
+    assert matcher.extract('I know SQL. Rust, Go and Python.') == ['SQL', 'Rust', 'Go', 'Python']
+    assert matcher.extract('Go and see the docs') == []
+    assert matcher.extract('Rust, then paint') == []
+
+def test_plain_node_is_not_node_js(matcher):
+    assert matcher.extract('each node in the graph') == []
+    assert matcher.extract('Each Node in the graph') == []
+
+@pytest.mark.parametrize('text', ['', None])
+def test_empty_text(matcher, text):
+    assert matcher.extract(text) == []
+
+class FakeSkills:
+    """Just enough of a collection for SkillExtractor._sync"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        since = query.get('updated_at', {}).get('$gte')
+        return [dict(doc) for doc in self.docs if since is None or doc['updated_at'] >= since]
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+@pytest.fixture
+def extractor(monkeypatch):
+    monkeypatch.setattr(skill_extractor, 'SKILL_EXTRACTOR_CHECK_SECONDS', 0)
+    skills = FakeSkills([{'_id': 1, 'name': 'Python', 'updated_at': datetime(2026, 1, 1)},
+                         {'_id': 2, 'name': 'SQL', 'updated_at': datetime(2026, 1, 2)}])
+    return SkillExtractor(type('FakeDb', (), {'skills': skills})())
+
+def test_unchanged_catalog_is_not_recompiled(extractor):
+    for _ in range(3):
+        assert extractor.extract('Python and SQL') == ['Python', 'SQL']
+    assert extractor.counts['full_loads'] == 1
+    assert extractor.counts['incremental_updates'] == 0
+
+def test_changed_skills_are_picked_up_incrementally(extractor):
+    extractor.extract('')
+    extractor.collection.docs.append({'_id': 3, 'name': 'Kubernetes', 'updated_at': datetime(2026, 1, 2)})
+    assert extractor.extract('Kubernetes and SQL') == ['Kubernetes', 'SQL']
+    assert extractor.counts['full_loads'] == 1
+    assert extractor.counts['incremental_updates'] == 1
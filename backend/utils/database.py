@@ -14,6 +14,29 @@ def get_database():
         print(f"Failed to connect to MongoDB: {e}")
         return None
 
+def ensure_ttl_index(collection, field, seconds):
+    """Index a date field so documents expire seconds after it, or never when seconds is None.
+
+    seconds=0 expires documents at the date itself, for fields holding an explicit expiry time.
+    Changing the retention later updates the existing index in place.
+    """
+    name = f'{field}_ttl'
+    existing = collection.index_information()
+    if seconds is None:
+        if name in existing:
+            collection.drop_index(name)
+        collection.create_index(field)
+        return
+
+    # MongoDB allows only one index per key pattern, so a plain one has to go first
+    if f'{field}_1' in existing:
+        collection.drop_index(f'{field}_1')
+    if name not in existing:
+        collection.create_index(field, name=name, expireAfterSeconds=seconds)
+    elif existing[name].get('expireAfterSeconds') != seconds:
+        collection.database.command('collMod', collection.name,
+                                    index={'name': name, 'expireAfterSeconds': seconds})
+
 # Global database instance
 db = get_database()
 
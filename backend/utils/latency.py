@@ -0,0 +1,82 @@
+import math
+import threading
+from typing import Dict, Optional
+
+class LatencySketch:
+    """Streaming quantile sketch over log-spaced buckets with exponential decay.
+
+    Buckets grow geometrically by `gamma`, so any quantile is accurate to within
+    (gamma - 1) / 2 relative error using constant memory. Counts are halved every
+    `decay_every` observations so the estimate follows recent behaviour.
+    """
+
+    def __init__(self, gamma: float = 1.05, decay_every: int = 500, min_samples: int = 20):
+        self.gamma = gamma
+        self.log_gamma = math.log(gamma)
+        self.decay_every = decay_every
+        self.min_samples = min_samples
+        self.buckets: Dict[int, float] = {}
+        self.total = 0.0
+        self.observations = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = math.ceil(math.log(max(seconds, 1e-3)) / self.log_gamma)
+        with self._lock:
+            self.buckets[index] = self.buckets.get(index, 0.0) + 1.0
+            self.total += 1.0
+            self.observations += 1
+            if self.observations % self.decay_every == 0:
+                self.buckets = {i: count / 2 for i, count in self.buckets.items() if count >= 0.5}
+                self.total = sum(self.buckets.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated q-quantile in seconds, or None until min_samples have been seen"""
+        with self._lock:
+            if self.observations < self.min_samples or not self.buckets:
+                return None
+            rank = q * self.total
+            cumulative = 0.0
+            for index in sorted(self.buckets):
+                cumulative += self.buckets[index]
+                if cumulative >= rank:
+                    # Midpoint of the bucket (gamma^(i-1), gamma^i]
+                    return 2 * self.gamma ** index / (self.gamma + 1)
+            return self.gamma ** max(self.buckets)
+
+    def stats(self):
+        return {
+            'samples': self.observations,
+            'p50': self._rounded(self.quantile(0.5)),
+            'p95': self._rounded(self.quantile(0.95)),
+            'p99': self._rounded(self.quantile(0.99))
+        }
+
+    def _rounded(self, value):
+        return round(value, 3) if value is not None else None
+
+class LatencyTracker:
+    """Named latency sketches, created on first use"""
+
+    def __init__(self, **sketch_options):
+        self.sketch_options = sketch_options
+        self.sketches: Dict[str, LatencySketch] = {}
+        self._lock = threading.Lock()
+
+    def sketch(self, name: str) -> LatencySketch:
+        sketch = self.sketches.get(name)
+        if sketch is None:
+            with self._lock:
+                sketch = self.sketches.setdefault(name, LatencySketch(**self.sketch_options))
+        return sketch
+
+    def observe(self, name: str, seconds: float):
+        self.sketch(name).observe(seconds)
+
+    def quantile(self, name: str, q: float) -> Optional[float]:
+        return self.sketch(name).quantile(q)
+
+    def stats(self):
+        with self._lock:
+            sketches = dict(self.sketches)
+        return {name: sketch.stats() for name, sketch in sketches.items()}
@@ -0,0 +1,68 @@
+import copy
+from bson import ObjectId
+from flask import g, has_request_context
+
+class DataLoader:
+    """Memoizes documents by id and batches lookups into a single $in query.
+
+    Documents are kept serialized and handed out as deep copies, so callers can
+    modify what they get (e.g. pop the password) without affecting later loads.
+    """
+
+    def __init__(self, collection, serialize):
+        self.collection = collection
+        self.serialize = serialize
+        self.documents = {}
+
+    def load(self, doc_id):
+        """Document by id, or None if it does not exist"""
+        return self.load_many([doc_id])[0]
+
+    def load_many(self, doc_ids):
+        """Documents in the order of doc_ids, fetching only ids not seen yet in one query"""
+        missing = {}
+        for doc_id in set(doc_ids):
+            if doc_id in self.documents:
+                continue
+            try:
+                missing[ObjectId(doc_id)] = doc_id
+            except Exception:
+                # Malformed ids can never match
+                self.documents[doc_id] = None
+
+        if missing:
+            found = {doc['_id']: doc for doc in self.collection.find({'_id': {'$in': list(missing)}})}
+            for object_id, doc_id in missing.items():
+                doc = found.get(object_id)
+                self.documents[doc_id] = self.serialize(doc) if doc else None
+
+        return [copy.deepcopy(self.documents[doc_id]) for doc_id in doc_ids]
+
+    def prime(self, doc_id, document):
+        """Remember an already serialized document, e.g. after a write that returned it"""
+        self.documents[doc_id] = copy.deepcopy(document)
+
+    def clear(self, doc_id=None):
+        """Forget one document, or all of them"""
+        if doc_id is None:
+            self.documents.clear()
+        else:
+            self.documents.pop(doc_id, None)
+
+def get_loader(collection, serialize):
+    """Loader for the collection scoped to the current request; outside a request nothing is shared"""
+    if not has_request_context():
+        return DataLoader(collection, serialize)
+
+    loaders = g.setdefault('data_loaders', {})
+    loader = loaders.get(collection.name)
+    if loader is None:
+        loader = loaders[collection.name] = DataLoader(collection, serialize)
+    return loader
+
+def clear_loaders(exception=None):
+    """Drop every request-scoped loader"""
+    g.pop('data_loaders', None)
+
+def init_app(app):
+    app.teardown_appcontext(clear_loaders)
@@ -0,0 +1,27 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Process-wide registry of metric providers, each a callable returning a dict
+_providers = {}
+_lock = threading.Lock()
+
+def register_metrics(name, provider):
+    """Register a callable whose dict result is reported under name"""
+    with _lock:
+        _providers[name] = provider
+
+def get_metrics_snapshot():
+    """Collect current values from every registered provider"""
+    with _lock:
+        providers = dict(_providers)
+
+    snapshot = {}
+    for name, provider in providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            logger.warning(f"Failed to collect metrics for {name}: {e}")
+            snapshot[name] = {'error': str(e)}
+    return snapshot
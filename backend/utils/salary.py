@@ -0,0 +1,114 @@
+import re
+from pymongo import UpdateOne
+
+DEFAULT_CURRENCY = 'USD'
+SALARY_FIELDS = ('salary_min', 'salary_max', 'salary_currency')
+
+# Longest symbols first so 'CA$' is not read as '$'
+CURRENCY_SYMBOLS = [('CA$', 'CAD'), ('C$', 'CAD'), ('A$', 'AUD'), ('$', 'USD'), ('€', 'EUR'),
+                    ('£', 'GBP'), ('₹', 'INR'), ('¥', 'JPY')]
+CURRENCY_CODES = {'USD', 'EUR', 'GBP', 'CAD', 'AUD', 'INR', 'JPY', 'CHF', 'SGD'}
+MULTIPLIERS = {'k': 1_000, 'm': 1_000_000}
+# Hours and months in a working year, to annualize hourly and monthly figures
+PERIODS = [(re.compile(r'/\s*h(ou)?r|per\s+hour|hourly', re.I), 2080),
+           (re.compile(r'/\s*mo(nth)?|per\s+month|monthly', re.I), 12)]
+
+_CURRENCY = r'(?:CA\$|C\$|A\$|[$€£₹¥])?\s*'
+_NUMBER = r'(\d+(?:[.,]\d+)*)\s*([kKmM])?(?![a-zA-Z\d])'
+# One amount, or two joined by a dash or 'to'; currency codes may sit between them ('USD 90k - USD 110k')
+_RANGE = re.compile(r'(' + _CURRENCY + r')' + _NUMBER
+                    + r'(?:\s*(?:-|–|—|to)\s*(?:[A-Z]{3}\s*)?' + _CURRENCY + _NUMBER + r')?')
+# Numbers that are not pay: '10% bonus', '3+ years', '2 positions'
+_NOT_PAY = re.compile(r'\s*\+?\s*(?:%|years?\b|yrs?\b|months? (?:experience|contract)|positions?\b|openings?\b|'
+                      r'roles?\b|hires?\b|days?\b|weeks?\b|\(k\))', re.I)
+_CODE = re.compile(r'\b([A-Z]{3})\b')
+
+def _number(text):
+    """'70,000' -> 70000, '1.2' -> 1.2, '70.000' (thousands separator) -> 70000"""
+    parts = re.split(r'[.,]', text)
+    if len(parts) > 1 and all(len(part) == 3 for part in parts[1:]):
+        return float(''.join(parts))
+    return float(text.replace(',', ''))
+
+def _is_pay(number, suffix, rest):
+    """False for an amount followed by '%', 'years', 'positions' and the like, or a 401(k)"""
+    return not (_NOT_PAY.match(rest) or (number == '401' and suffix.lower() == 'k'))
+
+def _leading_range(value):
+    """Amounts of the first salary expression in value, preferring one that reads as money.
+
+    Only that expression counts, so '$100k - $150k + 10% bonus' or '$90k, 401k match' do not
+    stretch the range. An amount reads as money with a currency symbol, a k/M suffix or four or
+    more digits; a bare small number ('40/hour') is used only when nothing else qualifies.
+    """
+    fallback = None
+    for match in _RANGE.finditer(value):
+        symbol, low, low_suffix, high, high_suffix = match.groups()
+        low_end = match.end(3) if low_suffix else match.end(2)
+        if not _is_pay(low, low_suffix or '', value[low_end:]):
+            continue
+        figures = [(low, low_suffix or '')]
+        if high and _is_pay(high, high_suffix or '', value[match.end():]):
+            figures.append((high, high_suffix or ''))
+
+        # '$75-100k': a suffix on the last figure applies to bare small ones before it
+        suffixes = [suffix.lower() for _, suffix in figures if suffix]
+        amounts = []
+        for number, suffix in figures:
+            amount = _number(number)
+            suffix = suffix.lower() or (suffixes[-1] if suffixes and amount < 1000 else '')
+            amounts.append(amount * MULTIPLIERS.get(suffix, 1))
+
+        if symbol.strip() or suffixes or max(amounts) >= 1000:
+            return amounts
+        fallback = fallback or amounts
+    return fallback
+
+def parse_salary(value, default_currency=DEFAULT_CURRENCY):
+    """Parse a salary like '$75k-$100k', '$70,000 - $120,000' or '€40/hour' into annual numbers.
+
+    Returns {'salary_min', 'salary_max', 'salary_currency'}, or None when value holds no amount.
+    A single figure gives equal min and max.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {'salary_min': int(value), 'salary_max': int(value), 'salary_currency': default_currency}
+    if not isinstance(value, str):
+        return None
+
+    amounts = _leading_range(value)
+    if not amounts:
+        return None
+
+    for pattern, factor in PERIODS:
+        if pattern.search(value):
+            amounts = [amount * factor for amount in amounts]
+            break
+
+    currency = next((code for code in _CODE.findall(value) if code in CURRENCY_CODES), None)
+    if not currency:
+        currency = next((code for symbol, code in CURRENCY_SYMBOLS if symbol in value), default_currency)
+
+    return {'salary_min': int(min(amounts)), 'salary_max': int(max(amounts)), 'salary_currency': currency}
+
+def salary_fields(value, default_currency=DEFAULT_CURRENCY):
+    """Numeric fields stored next to a salary string on write; all None when it holds no amount"""
+    return parse_salary(value, default_currency) or dict.fromkeys(SALARY_FIELDS)
+
+def salary_query(min_salary=None, max_salary=None):
+    """Filter for stored ranges overlapping [min_salary, max_salary]"""
+    query = {}
+    if min_salary is not None:
+        query['salary_max'] = {'$gte': min_salary}
+    if max_salary is not None:
+        query['salary_min'] = {'$lte': max_salary}
+    return query
+
+def backfill_salary_fields(collection, field='salary_range'):
+    """Parse salaries of documents written without the numeric fields, e.g. by seed_database.py"""
+    operations = [
+        UpdateOne({'_id': doc['_id']}, {'$set': salary_fields(doc[field])})
+        for doc in collection.find({field: {'$type': 'string'}, 'salary_min': {'$exists': False}}, {field: 1})
+    ]
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    return len(operations)
@@ -1,4 +1,5 @@
-import React, { createContext, useContext, useState } from 'react';
+import React, { createContext, useContext, useEffect, useState } from 'react';
+import { useAuth } from './AuthContext';
 
 const NotificationContext = createContext();
 
@@ -12,6 +13,7 @@ export const useNotifications = () => {
 
 export const NotificationProvider = ({ children }) => {
   const [notifications, setNotifications] = useState([]);
+  const { token } = useAuth();
 
   const addNotification = (notification) => {
     const id = Date.now();
@@ -33,6 +35,26 @@ export const NotificationProvider = ({ children }) => {
     setNotifications(prev => prev.filter(notification => notification.id !== id));
   };
 
+  // Server notifications are pushed over SSE instead of polled
+  useEffect(() => {
+    if (!token) return undefined;
+
+    const baseURL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
+    const source = new EventSource(`${baseURL}/api/notifications/stream?token=${encodeURIComponent(token)}`);
+
+    source.addEventListener('notification', (event) => {
+      const notification = JSON.parse(event.data);
+      addNotification({
+        type: notification.type === 'error' ? 'error' : 'info',
+        title: notification.title,
+        message: notification.message
+      });
+    });
+
+    return () => source.close();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [token]);
+
   const value = {
     notifications,
     addNotification,
@@ -30,6 +30,7 @@ const Chatbot = () => {
   const [inputMessage, setInputMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [sessionId, setSessionId] = useState(null);
   const messagesEndRef = useRef(null);
 
   const scrollToBottom = () => {
@@ -73,10 +74,11 @@ const Chatbot = () => {
       const response = await api.post('/api/chatbot/message', {
         message: inputMessage,
         context: '',
-        conversation_history: messages.slice(-10) // Send last 10 messages for context
+        session_id: sessionId // History is tracked server-side per session
       });
 
       if (response.data.success) {
+        setSessionId(response.data.session_id);
         const botMessage = {
           id: Date.now() + 1,
           text: response.data.response,
@@ -107,6 +109,7 @@ const Chatbot = () => {
   };
 
   const clearChat = () => {
+    setSessionId(null);
     setMessages([
       {
         id: Date.now(),